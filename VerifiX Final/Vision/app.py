@@ -6,14 +6,23 @@ import sys
 # Add parent directory to path to allow importing project_types
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import base64
-from typing import Any, Dict
-from enum import Enum
-from dataclasses import asdict
-from flask import Flask, request, jsonify, send_from_directory
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Any
+from flask import Flask, Response, abort, request, jsonify
 from flask_cors import CORS
 from audit_orchestrator import AuditOrchestrator
 from repository import StatutoryArchive
 from config import Config
+from deadlines import DeadlineExceeded
+from project_types import to_json
+from metrics import REGISTRY
+from compression import Representation, compress, is_compressible, negotiate
+from result_store import IdempotencyConflict, StoredResult, fingerprint, result_store
+from scheduler import LANES, model_calls, priority, priority_for
+from profiling import is_authorized, profile_clock_for, profile_store, render_text, start_capture
+from static_assets import StaticAssets
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static'), static_url_path=None)
 CORS(app)
@@ -23,31 +32,147 @@ CORS(app)
 # Initialize services
 archive = StatutoryArchive()
 orchestrator = AuditOrchestrator(archive)
+static_assets = StaticAssets(app.static_folder)
+
+# ==================== LIFECYCLE ====================
+
+class InFlightAudits:
+    """Counts running audits so a shutting-down worker can drain them"""
+    
+    def __init__(self):
+        self._count = 0
+        self._draining = False
+        self._cond = threading.Condition()
+    
+    @property
+    def count(self) -> int:
+        return self._count
+    
+    @property
+    def draining(self) -> bool:
+        return self._draining
+    
+    @contextmanager
+    def track(self):
+        """Mark an audit as in flight for the duration of the block"""
+        with self._cond:
+            self._count += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._count -= 1
+                self._cond.notify_all()
+    
+    def start_draining(self) -> None:
+        """Report draining (503 from /api/health) while still serving, so load balancers stop routing here"""
+        self._draining = True
+    
+    def drain(self, timeout: float) -> bool:
+        """Stop reporting healthy and wait for running audits; True if all finished"""
+        self.start_draining()
+        with self._cond:
+            return self._cond.wait_for(lambda: self._count == 0, timeout=timeout)
+
+in_flight = InFlightAudits()
+
+def run_audit(audit, profile_clock=None, lane=('interactive', 'default'), camel=False) -> StoredResult:
+    """
+    Run an audit callable as in-flight work in a model call lane, profiling it when a clock is given
+    
+    The result is serialized once, with the key style of the calling
+    endpoint, and kept in result_store for GET /api/audit/<id>.
+    """
+    capture = start_capture(profile_clock)
+    with in_flight.track(), priority(*lane):
+        try:
+            result = audit()
+        except Exception:
+            if capture:
+                capture.discard()
+            raise
+    if capture:
+        capture.save(result.id)
+    return result_store.put(result, camel)
+
+def warm_up() -> None:
+    """Prepare model clients before the worker takes its first request"""
+    orchestrator.warm_up()
+
+def start_background_warm_up() -> threading.Thread:
+    """Warm up off the serving path so the port answers (e.g. health checks) immediately"""
+    thread = threading.Thread(target=warm_up, name='verifix-warm-up', daemon=True)
+    thread.start()
+    return thread
 
 # ==================== UTILITY FUNCTIONS ====================
 
-def convert_to_dict(obj: Any) -> Dict:
-    """Convert dataclass to dict recursively"""
-    if isinstance(obj, (str, int, float, bool)) or obj is None:
-        return obj
-    elif isinstance(obj, Enum):
-        return obj.value
-    elif isinstance(obj, list):
-        return [convert_to_dict(item) for item in obj]
-    elif isinstance(obj, dict):
-        return {k: convert_to_dict(v) for k, v in obj.items()}
-    elif hasattr(obj, '__dict__'):
-        result = {}
-        for key, value in obj.__dict__.items():
-            # Convert snake_case to camelCase
-            camel_key = ''.join(
-                word.capitalize() if i > 0 else word 
-                for i, word in enumerate(key.split('_'))
-            )
-            result[camel_key] = convert_to_dict(value)
-        return result
-    else:
-        return str(obj)
+def send_representation(representation: Representation, mimetype: str = 'application/json',
+                        cache_control: str = None) -> Response:
+    """
+    A cached body in the encoding the client prefers, with its ETag
+    
+    Bodies come from the precompiled serializers in project_types: the
+    upload and stream endpoints keep snake_case keys (the dashboard reads
+    them); archive and sample endpoints keep their camelCase keys.
+    
+    Each encoding is a separate representation with its own ETag; 304 when
+    the client's If-None-Match already has the one it would receive.
+    """
+    available = representation.available()
+    encoding = negotiate(request.accept_encodings, available) if available else None
+    response = Response(representation.encoded(encoding), mimetype=mimetype)
+    response.set_etag(f"{representation.etag}-{encoding}" if encoding else representation.etag)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if available:
+        response.vary.add('Accept-Encoding')
+    if cache_control:
+        response.headers['Cache-Control'] = cache_control
+    return response.make_conditional(request)
+
+def stored_response(stored: StoredResult, replayed: bool = False) -> Response:
+    """A stored result, 304 when the client already has it"""
+    response = send_representation(stored)
+    if replayed:
+        response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+# Serialized archive snapshots by endpoint, reused until the archive changes
+_archive_snapshots = {}
+
+def archive_response(name: str, version: tuple, build) -> Response:
+    """camelCase JSON of build(), serialized (and compressed) once per archive version"""
+    etag = f"{name}-{archive.instance}-{'-'.join(map(str, version))}"
+    snapshot = _archive_snapshots.get(name)
+    if snapshot is None or snapshot.etag != etag:
+        snapshot = _archive_snapshots[name] = Representation(to_json(build(), camel=True), etag)
+    return send_representation(snapshot)
+
+def request_lane():
+    """Scheduler lane and flow for the current request (X-VerifiX-Priority / X-VerifiX-Flow headers)"""
+    return priority_for(request.headers, request.remote_addr)
+
+@app.after_request
+def compress_json(response: Response) -> Response:
+    """Compress large JSON responses not already sent from a cached representation"""
+    if (response.mimetype != 'application/json' or response.direct_passthrough
+            or 'Content-Encoding' in response.headers or response.status_code != 200):
+        return response
+    body = response.get_data()
+    if not is_compressible(body):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate(request.accept_encodings)
+    if encoding:
+        response.set_data(compress(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+def format_sse(event: str, payload: Any) -> str:
+    """Format a single Server-Sent Events message with a JSON payload (or already serialized JSON bytes)"""
+    data = payload if isinstance(payload, bytes) else to_json(payload)
+    return f"event: {event}\ndata: {data.decode('utf-8')}\n\n"
 
 # ==================== API ENDPOINTS ====================
 
@@ -57,18 +182,37 @@ def convert_to_dict(obj: Any) -> Dict:
 def health_check():
     """Health check endpoint"""
     return jsonify({
-        'status': 'healthy',
+        'status': 'draining' if in_flight.draining else 'healthy',
         'service': 'VerifiX Invoice Audit Agent',
         'version': '1.0.0',
-        'gemini_configured': bool(Config.GEMINI_API_KEY and Config.GEMINI_API_KEY != 'Your API key')
-    })
+        'gemini_configured': bool(Config.GEMINI_API_KEY and Config.GEMINI_API_KEY != 'Your API key'),
+        'in_flight_audits': in_flight.count,
+        'model_queue': {lane: model_calls.depth(lane) for lane in LANES}
+    }), 503 if in_flight.draining else 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics for this worker process"""
+    body = REGISTRY.render()
+    body += f"# TYPE verifix_in_flight_audits gauge\nverifix_in_flight_audits {in_flight.count}\n"
+    body += "# TYPE verifix_model_queue_depth gauge\n" + ''.join(
+        f'verifix_model_queue_depth{{lane="{lane}"}} {model_calls.depth(lane)}\n' for lane in LANES)
+    body += "# TYPE verifix_model_calls_running gauge\n" + ''.join(
+        f'verifix_model_calls_running{{lane="{lane}"}} {model_calls.running(lane)}\n' for lane in LANES)
+    return Response(body, mimetype='text/plain; version=0.0.4')
 
 @app.route('/api/audit/sample', methods=['POST'])
 def audit_sample():
     """Process sample invoice audit"""
     try:
-        result = orchestrator.process_sample()
-        return jsonify(convert_to_dict(result))
+        profile_clock = profile_clock_for(request.headers, request.args)
+        stored = run_audit(orchestrator.process_sample, profile_clock, request_lane(), camel=True)
+        response = stored_response(stored)
+        if profile_clock:
+            response.headers['X-VerifiX-Profile-Id'] = stored.audit_id
+        return response
+    except DeadlineExceeded as e:
+        return jsonify({'error': str(e)}), 504
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -84,11 +228,13 @@ def upload_file():
 
     # Retrieve optional PO file
     po_file = request.files.get('po_file')
+    po_content = None
     po_data = None
     po_mime_type = None
 
     if po_file and po_file.filename != '':
-        po_data = base64.b64encode(po_file.read()).decode('utf-8')
+        po_content = po_file.read()
+        po_data = base64.b64encode(po_content).decode('utf-8')
         po_mime_type = po_file.mimetype
 
     try:
@@ -98,40 +244,135 @@ def upload_file():
         mime_type = file.mimetype
 
         # Process document with optional PO
-        result = orchestrator.process_document(
+        profile_clock = profile_clock_for(request.headers, request.args)
+        lane = request_lane()
+        audit = lambda: run_audit(lambda: orchestrator.process_document(
             base64_data, 
             mime_type,
             po_data=po_data,
             po_mime_type=po_mime_type
-        )
+        ), profile_clock, lane)
         
-        # Convert to dictionary using dataclasses.asdict
-        # We need to handle nested dataclasses properly if simple dict conversion fails
-        # But dataclasses.asdict handles recursion well
-        return jsonify(asdict(result))
+        # A retry with the same Idempotency-Key gets the stored result instead of a second audit
+        key = request.headers.get('Idempotency-Key')
+        if key:
+            stored, replayed = result_store.run_once(key, fingerprint(file_content, po_content), audit)
+        else:
+            stored, replayed = audit(), False
+        
+        response = stored_response(stored, replayed)
+        if profile_clock and not replayed:
+            response.headers['X-VerifiX-Profile-Id'] = stored.audit_id
+        return response
 
+    except IdempotencyConflict as e:
+        return jsonify({'error': str(e)}), 422
+    except DeadlineExceeded as e:
+        # Extraction has no local fallback; later stages degrade instead of timing out
+        return jsonify({'error': str(e)}), 504
     except Exception as e:
         print(f"Error processing upload: {str(e)}")
         # Return 500 with error message
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/audit/stream', methods=['POST'])
+def stream_upload():
+    """Audit an uploaded invoice, streaming agent steps and partial results as SSE"""
+    if 'file' not in request.files:
+        return jsonify({'error': 'No file part'}), 400
+    
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({'error': 'No selected file'}), 400
+
+    po_file = request.files.get('po_file')
+    po_data = None
+    po_mime_type = None
+
+    if po_file and po_file.filename != '':
+        po_data = base64.b64encode(po_file.read()).decode('utf-8')
+        po_mime_type = po_file.mimetype
+
+    # Read everything we need while the request context is still active
+    base64_data = base64.b64encode(file.read()).decode('utf-8')
+    mime_type = file.mimetype
+    profile_clock = profile_clock_for(request.headers, request.args)
+    lane = request_lane()
+    events: queue.Queue = queue.Queue()
+
+    def audit_in_background():
+        try:
+            stored = run_audit(lambda: orchestrator.process_document(
+                base64_data,
+                mime_type,
+                po_data=po_data,
+                po_mime_type=po_mime_type,
+                on_event=lambda event, payload: events.put((event, payload))
+            ), profile_clock, lane)
+            events.put(("result", stored.body))
+        except Exception as e:
+            print(f"Error processing streamed upload: {str(e)}")
+            events.put(("error", {'error': str(e)}))
+        finally:
+            events.put(None)
+
+    def generate():
+        threading.Thread(target=audit_in_background, daemon=True).start()
+        while True:
+            try:
+                item = events.get(timeout=Config.SSE_KEEPALIVE_SECONDS)
+            except queue.Empty:
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+                continue
+            if item is None:
+                break
+            yield format_sse(*item)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/api/audit/<audit_id>', methods=['GET'])
+def get_audit_result(audit_id):
+    """Fetch a stored audit result without re-running the audit"""
+    stored = result_store.get(audit_id)
+    if stored is None:
+        return jsonify({'error': 'No result for this audit'}), 404
+    return stored_response(stored)
+
+@app.route('/api/audit/<audit_id>/profile', methods=['GET'])
+def get_audit_profile(audit_id):
+    """Download a captured profile: pstats file by default, ?format=text for a summary"""
+    if not is_authorized(request.headers.get('X-VerifiX-Profile') or request.args.get('profile')):
+        return jsonify({'error': 'Not authorized'}), 403
+    stats = profile_store.get(audit_id)
+    if stats is None:
+        return jsonify({'error': 'No profile for this audit'}), 404
+    if request.args.get('format') == 'text':
+        return Response(render_text(stats), mimetype='text/plain')
+    return Response(stats, mimetype='application/octet-stream', headers={
+        'Content-Disposition': f'attachment; filename="{audit_id}.prof"'
+    })
+
 @app.route('/api/archive', methods=['GET'])
 def get_archive():
     """Get statutory archive contents"""
-    return jsonify({
-        'userUploadedInvoice': [convert_to_dict(inv) for inv in archive.get_all_invoices()],
-        'referenceDocuments': {k: convert_to_dict(v) for k, v in archive.get_all_pos().items()}
+    return archive_response('archive', (archive.invoices_version, archive.pos_version), lambda: {
+        'userUploadedInvoice': archive.get_all_invoices(),
+        'referenceDocuments': archive.get_all_pos()
     })
 
 @app.route('/api/archive/invoices', methods=['GET'])
 def get_invoices():
     """Get all uploaded invoices"""
-    return jsonify([convert_to_dict(inv) for inv in archive.get_all_invoices()])
+    return archive_response('invoices', (archive.invoices_version,), archive.get_all_invoices)
 
 @app.route('/api/archive/pos', methods=['GET'])
 def get_pos():
     """Get all reference POs"""
-    return jsonify({k: convert_to_dict(v) for k, v in archive.get_all_pos().items()})
+    return archive_response('pos', (archive.pos_version,), archive.get_all_pos)
 
 @app.route('/api/rules/list', methods=['GET'])
 def list_rules():
@@ -150,18 +391,36 @@ def list_rules():
                 'description': 'Check invoice amount doesn\'t exceed PO',
                 'severity': 'HIGH'
             },
+            {
+                'id': 'R-PO-010',
+                'name': 'Cumulative PO Over-billing',
+                'description': 'Check invoices billed against a PO don\'t together exceed its amount or line quantities',
+                'severity': 'HIGH'
+            },
             {
                 'id': 'R-GST-003',
                 'name': 'Invalid GST Number',
-                'description': 'Check GST number is present and valid',
+                'description': 'Check GST number is present and valid (format, state code, check character)',
                 'severity': 'MEDIUM'
             },
+            {
+                'id': 'R-GST-011',
+                'name': 'GSTIN PAN Mismatch',
+                'description': 'Check invoice and PO GSTINs belong to the same PAN holder',
+                'severity': 'HIGH'
+            },
             {
                 'id': 'R-FIN-004',
                 'name': 'Tax Calculation Error',
                 'description': 'Check tax calculation is correct',
                 'severity': 'MEDIUM'
             },
+            {
+                'id': 'R-FIN-012',
+                'name': 'Line Arithmetic Error',
+                'description': 'Check quantity x unit price per line, and line totals plus tax against the invoice total',
+                'severity': 'HIGH'
+            },
             {
                 'id': 'R-PO-005',
                 'name': 'Missing PO Reference',
@@ -179,6 +438,18 @@ def list_rules():
                 'name': 'Line Items Mismatch',
                 'description': 'Check line items match PO',
                 'severity': 'MEDIUM'
+            },
+            {
+                'id': 'R-PRICE-009',
+                'name': 'Unit Price Outlier',
+                'description': 'Check unit prices against the vendor\'s history for the same HSN code',
+                'severity': 'HIGH'
+            },
+            {
+                'id': 'R-DUP-013',
+                'name': 'Possible Resubmission',
+                'description': 'Check the upload is not a rescan of an invoice already audited',
+                'severity': 'HIGH'
             }
         ]
     })
@@ -188,14 +459,17 @@ def list_rules():
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
-    # Check if the requested path exists as a static file
-    if path != "" and os.path.exists(os.path.join(app.static_folder, path)):
-        return send_from_directory(app.static_folder, path)
-    # Otherwise, serve index.html for React routing
-    return send_from_directory(app.static_folder, 'index.html')
+    """Built frontend files from memory; any other path gets index.html for React routing"""
+    asset = static_assets.get(path)
+    if asset is None:
+        asset = static_assets.get('index.html')
+    if asset is None:
+        abort(404)
+    return send_representation(asset.representation, asset.mimetype, asset.cache_control)
 
 # ==================== MAIN ====================
 
+# Development server only; production runs wsgi:app under gunicorn (see gunicorn.conf.py)
 if __name__ == '__main__':
     print("=" * 60)
     print("Starting VerifiX Invoice Audit Agent")
@@ -207,9 +481,14 @@ if __name__ == '__main__':
     print("  GET  /api/health          - Health check")
     print("  POST /api/audit/sample    - Process sample invoice")
     print("  POST /api/audit/upload    - Upload and audit invoice")
+    print("  POST /api/audit/stream    - Upload and stream audit progress (SSE)")
+    print("  GET  /api/audit/<id>      - Fetch a stored audit result")
+    print("  GET  /api/audit/<id>/profile - Download a captured audit profile")
     print("  GET  /api/archive         - Get all archived documents")
     print("  GET  /api/archive/invoices - Get all invoices")
     print("  GET  /api/archive/pos     - Get all POs")
     print("  GET  /api/rules/list      - List all validation rules")
+    print("  GET  /metrics             - Prometheus metrics")
     print("=" * 60)
+    start_background_warm_up()
     app.run(debug=Config.DEBUG, host=Config.HOST, port=Config.PORT)
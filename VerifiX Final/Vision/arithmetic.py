@@ -0,0 +1,126 @@
+"""
+arithmetic.py - Deterministic arithmetic checks for extracted invoices
+
+Checks quantity x unit price against each line total, and line totals plus
+tax against the invoice total, in Decimal with half-up rounding to paise.
+A float pre-screen clears lines that are comfortably within tolerance so
+only borderline or failing lines pay for Decimal; the batch path runs that
+screen over the flattened line items of many invoices at once.
+"""
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from operator import mul, sub
+from typing import List, NamedTuple, Optional, Sequence
+
+from config import Config
+from project_types import ExtractedData
+
+PAISE = Decimal('0.01')
+
+class LineVariance(NamedTuple):
+    """A line whose total disagrees with quantity x unit price"""
+    index: int
+    expected: Decimal
+    stated: Decimal
+
+    @property
+    def variance(self) -> Decimal:
+        return self.stated - self.expected
+
+class ArithmeticReport(NamedTuple):
+    """Arithmetic findings for one invoice"""
+    lines: List[LineVariance]
+    expected_total: Optional[Decimal] = None  # Set when line totals + tax disagree with the invoice total
+    stated_total: Optional[Decimal] = None
+
+    @property
+    def ok(self) -> bool:
+        return not self.lines and self.expected_total is None
+
+def to_decimal(value) -> Decimal:
+    """Exact decimal of an extracted number, via its shortest repr so 0.1 stays 0.1"""
+    return Decimal(str(value))
+
+def _tolerance() -> Decimal:
+    return to_decimal(Config.ARITHMETIC_TOLERANCE)
+
+def _line_variance(index: int, quantity, unit_price, total, tolerance: Decimal) -> Optional[LineVariance]:
+    try:
+        expected = (to_decimal(quantity) * to_decimal(unit_price)).quantize(PAISE, ROUND_HALF_UP)
+        stated = to_decimal(total).quantize(PAISE, ROUND_HALF_UP)
+        if abs(stated - expected) > tolerance:
+            return LineVariance(index, expected, stated)
+    except (InvalidOperation, ValueError):
+        pass  # Non-numeric values; nothing to check
+    return None
+
+def _total_variance(invoice: ExtractedData, line_totals: Sequence, tolerance: Decimal) -> ArithmeticReport:
+    if not line_totals:
+        return ArithmeticReport([])
+    try:
+        if abs(sum(line_totals) + invoice.tax_amount - invoice.total_amount) <= float(tolerance) / 2:
+            return ArithmeticReport([])
+    except TypeError:
+        pass
+    try:
+        expected = (sum((to_decimal(t) for t in line_totals), Decimal(0)) + to_decimal(invoice.tax_amount)).quantize(PAISE, ROUND_HALF_UP)
+        stated = to_decimal(invoice.total_amount).quantize(PAISE, ROUND_HALF_UP)
+        if abs(stated - expected) > tolerance:
+            return ArithmeticReport([], expected, stated)
+    except (InvalidOperation, ValueError):
+        pass
+    return ArithmeticReport([])
+
+def check_invoice(invoice: ExtractedData) -> ArithmeticReport:
+    """Verify every line total and the invoice total of one invoice"""
+    tolerance = _tolerance()
+    # Floats are exact enough to clear anything well inside the tolerance
+    screen = float(tolerance) / 2
+    lines = []
+    for i, item in enumerate(invoice.line_items):
+        try:
+            if abs(item.quantity * item.unit_price - item.total) <= screen:
+                continue
+        except TypeError:
+            pass
+        variance = _line_variance(i, item.quantity, item.unit_price, item.total, tolerance)
+        if variance:
+            lines.append(variance)
+    report = _total_variance(invoice, [item.total for item in invoice.line_items], tolerance)
+    return report._replace(lines=lines)
+
+def check_invoices(invoices: Sequence[ExtractedData]) -> List[ArithmeticReport]:
+    """
+    Verify many invoices
+
+    Line items of the whole batch are flattened into columns and screened
+    with C-level map passes; only the lines and invoice totals the screen
+    cannot clear are checked in Decimal.
+    """
+    tolerance = _tolerance()
+    screen = float(tolerance) / 2
+    owners, offsets, quantities, prices, totals = [], [], [], [], []
+    for n, invoice in enumerate(invoices):
+        offsets.append(len(owners))
+        for item in invoice.line_items:
+            owners.append(n)
+            quantities.append(item.quantity)
+            prices.append(item.unit_price)
+            totals.append(item.total)
+
+    reports = [[] for _ in invoices]
+    try:
+        gaps = list(map(abs, map(sub, map(mul, quantities, prices), totals)))
+    except TypeError:
+        gaps = None  # Some value is not a number; check every line individually
+
+    for row, owner in enumerate(owners):
+        if gaps is not None and gaps[row] <= screen:
+            continue
+        variance = _line_variance(row - offsets[owner], quantities[row], prices[row], totals[row], tolerance)
+        if variance:
+            reports[owner].append(variance)
+
+    return [
+        _total_variance(invoice, totals[offsets[n]:offsets[n] + len(invoice.line_items)], tolerance)._replace(lines=reports[n])
+        for n, invoice in enumerate(invoices)
+    ]
@@ -0,0 +1,74 @@
+"""
+compression.py - Content negotiation and cached response bodies
+
+A Representation is a response body with a strong ETag whose compressed
+variants are computed once and kept, so a stored audit result, an archive
+snapshot or a static asset is compressed at most once per encoding however
+often it is served. Other JSON responses are compressed per request by the
+app's after_request hook.
+
+Brotli is used when the brotli package is installed and the client accepts
+it; gzip otherwise.
+"""
+import gzip
+import hashlib
+from typing import Dict, Optional
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip only
+    brotli = None
+
+from config import Config
+
+# In order of preference
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress body at the request-time levels in Config"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=Config.BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=Config.GZIP_LEVEL, mtime=0)
+
+def is_compressible(body: bytes) -> bool:
+    return Config.HTTP_COMPRESSION and len(body) >= Config.COMPRESS_MIN_BYTES
+
+def negotiate(accept_encodings, available=ENCODINGS) -> Optional[str]:
+    """The preferred encoding of available that the client accepts (werkzeug Accept), or None"""
+    if not Config.HTTP_COMPRESSION:
+        return None
+    best, best_quality = None, 0
+    for encoding in available:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def etag_for(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()[:32]
+
+class Representation:
+    """A response body, its ETag and its compressed variants, each computed once"""
+
+    __slots__ = ('body', 'etag', 'variants')
+
+    def __init__(self, body: bytes, etag: Optional[str] = None, variants: Optional[Dict[str, bytes]] = None):
+        self.body = body
+        self.etag = etag or etag_for(body)
+        self.variants = dict(variants or {})
+
+    def available(self):
+        """Encodings this body may be sent in: precompressed ones, or any when it is worth compressing"""
+        if not is_compressible(self.body):
+            return ()
+        return tuple(e for e in ('br', 'gzip') if e in self.variants or e in ENCODINGS)
+
+    def encoded(self, encoding: Optional[str]) -> bytes:
+        """The body in encoding (None: uncompressed), compressing it on first use"""
+        if encoding is None:
+            return self.body
+        variant = self.variants.get(encoding)
+        if variant is None:
+            # Concurrent first requests may both compress; either result is kept
+            variant = self.variants[encoding] = compress(self.body, encoding)
+        return variant
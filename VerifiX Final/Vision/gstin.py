@@ -0,0 +1,90 @@
+"""
+gstin.py - Local GSTIN validation
+
+A GSTIN is a 2-digit state code, the holder's 10-character PAN, an entity
+number, the letter 'Z' and a mod-36 check character. Validation is a
+precompiled pattern match, a dictionary lookup for the state and 14 table
+lookups for the checksum; results are memoized because the same vendor
+GSTINs recur across invoices.
+"""
+import re
+from functools import lru_cache
+from operator import getitem
+from typing import Dict, Iterable, NamedTuple, Optional
+
+_CHARS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+# State/UT codes assigned under GST, including the two non-state jurisdictions
+STATE_CODES: Dict[str, str] = {
+    "01": "Jammu and Kashmir", "02": "Himachal Pradesh", "03": "Punjab", "04": "Chandigarh",
+    "05": "Uttarakhand", "06": "Haryana", "07": "Delhi", "08": "Rajasthan",
+    "09": "Uttar Pradesh", "10": "Bihar", "11": "Sikkim", "12": "Arunachal Pradesh",
+    "13": "Nagaland", "14": "Manipur", "15": "Mizoram", "16": "Tripura",
+    "17": "Meghalaya", "18": "Assam", "19": "West Bengal", "20": "Jharkhand",
+    "21": "Odisha", "22": "Chhattisgarh", "23": "Madhya Pradesh", "24": "Gujarat",
+    "25": "Daman and Diu", "26": "Dadra and Nagar Haveli and Daman and Diu", "27": "Maharashtra",
+    "28": "Andhra Pradesh (Old)", "29": "Karnataka", "30": "Goa", "31": "Lakshadweep",
+    "32": "Kerala", "33": "Tamil Nadu", "34": "Puducherry", "35": "Andaman and Nicobar Islands",
+    "36": "Telangana", "37": "Andhra Pradesh", "38": "Ladakh",
+    "97": "Other Territory", "99": "Centre Jurisdiction",
+}
+
+# State code, PAN (5 letters with a valid holder type 4th, 4 digits, letter), entity number, 'Z', check character
+_PATTERN = re.compile(r"[0-9]{2}[A-Z]{3}[ABCEFGHJLPTK][A-Z][0-9]{4}[A-Z][1-9A-Z]Z[0-9A-Z]")
+
+# Per position, each character's contribution to the checksum: odd positions
+# are weighted 2 and the product's base-36 digits are summed
+_WEIGHTS = tuple(
+    {c: (v * (2 if i % 2 else 1)) // 36 + (v * (2 if i % 2 else 1)) % 36 for v, c in enumerate(_CHARS)}
+    for i in range(14)
+)
+
+class GSTINCheck(NamedTuple):
+    """Outcome of validating one GSTIN; error is None when it is valid"""
+    gstin: str
+    error: Optional[str]
+    state: Optional[str] = None
+    pan: Optional[str] = None
+
+    @property
+    def valid(self) -> bool:
+        return self.error is None
+
+def checksum(first14: str) -> str:
+    """Check character for the first 14 characters of a GSTIN"""
+    return _CHARS[-sum(map(getitem, _WEIGHTS, first14)) % 36]
+
+def normalize(gstin: Optional[str]) -> str:
+    """Upper-case with spaces and hyphens removed"""
+    return (gstin or '').upper().replace(' ', '').replace('-', '')
+
+def _validate(gstin: str) -> GSTINCheck:
+    if not gstin:
+        return GSTINCheck(gstin, "GST number is missing")
+    if len(gstin) != 15:
+        return GSTINCheck(gstin, f"GST number must be 15 characters, found {len(gstin)}")
+    if not _PATTERN.fullmatch(gstin):
+        return GSTINCheck(gstin, "GST number does not follow the state code + PAN + entity + 'Z' + check character format")
+    state = STATE_CODES.get(gstin[:2])
+    if state is None:
+        return GSTINCheck(gstin, f"GST number has unknown state code {gstin[:2]}")
+    expected = checksum(gstin[:14])
+    if gstin[14] != expected:
+        return GSTINCheck(gstin, f"GST number check character is {gstin[14]}, expected {expected}", state, gstin[2:12])
+    return GSTINCheck(gstin, None, state, gstin[2:12])
+
+_validate_cached = lru_cache(maxsize=65536)(_validate)
+
+def validate_gstin(gstin: Optional[str]) -> GSTINCheck:
+    """Validate one GSTIN (memoized)"""
+    return _validate_cached(normalize(gstin))
+
+def validate_gstins(gstins: Iterable[Optional[str]]) -> Dict[str, GSTINCheck]:
+    """Validate many GSTINs, each distinct value once; keyed by normalized GSTIN"""
+    return {gstin: _validate_cached(gstin) for gstin in set(map(normalize, gstins))}
+
+def same_pan(first: GSTINCheck, second: GSTINCheck) -> Optional[bool]:
+    """Whether two GSTINs belong to the same PAN holder, or None if either is unusable"""
+    if not first.valid or not second.valid:
+        return None
+    return first.pan == second.pan
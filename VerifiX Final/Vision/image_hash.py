@@ -0,0 +1,261 @@
+"""
+image_hash.py - Perceptual hashes of uploaded scans for near-duplicate lookup
+
+The same paper invoice scanned or photographed twice gives different bytes,
+so byte-level caches miss it. Each page image (an uploaded image, its TIFF
+frames, or the scanned image on each page of a PDF) is cropped to its content
+and reduced to difference hashes at two scales:
+
+- coarse: 8x8, 64 bits; tolerant of rescans, recompression and lighting, used
+  to find candidates
+- detail: 32x32, 1024 bits; ranks the candidates, since at the coarse scale
+  invoices printed on one template look alike
+
+A digest of the decoded pixels identifies exact copies (the same scan saved
+again or with different metadata). Perceptual matches are only candidates:
+an invoice reissued with a different number, amount or date is also a near
+duplicate at any hash scale, so the caller must confirm a candidate's fields
+before treating the upload as the earlier document.
+
+NearDuplicateIndex finds earlier documents within a coarse Hamming radius by
+multi-index hashing (Norouzi et al., 2012): the 64 bits are split into chunks
+with one hash table each, and by the pigeonhole principle a match within
+radius r agrees with the query to within r // chunks bits on at least one
+chunk. Only those chunk neighbourhoods are probed, so lookups touch a small
+fraction of the stored hashes however many there are.
+
+Pillow is in requirements.txt; without it (an environment installed without
+it) no hashes are computed and every upload is extracted as before.
+"""
+import base64
+import hashlib
+import io
+import threading
+from array import array
+from functools import lru_cache
+from itertools import combinations
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from project_types import ExtractedData
+from price_index import normalize_vendor
+import text_layer
+
+COARSE_SIZE = 8
+DETAIL_SIZE = 32
+DETAIL_BYTES = DETAIL_SIZE * DETAIL_SIZE // 8
+
+# Fields that identify an invoice; an upload is the earlier document only if all of them agree
+KEY_FIELDS = ('vendor', 'invoiceNo', 'date', 'totalAmount')
+
+# Pages are reduced to about this size before hashing; JPEGs decode straight to it
+WORK_SIZE = 512
+
+# Pixels darker than this, after autocontrast, count as content when cropping margins
+_CONTENT_LEVEL = 192
+_CONTENT_LUT = [255 if v < _CONTENT_LEVEL else 0 for v in range(256)]
+
+_pil = None
+_pil_lock = threading.Lock()
+
+def _load_pil():
+    """Import Pillow on first use; None when it is not installed"""
+    global _pil
+    if _pil is None:
+        with _pil_lock:
+            if _pil is None:
+                try:
+                    from PIL import Image, ImageOps
+                    _pil = (Image, ImageOps)
+                except ImportError:
+                    _pil = False
+    return _pil or None
+
+def available() -> bool:
+    return _load_pil() is not None
+
+class PageHash(NamedTuple):
+    coarse: int
+    detail: int
+    digest: bytes  # Of the decoded pixels, for exact copies
+
+class Match(NamedTuple):
+    """An earlier document whose pages all lie within the search radius"""
+    value: Any
+    coarse: int  # Largest coarse Hamming distance over the pages
+    detail: int  # Largest detail Hamming distance over the pages
+
+# ==================== HASHING ====================
+
+def _dhash(gray, size: int) -> int:
+    """Difference hash: one bit per horizontally adjacent pair of a (size+1) x size thumbnail"""
+    Image, _ = _load_pil()
+    pixels = gray.resize((size + 1, size), Image.Resampling.BOX).tobytes()
+    bits = 0
+    for row in range(0, len(pixels), size + 1):
+        for col in range(row, row + size):
+            bits = (bits << 1) | (pixels[col] < pixels[col + 1])
+    return bits
+
+def hash_image(image) -> PageHash:
+    """Coarse and detail hashes of one page image, cropped to its content, and its pixel digest"""
+    Image, ImageOps = _load_pil()
+    image.draft('L', (WORK_SIZE, WORK_SIZE))  # JPEG: decode at reduced scale
+    gray = image.convert('L')
+    digest = hashlib.blake2b(b'%dx%d:' % gray.size + gray.tobytes(), digest_size=16).digest()
+    gray.thumbnail((WORK_SIZE, WORK_SIZE), Image.Resampling.BILINEAR)
+    gray = ImageOps.autocontrast(gray)
+    bbox = gray.point(_CONTENT_LUT).getbbox()
+    if bbox:
+        gray = gray.crop(bbox)
+    return PageHash(_dhash(gray, COARSE_SIZE), _dhash(gray, DETAIL_SIZE), digest)
+
+def _page_images(data: bytes, mime_type: str) -> List[Any]:
+    Image, _ = _load_pil()
+    if mime_type == 'application/pdf':
+        pypdf = text_layer.load_pypdf()
+        if pypdf is None:
+            return []
+        images = []
+        for page in pypdf.PdfReader(io.BytesIO(data)).pages:
+            embedded = [f.image for f in page.images]
+            if not embedded:
+                return []  # Digital page; the text layer covers these documents
+            images.append(max(embedded, key=lambda im: im.width * im.height))
+        return images
+    if not mime_type.startswith('image/'):
+        return []
+    image = Image.open(io.BytesIO(data))
+    frames = []
+    for i in range(getattr(image, 'n_frames', 1)):
+        image.seek(i)
+        frames.append(image.copy() if i else image)
+    return frames
+
+def hash_document(base64_data: str, mime_type: str) -> List[PageHash]:
+    """Page hashes of a scanned document; empty for digital PDFs, undecodable data or without Pillow"""
+    if not available():
+        return []
+    try:
+        return [hash_image(image) for image in _page_images(base64.b64decode(base64_data), mime_type)]
+    except Exception as e:  # Truncated or unsupported images raise a variety of errors
+        print(f"Perceptual hash skipped: {str(e)}")
+        return []
+
+# ==================== INDEX ====================
+
+@lru_cache(maxsize=64)
+def _flip_masks(width: int, radius: int) -> List[int]:
+    """Every mask of at most radius set bits within width bits"""
+    return [sum(1 << b for b in bits) for r in range(radius + 1) for bits in combinations(range(width), r)]
+
+class NearDuplicateIndex:
+    """
+    Page hashes of earlier documents, searchable by Hamming distance
+
+    Entries are stored columnar (coarse hashes in an array, detail hashes in
+    one bytearray) and referenced by position from the chunk tables, so each
+    stored page costs about 300 bytes including its digest. Adds take a lock; searches take none.
+    """
+
+    def __init__(self, chunks: int = 3):
+        width, extra = divmod(COARSE_SIZE * COARSE_SIZE, chunks)
+        self._chunks = []  # (shift, width) of each chunk
+        shift = 0
+        for i in range(chunks):
+            w = width + (i < extra)
+            self._chunks.append((shift, w))
+            shift += w
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in range(chunks)]
+        self._coarse = array('Q')
+        self._detail = bytearray()
+        self._document = array('L')  # Entry -> document position
+        self._page = array('H')  # Entry -> page number within its document
+        self._documents: List[Tuple[int, Any]] = []  # Document position -> (page count, value)
+        self._exact: Dict[Tuple[bytes, ...], Any] = {}  # Page digests -> value
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def add(self, pages: List[PageHash], value: Any) -> None:
+        """Store a document's page hashes with the value searches should return"""
+        if not pages:
+            return
+        with self._lock:
+            document = len(self._documents)
+            self._documents.append((len(pages), value))
+            self._exact.setdefault(tuple(page.digest for page in pages), value)
+            for number, page in enumerate(pages):
+                entry = len(self._coarse)
+                self._coarse.append(page.coarse)
+                self._detail += page.detail.to_bytes(DETAIL_BYTES, 'big')
+                self._document.append(document)
+                self._page.append(number)
+                for table, (shift, width) in zip(self._tables, self._chunks):
+                    table.setdefault((page.coarse >> shift) & ((1 << width) - 1), []).append(entry)
+
+    def exact(self, pages: List[PageHash]) -> Optional[Any]:
+        """Value stored for a document with exactly these decoded pages, if any"""
+        return self._exact.get(tuple(page.digest for page in pages)) if pages else None
+
+    def _candidates(self, coarse: int, radius: int) -> Set[int]:
+        """Entries that may lie within radius: those within radius // chunks bits on some chunk"""
+        found: Set[int] = set()
+        for table, (shift, width) in zip(self._tables, self._chunks):
+            key = (coarse >> shift) & ((1 << width) - 1)
+            for mask in _flip_masks(width, radius // len(self._chunks)):
+                entries = table.get(key ^ mask)
+                if entries:
+                    found.update(entries)
+        return found
+
+    def search(self, pages: List[PageHash], radius: int) -> List[Match]:
+        """
+        Earlier documents with the same page count whose every page lies within
+        radius coarse bits of the corresponding query page
+
+        Returns:
+            Matches, closest (by detail distance) first
+        """
+        if not pages:
+            return []
+        distances: Dict[int, List[int]] = {}  # Document -> [pages matched, worst coarse, worst detail]
+        for number, page in enumerate(pages):
+            for entry in self._candidates(page.coarse, radius):
+                if self._page[entry] != number:
+                    continue
+                coarse = (self._coarse[entry] ^ page.coarse).bit_count()
+                if coarse > radius:
+                    continue
+                document = self._document[entry]
+                stored = int.from_bytes(self._detail[entry * DETAIL_BYTES:(entry + 1) * DETAIL_BYTES], 'big')
+                detail = (stored ^ page.detail).bit_count()
+                seen = distances.setdefault(document, [0, 0, 0])
+                seen[0] += 1
+                seen[1] = max(seen[1], coarse)
+                seen[2] = max(seen[2], detail)
+
+        matches = []
+        for document, (matched, coarse, detail) in distances.items():
+            page_count, value = self._documents[document]
+            if matched == len(pages) == page_count:
+                matches.append(Match(value, coarse, detail))
+        matches.sort(key=lambda m: m.detail)
+        return matches
+
+def same_details(a: ExtractedData, b: ExtractedData) -> bool:
+    """Whether two (normalized) extractions agree on every key field"""
+    return (normalize_vendor(a.vendor) == normalize_vendor(b.vendor)
+            and _invoice_key(a.invoice_no) == _invoice_key(b.invoice_no)
+            and a.date == b.date and a.total_amount == b.total_amount)
+
+def _invoice_key(invoice_no: Any) -> str:
+    return ' '.join(str(invoice_no).upper().split())
+
+def same_invoice(a: ExtractedData, b: ExtractedData) -> bool:
+    """Whether two extractions describe one invoice: same vendor and number, or same vendor, date and total"""
+    if normalize_vendor(a.vendor) != normalize_vendor(b.vendor):
+        return False
+    if a.invoice_no and _invoice_key(a.invoice_no) == _invoice_key(b.invoice_no):
+        return True
+    return a.date == b.date and a.total_amount == b.total_amount
@@ -1,21 +1,36 @@
 """
 matching_service.py - Service for matching invoices with reference PO documents
 """
+import copy
+import hashlib
 import json
-import google.generativeai as genai
 from typing import Optional, Dict
 from project_types import ExtractedData, LineItem
 from config import Config
+from model_client import generate, lazy_model
+from metrics import record_fallback
+from deadlines import DeadlineExceeded, degraded, expired
+from price_index import normalize_vendor
+from single_flight import SingleFlight
 from dataclasses import asdict
 
+# Provenance values for reference POs that were generated rather than uploaded
+PROVENANCE_SYNTHETIC = "synthetic"
+PROVENANCE_SYNTHETIC_FALLBACK = "synthetic_fallback"
+
+# Legal-form words abbreviated inconsistently across documents from one vendor
+LEGAL_FORMS = {'limited': 'ltd', 'private': 'pvt', 'company': 'co', 'corporation': 'corp', 'incorporated': 'inc'}
+
 class MatchingService:
     """Service for finding and generating reference PO documents"""
     
+    model = lazy_model()
+    
     def __init__(self, api_key: Optional[str] = None):
         """Initialize the matching service with Gemini API"""
         self.api_key = api_key or Config.GEMINI_API_KEY
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel(Config.GEMINI_MODEL)
+        self._po_in_flight = SingleFlight('po_generation')
+        self._vendor_in_flight = SingleFlight('vendor_equivalence')
     
     def find_matching_po(
         self, 
@@ -37,6 +52,34 @@ class MatchingService:
         
         return po_repository.get(invoice.po_no)
     
+    def invoice_fingerprint(self, invoice: ExtractedData) -> str:
+        """
+        Stable fingerprint of the invoice content a generated PO depends on
+        
+        Vendor, amounts and line items only; invoice number and date are left
+        out so a re-uploaded copy of the same bill maps to the same PO.
+        """
+        def amount(value) -> str:
+            try:
+                return f"{float(value):.2f}"
+            except (TypeError, ValueError):
+                return str(value)
+        
+        parts = [
+            ' '.join(str(invoice.vendor).lower().split()),
+            amount(invoice.total_amount),
+            amount(invoice.tax_amount),
+        ]
+        for item in invoice.line_items:
+            parts.append('|'.join((
+                ' '.join(str(item.description).lower().split()),
+                amount(item.quantity),
+                amount(item.unit_price),
+                amount(item.total),
+                item.hsn_code or ''
+            )))
+        return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+    
     def generate_reference_po(self, invoice: ExtractedData) -> ExtractedData:
         """
         Generate a realistic reference PO based on invoice context
@@ -46,23 +89,39 @@ class MatchingService:
         
         Returns:
             Generated PO as ExtractedData
+        
+        Raises:
+            DeadlineExceeded: The audit ran out of time; the caller decides
+                what to do without a PO rather than receiving a mock one
         """
         if not self.api_key or self.api_key == 'Your API key':
             print("WARNING: No valid Gemini API key found. Using mock PO generation.")
+            record_fallback('po_generation', 'no_api_key')
             return self._get_mock_po(invoice)
 
         prompt = self._build_po_generation_prompt(invoice)
         
-        try:
-            response = self.model.generate_content(prompt)
+        def generate_po() -> ExtractedData:
+            response = generate('po_generation', self.model, prompt)
             response_text = self._clean_json_response(response.text)
             data = json.loads(response_text)
             
-            return self._convert_to_extracted_data(data)
+            po = self._convert_to_extracted_data(data)
+            po.provenance = PROVENANCE_SYNTHETIC
+            return po
+        
+        try:
+            # Keyed like the generated-PO cache, so concurrent audits of the same bill share one PO
+            po, _ = self._po_in_flight.do(self.invoice_fingerprint(invoice), generate_po)
+            # Each audit normalizes its own copy
+            return copy.deepcopy(po)
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             print(f"Error calling Gemini API for PO: {str(e)}")
             print("Falling back to mock PO due to API error.")
+            record_fallback('po_generation', 'api_error')
             return self._get_mock_po(invoice)
 
     def _get_mock_po(self, invoice: ExtractedData) -> ExtractedData:
@@ -95,9 +154,10 @@ class MatchingService:
             date=po_date,
             total_amount=invoice.total_amount, # Exact match for simplified demo
             tax_amount=invoice.tax_amount,
-            gst_no="27AABCU9603R1ZN",
+            gst_no=invoice.gst_no or "27AABCU9603R1ZN",
             po_no=invoice.po_no or f"PO-{random.randint(10000, 99999)}",
-            line_items=mock_line_items
+            line_items=mock_line_items,
+            provenance=PROVENANCE_SYNTHETIC_FALLBACK
         )
     
     def is_semantically_equivalent(self, name1: str, name2: str) -> bool:
@@ -120,6 +180,10 @@ class MatchingService:
             
         if not self.api_key or self.api_key == 'Your API key':
             return False
+        
+        if expired():
+            degraded('vendor_match')
+            return self.is_locally_equivalent(name1, name2)
 
         prompt = f"""
         Determine if these two entity names refer to the same organization/vendor:
@@ -130,12 +194,29 @@ class MatchingService:
         Return ONLY 'True' if they are the same entity, 'False' otherwise.
         """
         
-        try:
-            response = self.model.generate_content(prompt)
+        def ask() -> bool:
+            response = generate('vendor_equivalence', self.model, prompt)
             return 'true' in response.text.lower()
+        
+        # Equivalence is symmetric, so the pair is keyed in either order
+        key = '\n'.join(sorted((' '.join(name1.lower().split()), ' '.join(name2.lower().split()))))
+        try:
+            equivalent, _ = self._vendor_in_flight.do(key, ask)
+            return equivalent
+        except DeadlineExceeded:
+            record_fallback('vendor_equivalence', 'deadline')
+            degraded('vendor_match')
+            return self.is_locally_equivalent(name1, name2)
         except:
+            record_fallback('vendor_equivalence', 'api_error')
             return False
 
+    def is_locally_equivalent(self, name1: str, name2: str) -> bool:
+        """Vendor comparison without the model: case, punctuation and legal-form abbreviations ignored"""
+        def key(name: str) -> str:
+            return ' '.join(LEGAL_FORMS.get(word, word) for word in normalize_vendor(name).split())
+        return key(name1) == key(name2)
+
     def calculate_match_score(
         self, 
         invoice: ExtractedData, 
@@ -0,0 +1,154 @@
+"""
+normalization.py - Canonical form for extracted document fields
+
+Runs once per document right after extraction, so rules, indexes and caches
+compare canonical values:
+
+- amounts and quantities: numbers, from strings like "₹1,23,456.50" or "Rs. 500/-"
+- dates: ISO YYYY-MM-DD, from day-first and month-name formats
+- GSTINs: upper case without spaces or hyphens
+- PO numbers: upper case without whitespace, "PO No:" style labels dropped
+- HSN/SAC codes: digits only
+
+Parsers are precompiled regexes with memoized results, since the same date
+and amount strings recur across documents. Values that cannot be parsed are
+left as extracted. Every rewritten field is recorded on the document.
+"""
+import re
+from datetime import date
+from functools import lru_cache
+from typing import Any, List, Optional
+
+from gstin import normalize as normalize_gstin
+from project_types import ExtractedData
+
+_CACHE_SIZE = 8192
+
+# ==================== AMOUNTS ====================
+
+_CURRENCY = re.compile(r"(?i)(₹|\bINR\b|\bRs\b\.?|/-)")
+_AMOUNT = re.compile(r"[-+]?(?:\d+|\d{1,3}(?:,\d{2,3})+)(?:\.\d+)?")
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def parse_amount(text: str) -> Optional[float]:
+    """Number in an amount string with ₹/Rs/INR and Indian or Western digit grouping"""
+    cleaned = _CURRENCY.sub('', text).replace(' ', '').strip()
+    negative = cleaned.startswith('(') and cleaned.endswith(')')
+    match = _AMOUNT.fullmatch(cleaned.strip('()'))
+    if not match:
+        return None
+    value = float(match.group().replace(',', ''))
+    return -value if negative else value
+
+_QUANTITY = re.compile(r"\s*([-+]?\d[\d,]*(?:\.\d+)?)\s*[A-Za-z.]*\s*")
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def parse_quantity(text: str) -> Optional[float]:
+    """Number in a quantity string, ignoring a trailing unit ("10 Nos", "2.5 kg")"""
+    match = _QUANTITY.fullmatch(text)
+    if not match:
+        return None
+    try:
+        return float(match.group(1).replace(',', ''))
+    except ValueError:
+        return None
+
+# ==================== DATES ====================
+
+_MONTHS = {name: i for i, name in enumerate(
+    ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'), 1)}
+_ORDINAL = r"(?:st|nd|rd|th)?"
+_ISO_DATE = re.compile(r"(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})(?:[T ].*)?")
+_DAY_FIRST = re.compile(r"(\d{1,2})[-/.](\d{1,2})[-/.](\d{2}|\d{4})")
+_DAY_MONTH_NAME = re.compile(rf"(\d{{1,2}}){_ORDINAL}[\s\-/.]*([A-Za-z]{{3,9}})\.?[\s\-/.,]*(\d{{2}}|\d{{4}})")
+_MONTH_NAME_DAY = re.compile(rf"([A-Za-z]{{3,9}})\.?\s+(\d{{1,2}}){_ORDINAL},?\s+(\d{{4}})")
+
+def _year(text: str) -> int:
+    year = int(text)
+    return 2000 + year if year < 100 else year
+
+def _month(name: str) -> Optional[int]:
+    return _MONTHS.get(name[:3].lower())
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def parse_date(text: str) -> Optional[str]:
+    """ISO date for common invoice date formats; numeric dates are read day-first"""
+    text = text.strip()
+    parts = None
+    match = _ISO_DATE.fullmatch(text)
+    if match:
+        parts = int(match.group(1)), int(match.group(2)), int(match.group(3))
+    elif (match := _DAY_FIRST.fullmatch(text)):
+        parts = _year(match.group(3)), int(match.group(2)), int(match.group(1))
+    elif (match := _DAY_MONTH_NAME.fullmatch(text)):
+        parts = _year(match.group(3)), _month(match.group(2)), int(match.group(1))
+    elif (match := _MONTH_NAME_DAY.fullmatch(text)):
+        parts = _year(match.group(3)), _month(match.group(1)), int(match.group(2))
+    if not parts or parts[1] is None:
+        return None
+    try:
+        return date(*parts).isoformat()
+    except ValueError:
+        return None
+
+# ==================== IDENTIFIERS ====================
+
+_PO_LABEL = re.compile(r"(?i)^\s*(?:P\.?\s*O\.?|PURCHASE\s+ORDER)\s*(?:NO\.?|NUMBER|#)\s*[:.\-]?\s*")
+_WHITESPACE = re.compile(r"\s+")
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def normalize_po_number(text: str) -> Optional[str]:
+    """Upper case, whitespace removed, leading "PO No:" style label dropped"""
+    canonical = _WHITESPACE.sub('', _PO_LABEL.sub('', text)).upper()
+    return canonical or None
+
+_NON_DIGIT = re.compile(r"\D")
+
+def normalize_hsn_code(text: str) -> Optional[str]:
+    """HSN/SAC code as digits only"""
+    return _NON_DIGIT.sub('', text) or None
+
+# ==================== DOCUMENTS ====================
+
+def _number(value: Any, parser) -> Any:
+    if isinstance(value, str):
+        parsed = parser(value)
+        if parsed is not None:
+            return int(parsed) if parser is parse_quantity and parsed.is_integer() else parsed
+    return value
+
+def normalize_document(doc: ExtractedData) -> List[str]:
+    """
+    Rewrite a document's fields into canonical form, in place
+
+    Args:
+        doc: Freshly extracted (or generated) document
+
+    Returns:
+        Names of the fields that changed, also stored on doc.normalized_fields
+    """
+    changed = []
+
+    def update(obj, attr: str, value: Any, name: str) -> None:
+        if value != getattr(obj, attr) or type(value) is not type(getattr(obj, attr)):
+            setattr(obj, attr, value)
+            changed.append(name)
+
+    update(doc, 'total_amount', _number(doc.total_amount, parse_amount), 'total_amount')
+    update(doc, 'tax_amount', _number(doc.tax_amount, parse_amount), 'tax_amount')
+    if isinstance(doc.date, str):
+        update(doc, 'date', parse_date(doc.date) or doc.date, 'date')
+    if doc.gst_no:
+        update(doc, 'gst_no', normalize_gstin(str(doc.gst_no)) or None, 'gst_no')
+    if doc.po_no:
+        update(doc, 'po_no', normalize_po_number(str(doc.po_no)), 'po_no')
+
+    for i, item in enumerate(doc.line_items):
+        update(item, 'quantity', _number(item.quantity, parse_quantity), f'line_items[{i}].quantity')
+        update(item, 'unit_price', _number(item.unit_price, parse_amount), f'line_items[{i}].unit_price')
+        update(item, 'total', _number(item.total, parse_amount), f'line_items[{i}].total')
+        if item.hsn_code:
+            update(item, 'hsn_code', normalize_hsn_code(str(item.hsn_code)), f'line_items[{i}].hsn_code')
+
+    doc.normalized_fields = changed or None
+    return changed
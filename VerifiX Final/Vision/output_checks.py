@@ -0,0 +1,61 @@
+"""
+output_checks.py - Local checks on model output, for model tier escalation
+
+A cheaper tier's extraction or decision is accepted only when these find
+nothing; otherwise model_client.tiered_call escalates to the next tier. Each
+check returns short issue codes (also the escalation metric's reason label),
+empty when the output passes.
+
+The checks reuse the deterministic validators the rules engine runs, so a
+cheap tier is trusted exactly when its output is self-consistent: required
+fields present and typed, dates parseable, GSTIN checksum valid, and line
+items adding up to the stated totals.
+"""
+import copy
+from typing import List
+
+from arithmetic import check_invoice
+from gstin import validate_gstin
+from normalization import normalize_document, parse_date
+from project_types import AuditDecision, AuditFlag, ExtractedData, RiskLevel
+
+RECOMMENDATIONS = ('APPROVE', 'REVIEW', 'REJECT')
+
+def _number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def extraction_issues(document: ExtractedData) -> List[str]:
+    """Issues with an extracted invoice that a stronger tier might not have"""
+    doc = copy.deepcopy(document)
+    normalize_document(doc)
+    issues = []
+
+    if not str(doc.vendor or '').strip() or not str(doc.invoice_no or '').strip() or not doc.line_items:
+        issues.append('missing_field')
+    if not _number(doc.total_amount) or not _number(doc.tax_amount) or not all(
+            _number(item.quantity) and _number(item.unit_price) and _number(item.total) for item in doc.line_items):
+        issues.append('schema')
+    if not isinstance(doc.date, str) or parse_date(doc.date) is None:
+        issues.append('date')
+    if doc.gst_no and not validate_gstin(doc.gst_no).valid:
+        issues.append('gstin')
+    if not check_invoice(doc).ok:
+        issues.append('arithmetic')
+    return issues
+
+def decision_issues(decision: AuditDecision, flags: List[AuditFlag]) -> List[str]:
+    """Issues with an audit decision: malformed fields, or a recommendation the flags contradict"""
+    issues = []
+    recommendation = str(decision.recommendation or '').strip().upper()
+    if (not _number(decision.risk_score) or not 0 <= decision.risk_score <= 100
+            or not decision.reasoning_steps or not str(decision.explanation or '').strip()
+            or not recommendation.startswith(RECOMMENDATIONS)):
+        issues.append('schema')
+        return issues
+
+    high = any(flag.severity == RiskLevel.HIGH for flag in flags)
+    if high and (recommendation.startswith('APPROVE') or decision.risk_level == RiskLevel.LOW):
+        issues.append('contradicts_flags')
+    elif not flags and recommendation.startswith('REJECT'):
+        issues.append('contradicts_flags')
+    return issues
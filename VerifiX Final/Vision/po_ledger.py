@@ -0,0 +1,102 @@
+"""
+po_ledger.py - Running consumption of each Purchase Order across invoices
+
+Archiving an invoice that references a PO adds its total amount, and the
+quantity of each of its line items, to that PO's ledger entry. Audits read
+the running totals directly instead of rescanning earlier invoices. Each
+invoice number counts once per PO: archiving a re-audited invoice replaces
+its earlier contribution.
+"""
+import threading
+from typing import Dict, Optional
+
+from project_types import ExtractedData, LineItem
+
+def line_key(item: LineItem) -> str:
+    """Key matching invoice lines to PO lines: HSN code when present, else the description"""
+    if item.hsn_code:
+        return 'hsn:' + ''.join(c for c in str(item.hsn_code) if c.isalnum())
+    return 'desc:' + ' '.join(str(item.description).lower().split())
+
+def _invoice_key(invoice: ExtractedData) -> str:
+    return ' '.join(str(invoice.invoice_no).upper().split())
+
+class _Contribution:
+    __slots__ = ('amount', 'quantities')
+
+    def __init__(self, invoice: ExtractedData):
+        self.amount = float(invoice.total_amount)
+        self.quantities: Dict[str, float] = {}
+        for item in invoice.line_items:
+            key = line_key(item)
+            self.quantities[key] = self.quantities.get(key, 0.0) + float(item.quantity)
+
+class POConsumption:
+    """Amount and per-line quantity billed against one PO so far"""
+
+    __slots__ = ('invoice_count', 'amount', 'quantities', 'contributions')
+
+    def __init__(self):
+        self.invoice_count = 0
+        self.amount = 0.0
+        self.quantities: Dict[str, float] = {}
+        self.contributions: Dict[str, _Contribution] = {}
+
+    def _apply(self, contribution: _Contribution, sign: int) -> None:
+        self.invoice_count += sign
+        self.amount += sign * contribution.amount
+        for key, quantity in contribution.quantities.items():
+            self.quantities[key] = self.quantities.get(key, 0.0) + sign * quantity
+
+class POLedger:
+    """Consumed amount and quantities per PO number, updated as invoices are archived"""
+
+    def __init__(self):
+        self._entries: Dict[str, POConsumption] = {}
+        self._lock = threading.Lock()
+
+    def record(self, invoice: ExtractedData) -> None:
+        """Add an archived invoice's billing to its PO; no-op without a PO reference"""
+        if not invoice.po_no:
+            return
+        try:
+            contribution = _Contribution(invoice)
+        except (TypeError, ValueError):
+            return  # Non-numeric amounts cannot be accumulated
+        invoice_key = _invoice_key(invoice)
+        with self._lock:
+            entry = self._entries.get(invoice.po_no)
+            if entry is None:
+                entry = self._entries[invoice.po_no] = POConsumption()
+            previous = entry.contributions.get(invoice_key)
+            if previous is not None:
+                entry._apply(previous, -1)
+            entry.contributions[invoice_key] = contribution
+            entry._apply(contribution, 1)
+
+    def consumed(self, po_no: str, excluding: Optional[ExtractedData] = None) -> Optional[POConsumption]:
+        """
+        Snapshot of what has been billed against po_no
+
+        Args:
+            po_no: PO number
+            excluding: Invoice whose own earlier contribution (if it was
+                archived before) should be left out, so a re-audit is not
+                counted against itself
+
+        Returns:
+            POConsumption without per-invoice detail, or None if no other
+            invoice has billed this PO
+        """
+        with self._lock:
+            entry = self._entries.get(po_no)
+            if entry is None:
+                return None
+            snapshot = POConsumption()
+            snapshot.invoice_count = entry.invoice_count
+            snapshot.amount = entry.amount
+            snapshot.quantities = dict(entry.quantities)
+            own = entry.contributions.get(_invoice_key(excluding)) if excluding is not None else None
+        if own is not None:
+            snapshot._apply(own, -1)
+        return snapshot if snapshot.invoice_count else None
@@ -0,0 +1,211 @@
+"""
+price_index.py - Historical unit prices per vendor and HSN code
+
+Every archived line item updates running statistics for its normalized
+vendor + HSN key: count, mean and variance (Welford) and streaming quantile
+estimates (P-squared). Updates and lookups are constant time and memory per
+key is fixed, however many invoices the archive has seen.
+
+Each invoice (vendor + invoice number) counts once: a re-audit or a reused
+near-duplicate upload is not added again, since repeated prices would
+inflate the count and shrink the variance. The streaming estimates cannot
+retract an observation, so the first archived copy is the one counted. Only
+the most recent Config.PRICE_INDEX_SEEN_INVOICES invoices are remembered, so
+this memory is bounded too; a copy of an older invoice counts again.
+"""
+import math
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from config import Config
+from project_types import ExtractedData, LineItem
+
+PriceKey = Tuple[str, str]
+
+def normalize_vendor(name: str) -> str:
+    """Case- and punctuation-insensitive vendor key"""
+    cleaned = ''.join(c if c.isalnum() else ' ' for c in str(name).lower())
+    return ' '.join(cleaned.split())
+
+def normalize_hsn(code: Optional[str]) -> Optional[str]:
+    """HSN/SAC code with spaces and dots removed"""
+    if not code:
+        return None
+    return ''.join(c for c in str(code) if c.isalnum()) or None
+
+class P2Quantile:
+    """
+    P-squared streaming estimate of one quantile (Jain & Chlamtac, 1985)
+
+    Five markers track the minimum, the p/2, p and (1+p)/2 quantiles and the
+    maximum; each observation adjusts them in constant time.
+    """
+
+    __slots__ = ('p', 'heights', 'positions', 'desired', 'increments')
+
+    def __init__(self, p: float):
+        self.p = p
+        self.heights: List[float] = []
+        self.positions = [0, 1, 2, 3, 4]
+        self.desired = [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0]
+        self.increments = (0.0, p / 2, p, (1 + p) / 2, 1.0)
+
+    def add(self, x: float) -> None:
+        q = self.heights
+        if len(q) < 5:
+            q.append(x)
+            q.sort()
+            return
+
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+
+        n = self.positions
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        for i in (1, 2, 3):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                step = 1 if d > 0 else -1
+                height = self._parabolic(i, step)
+                if not q[i - 1] < height < q[i + 1]:
+                    height = q[i] + step * (q[i + step] - q[i]) / (n[i + step] - n[i])
+                q[i] = height
+                n[i] += step
+
+    def _parabolic(self, i: int, d: int) -> float:
+        q, n = self.heights, self.positions
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+            (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def value(self) -> Optional[float]:
+        q = self.heights
+        if not q:
+            return None
+        if len(q) < 5:
+            return q[min(len(q) - 1, int(round(self.p * (len(q) - 1))))]
+        return q[2]
+
+class PriceStats:
+    """Running unit-price statistics for one vendor + HSN key"""
+
+    __slots__ = ('count', 'mean', '_m2', 'median', 'p95')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.median = P2Quantile(0.5)
+        self.p95 = P2Quantile(0.95)
+
+    def add(self, price: float) -> None:
+        self.count += 1
+        delta = price - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (price - self.mean)
+        self.median.add(price)
+        self.p95.add(price)
+
+    @property
+    def variance(self) -> float:
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    def snapshot(self) -> 'PriceSummary':
+        return PriceSummary(self.count, self.mean, self.std, self.median.value(), self.p95.value())
+
+class PriceSummary:
+    """Immutable view of a key's statistics, safe to read outside the index lock"""
+
+    __slots__ = ('count', 'mean', 'std', 'median', 'p95')
+
+    def __init__(self, count: int, mean: float, std: float, median: Optional[float], p95: Optional[float]):
+        self.count = count
+        self.mean = mean
+        self.std = std
+        self.median = median
+        self.p95 = p95
+
+    def z_score(self, price: float) -> Optional[float]:
+        """Standard deviations from the mean, or None when the history has no spread"""
+        return (price - self.mean) / self.std if self.std > 0 else None
+
+class PriceIndex:
+    """Unit-price history keyed by normalized vendor + HSN code"""
+
+    def __init__(self, max_seen_invoices: int = Config.PRICE_INDEX_SEEN_INVOICES):
+        self._stats: Dict[PriceKey, PriceStats] = {}
+        self._invoices: 'OrderedDict[Tuple[str, str], None]' = OrderedDict()  # Invoices already counted, oldest first
+        self.max_seen_invoices = max_seen_invoices
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(vendor: str, hsn_code: Optional[str]) -> Optional[PriceKey]:
+        hsn = normalize_hsn(hsn_code)
+        vendor_key = normalize_vendor(vendor)
+        if not hsn or not vendor_key:
+            return None
+        return vendor_key, hsn
+
+    def add_line_item(self, vendor: str, item: LineItem) -> None:
+        """Record one line item's unit price; items without an HSN code or price are skipped"""
+        key = self.key(vendor, item.hsn_code)
+        if key is None:
+            return
+        try:
+            price = float(item.unit_price)
+        except (TypeError, ValueError):
+            return
+        if not math.isfinite(price) or price <= 0:
+            return
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = PriceStats()
+            stats.add(price)
+
+    @staticmethod
+    def invoice_key(invoice: ExtractedData) -> Tuple[str, str]:
+        return normalize_vendor(invoice.vendor), ' '.join(str(invoice.invoice_no).upper().split())
+
+    def add_invoice(self, invoice: ExtractedData) -> None:
+        """Record every line item of an archived invoice, unless this invoice was recorded before"""
+        key = self.invoice_key(invoice)
+        with self._lock:
+            if key in self._invoices:
+                self._invoices.move_to_end(key)
+                return
+            self._invoices[key] = None
+            if len(self._invoices) > self.max_seen_invoices:
+                self._invoices.popitem(last=False)
+        for item in invoice.line_items:
+            self.add_line_item(invoice.vendor, item)
+
+    def lookup(self, vendor: str, hsn_code: Optional[str]) -> Optional[PriceSummary]:
+        """Statistics for a vendor + HSN code, or None when nothing was archived for it"""
+        key = self.key(vendor, hsn_code)
+        if key is None:
+            return None
+        with self._lock:
+            stats = self._stats.get(key)
+            return stats.snapshot() if stats else None
+
+    def __len__(self) -> int:
+        return len(self._stats)
@@ -0,0 +1,105 @@
+"""
+profiling.py - Opt-in per-audit profiling
+
+An audit is profiled when an authorized caller asks for it (X-VerifiX-Profile
+header or ?profile= query parameter carrying Config.PROFILE_TOKEN) or when it
+falls into the Config.PROFILE_SAMPLE_RATE sample. Profiles are kept in a
+bounded in-memory store keyed by audit id. With no token configured and a
+zero sample rate, the per-request check returns immediately.
+"""
+import cProfile
+import hmac
+import io
+import marshal
+import pstats
+import random
+import threading
+import time
+from collections import OrderedDict
+from typing import Mapping, Optional
+
+from config import Config
+
+# None selects cProfile's built-in wall-clock timer
+CLOCKS = {
+    'wall': None,
+    'cpu': time.thread_time,
+}
+
+def is_authorized(token: Optional[str]) -> bool:
+    """Constant-time comparison against Config.PROFILE_TOKEN"""
+    return bool(Config.PROFILE_TOKEN and token and hmac.compare_digest(token, Config.PROFILE_TOKEN))
+
+def profile_clock_for(headers: Mapping[str, str], args: Mapping[str, str]) -> Optional[str]:
+    """Return the clock to profile this request with, or None to run unprofiled"""
+    if not Config.PROFILE_TOKEN and not Config.PROFILE_SAMPLE_RATE:
+        return None
+    clock = args.get('profile_clock', 'wall')
+    if clock not in CLOCKS:
+        clock = 'wall'
+    if is_authorized(headers.get('X-VerifiX-Profile') or args.get('profile')):
+        return clock
+    if Config.PROFILE_SAMPLE_RATE and random.random() < Config.PROFILE_SAMPLE_RATE:
+        return 'wall'
+    return None
+
+class ProfileStore:
+    """Most recent profiles by audit id, oldest evicted first"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._profiles: 'OrderedDict[str, bytes]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, audit_id: str, stats: bytes) -> None:
+        with self._lock:
+            self._profiles[audit_id] = stats
+            self._profiles.move_to_end(audit_id)
+            while len(self._profiles) > self.max_entries:
+                self._profiles.popitem(last=False)
+
+    def get(self, audit_id: str) -> Optional[bytes]:
+        with self._lock:
+            return self._profiles.get(audit_id)
+
+profile_store = ProfileStore(Config.PROFILE_STORE_SIZE)
+
+class ProfileCapture:
+    """Profiles the calling thread between start() and save()"""
+
+    def __init__(self, clock: str):
+        self.clock = clock
+        timer = CLOCKS[clock]
+        self.profiler = cProfile.Profile(timer) if timer else cProfile.Profile()
+
+    def start(self) -> 'ProfileCapture':
+        self.profiler.enable()
+        return self
+
+    def save(self, audit_id: str) -> None:
+        """Stop profiling and store the stats in pstats' marshal format"""
+        self.profiler.disable()
+        self.profiler.create_stats()
+        profile_store.put(audit_id, marshal.dumps(self.profiler.stats))
+
+    def discard(self) -> None:
+        self.profiler.disable()
+
+def start_capture(clock: Optional[str]) -> Optional[ProfileCapture]:
+    """Begin profiling when a clock was chosen for this request"""
+    return ProfileCapture(clock).start() if clock else None
+
+class _StoredStats:
+    """Minimal profile-like object pstats.Stats can load from"""
+
+    def __init__(self, stats: bytes):
+        self.stats = marshal.loads(stats)
+
+    def create_stats(self) -> None:
+        pass
+
+def render_text(stats: bytes, limit: int = 50) -> str:
+    """Top functions by cumulative time, as pstats prints them"""
+    out = io.StringIO()
+    pstats.Stats(_StoredStats(stats), stream=out).sort_stats('cumulative').print_stats(limit)
+    return out.getvalue()
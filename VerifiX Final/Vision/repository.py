@@ -1,18 +1,125 @@
 """
 repository.py - Data repository for storing invoices and PO documents
 """
-from typing import Dict, List, Optional
+import sys
+import threading
+import uuid
+from array import array
+from dataclasses import replace
+from typing import Dict, List, Optional, Union
 from project_types import ExtractedData, LineItem, BoundingBox, FieldCoordinates
+from config import Config
+from image_hash import NearDuplicateIndex
+from po_ledger import POLedger
+from price_index import PriceIndex
+
+_NO_BOX = (float('nan'),) * 4
+
+# Flag bits recording which of an item's numbers were ints, so 41000 stays 41000 and 10.0 stays 10.0
+_INT_QUANTITY, _INT_UNIT_PRICE, _INT_TOTAL, _INT_COORDS = 1, 2, 4, 8
+
+def _int_flags(item: LineItem) -> int:
+    box = item.coords
+    return ((_INT_QUANTITY if isinstance(item.quantity, int) else 0) |
+            (_INT_UNIT_PRICE if isinstance(item.unit_price, int) else 0) |
+            (_INT_TOTAL if isinstance(item.total, int) else 0) |
+            (_INT_COORDS if box and all(isinstance(v, int) for v in (box.x, box.y, box.w, box.h)) else 0))
+
+def _box(values, as_int: bool) -> BoundingBox:
+    return BoundingBox(*(int(v) for v in values)) if as_int else BoundingBox(*values)
+
+# Below this many line items the per-invoice array headers outweigh the savings
+COLUMNAR_MIN_LINE_ITEMS = 4
+
+class LineItemColumns:
+    """Columnar storage for an invoice's line items: numbers in typed arrays, strings interned"""
+    
+    __slots__ = ('descriptions', 'quantities', 'unit_prices', 'totals', 'int_flags', 'hsn_codes', 'coords')
+    
+    def __init__(self, items: List[LineItem]):
+        self.descriptions = [sys.intern(item.description) for item in items]
+        self.quantities = array('d', (item.quantity for item in items))
+        self.unit_prices = array('d', (item.unit_price for item in items))
+        self.totals = array('d', (item.total for item in items))
+        self.int_flags = array('b', (_int_flags(item) for item in items))
+        self.hsn_codes = [sys.intern(item.hsn_code) if item.hsn_code else None for item in items]
+        # Boxes flattened to x, y, w, h quadruples; NaN marks a missing box
+        if any(item.coords for item in items):
+            self.coords = array('d')
+            for item in items:
+                box = item.coords
+                self.coords.extend((box.x, box.y, box.w, box.h) if box else _NO_BOX)
+        else:
+            self.coords = None
+    
+    def __len__(self) -> int:
+        return len(self.descriptions)
+    
+    def to_line_items(self) -> List[LineItem]:
+        """Rebuild LineItem objects"""
+        coords = self.coords
+        return [
+            LineItem(
+                description=self.descriptions[i],
+                quantity=int(self.quantities[i]) if flags & _INT_QUANTITY else self.quantities[i],
+                unit_price=int(self.unit_prices[i]) if flags & _INT_UNIT_PRICE else self.unit_prices[i],
+                total=int(self.totals[i]) if flags & _INT_TOTAL else self.totals[i],
+                hsn_code=self.hsn_codes[i],
+                coords=None if coords is None or coords[4 * i] != coords[4 * i] else
+                       _box(coords[4 * i:4 * i + 4], flags & _INT_COORDS)
+            )
+            for i, flags in enumerate(self.int_flags)
+        ]
+
+class ArchivedInvoice:
+    """Compact archive entry: invoice header plus columnar line items"""
+    
+    __slots__ = ('header', 'line_items')
+    
+    def __init__(self, invoice: ExtractedData):
+        self.header = replace(invoice, line_items=[])
+        self.line_items = LineItemColumns(invoice.line_items)
+    
+    def to_extracted_data(self) -> ExtractedData:
+        """Rebuild the full ExtractedData"""
+        return replace(self.header, line_items=self.line_items.to_line_items())
 
 class StatutoryArchive:
-    """Repository for statutory documents"""
+    """
+    Repository for statutory documents
+    
+    With Config.ARCHIVE_COLUMNAR_LINE_ITEMS, invoices are kept as compact
+    ArchivedInvoice entries and rebuilt on read.
+    
+    Safe to share between request threads: invoices and POs are guarded by
+    separate locks, so invoice archiving never blocks PO lookups. Single-key
+    reads rely on dict.get being atomic and take no lock at all.
+    
+    invoices_version and pos_version count changes, so readers can tell a
+    snapshot is current (and reuse its serialized form) without rebuilding it.
+    """
     
     def __init__(self):
         """Initialize the archive with sample data"""
-        self.user_uploaded_invoice: List[ExtractedData] = []
+        self._invoice_lock = threading.Lock()
+        self._po_lock = threading.Lock()
+        self.columnar = Config.ARCHIVE_COLUMNAR_LINE_ITEMS
+        # Distinguishes this archive's versions from another worker's or an earlier process's
+        self.instance = uuid.uuid4().hex[:8]
+        self.invoices_version = 0
+        self.pos_version = 0
+        self.user_uploaded_invoice: List[Union[ExtractedData, ArchivedInvoice]] = []
         self.reference_documents: Dict[str, ExtractedData] = {
             "PO/MEITY/2024/221": self._create_sample_po()
         }
+        # Synthetic reference POs by invoice fingerprint, so re-audits reuse them
+        self.generated_pos: Dict[str, ExtractedData] = {}
+        # Unit-price history of archived line items, maintained on every add_invoice
+        self.price_index = PriceIndex()
+        # Amount and quantities billed so far against each PO number
+        self.po_ledger = POLedger()
+        # Perceptual hashes of scanned uploads, returning the extraction made from each
+        self.near_duplicates = NearDuplicateIndex(Config.NEAR_DUPLICATE_INDEX_CHUNKS)
     
     def _create_sample_po(self) -> ExtractedData:
         """Create sample PO for testing"""
@@ -22,7 +129,7 @@ class StatutoryArchive:
             date="2024-01-15",
             total_amount=500000.0,
             tax_amount=90000.0,
-            gst_no="29ABCDE1234F1Z5",
+            gst_no="29AABCT1332L1ZA",
             po_no="PO/MEITY/2024/221",
             line_items=[
                 LineItem(
@@ -37,23 +144,60 @@ class StatutoryArchive:
     
     def add_invoice(self, invoice: ExtractedData) -> None:
         """Add invoice to archive"""
-        self.user_uploaded_invoice.append(invoice)
+        self.price_index.add_invoice(invoice)
+        self.po_ledger.record(invoice)
+        entry = invoice
+        if self.columnar and len(invoice.line_items) >= COLUMNAR_MIN_LINE_ITEMS:
+            try:
+                entry = ArchivedInvoice(invoice)
+            except (TypeError, ValueError):
+                pass  # Non-numeric line item values; keep the invoice as-is
+        with self._invoice_lock:
+            self.user_uploaded_invoice.append(entry)
+            self.invoices_version += 1
     
     def add_po(self, po_no: str, po: ExtractedData) -> None:
         """Add PO to archive"""
-        self.reference_documents[po_no] = po
+        with self._po_lock:
+            self.reference_documents[po_no] = po
+            self.pos_version += 1
+    
+    def add_po_if_absent(self, po_no: str, po: ExtractedData) -> ExtractedData:
+        """Add PO unless one is already stored under po_no; return the stored PO"""
+        with self._po_lock:
+            stored = self.reference_documents.setdefault(po_no, po)
+            if stored is po:
+                self.pos_version += 1
+            return stored
+    
+    def get_generated_po(self, fingerprint: str) -> Optional[ExtractedData]:
+        """Retrieve the synthetic PO generated for an invoice fingerprint"""
+        return self.generated_pos.get(fingerprint)
+    
+    def add_generated_po_if_absent(self, fingerprint: str, po: ExtractedData) -> ExtractedData:
+        """Cache a synthetic PO by invoice fingerprint; return the cached PO"""
+        with self._po_lock:
+            return self.generated_pos.setdefault(fingerprint, po)
     
     def get_po(self, po_no: str) -> Optional[ExtractedData]:
         """Retrieve PO from archive"""
         return self.reference_documents.get(po_no)
     
     def get_all_invoices(self) -> List[ExtractedData]:
-        """Get all invoices"""
-        return self.user_uploaded_invoice
+        """Get a snapshot of all invoices"""
+        with self._invoice_lock:
+            entries = list(self.user_uploaded_invoice)
+        if self.columnar:
+            return [
+                entry.to_extracted_data() if isinstance(entry, ArchivedInvoice) else entry
+                for entry in entries
+            ]
+        return entries
     
     def get_all_pos(self) -> Dict[str, ExtractedData]:
-        """Get all POs"""
-        return self.reference_documents
+        """Get a snapshot of all POs"""
+        with self._po_lock:
+            return dict(self.reference_documents)
 
 
 def get_sample_invoice() -> ExtractedData:
@@ -64,7 +208,7 @@ def get_sample_invoice() -> ExtractedData:
         date="2024-02-20",
         total_amount=590000.0,
         tax_amount=90000.0,
-        gst_no="29ABCDE1234F1Z5",
+        gst_no="29AABCT1332L1ZA",
         po_no="PO/MEITY/2024/221",
         line_items=[
             LineItem(
@@ -0,0 +1,162 @@
+"""
+result_store.py - Finished audit results by id, and idempotent resubmission
+
+Every audit result is stored once, serialized, with a strong ETag over its
+JSON body (and compressed at most once per encoding), so a result page can
+be reopened (GET /api/audit/<id>) without re-running the pipeline or
+re-serializing the result. The most recent
+Config.RESULT_STORE_SIZE results are kept in memory per worker; with
+Config.RESULT_STORE_DIR set (the default when more than one worker runs)
+they are also written there, one file per audit id, so they survive
+restarts and any worker can answer for any audit.
+
+Uploads carrying an Idempotency-Key header run at most once per key: a
+retry returns the stored result, a retry that arrives while the first
+attempt is still running waits for it, and reusing a key for a different
+payload is refused. Failed audits are not remembered, so they can be retried
+with the same key.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+from compression import Representation
+from config import Config
+from project_types import AuditResult, to_json
+from single_flight import SingleFlight
+
+class IdempotencyConflict(ValueError):
+    """An idempotency key was reused with a different payload"""
+
+class StoredResult(Representation):
+    """A serialized audit result, its ETag and (once requested) its compressed forms"""
+
+    __slots__ = ('audit_id',)
+
+    def __init__(self, audit_id: str, body: bytes):
+        super().__init__(body)
+        self.audit_id = audit_id
+
+def fingerprint(*payloads: Optional[bytes]) -> str:
+    """Identify an upload's content, to tell a retry from a reused key"""
+    digest = hashlib.sha256()
+    for payload in payloads:
+        digest.update(hashlib.sha256(payload or b'').digest())
+    return digest.hexdigest()
+
+class ResultStore:
+    """Most recent audit results by id and idempotency keys, oldest evicted first"""
+
+    def __init__(self, max_entries: int, directory: Optional[str] = None):
+        self.max_entries = max_entries
+        self.directory = directory or None
+        self._results: 'OrderedDict[str, StoredResult]' = OrderedDict()
+        self._keys: 'OrderedDict[str, Tuple[str, str]]' = OrderedDict()  # key -> (fingerprint, audit id)
+        self._lock = threading.Lock()
+        self._in_flight = SingleFlight('idempotency')
+
+    def put(self, result: AuditResult, camel: bool = False) -> StoredResult:
+        """
+        Serialize and store a finished result
+
+        camel selects the key style of the endpoint that returned it, so a
+        later GET has the same shape as the original response.
+        """
+        stored = StoredResult(result.id, to_json(result, camel))
+        self._remember(self._results, result.id, stored)
+        if self.directory:
+            self._write(self._path('results', result.id), stored.body)
+        return stored
+
+    def get(self, audit_id: str) -> Optional[StoredResult]:
+        """Stored result for an audit id, or None"""
+        with self._lock:
+            stored = self._results.get(audit_id)
+        if stored is None and self.directory:
+            body = self._read(self._path('results', audit_id))
+            if body is not None:
+                stored = StoredResult(audit_id, body)
+                self._remember(self._results, audit_id, stored)
+        return stored
+
+    def for_key(self, key: str, payload: str) -> Optional[StoredResult]:
+        """
+        Result of the audit already run for an idempotency key, or None
+
+        Raises:
+            IdempotencyConflict: the key was used for a different payload
+        """
+        with self._lock:
+            entry = self._keys.get(key)
+        if entry is None and self.directory:
+            data = self._read(self._path('keys', key))
+            entry = tuple(json.loads(data)) if data is not None else None
+        if entry is None:
+            return None
+        if entry[0] != payload:
+            raise IdempotencyConflict("Idempotency-Key was already used for a different upload")
+        return self.get(entry[1])
+
+    def run_once(self, key: str, payload: str, audit: Callable[[], StoredResult]) -> Tuple[StoredResult, bool]:
+        """
+        Run audit() unless it already ran (or is running) for this key
+
+        audit stores its result and returns it (see put). Concurrent callers
+        with the same key share one run.
+
+        Returns:
+            (stored result, replayed) where replayed is True when the audit
+            was not run by this call
+        """
+        stored = self.for_key(key, payload)
+        if stored is not None:
+            return stored, True
+
+        def first() -> Tuple[StoredResult, bool]:
+            stored = self.for_key(key, payload)  # Finished between the check above and this run
+            if stored is not None:
+                return stored, True
+            stored = audit()
+            self._remember(self._keys, key, (payload, stored.audit_id))
+            if self.directory:
+                self._write(self._path('keys', key), json.dumps([payload, stored.audit_id]).encode('utf-8'))
+            return stored, False
+
+        (stored, replayed), shared = self._in_flight.do(key, first)
+        if shared:
+            self.for_key(key, payload)  # A concurrent retry may carry a different payload
+        return stored, replayed or shared
+
+    def _remember(self, entries: OrderedDict, key: str, value) -> None:
+        with self._lock:
+            entries[key] = value
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def _path(self, kind: str, name: str) -> str:
+        # Ids and keys come from clients; hashed names cannot escape the directory
+        return os.path.join(self.directory, kind, hashlib.sha256(name.encode('utf-8')).hexdigest())
+
+    @staticmethod
+    def _write(path: str, data: bytes) -> None:
+        """Write atomically, so a reader in another worker never sees a partial file"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _read(path: str) -> Optional[bytes]:
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+result_store = ResultStore(Config.RESULT_STORE_SIZE, Config.RESULT_STORE_DIR)
@@ -1,21 +1,57 @@
 """
 risk_scoring.py - Risk scoring and decision service
 """
+import hashlib
 import json
-import google.generativeai as genai
-from typing import List, Optional
+from typing import Any, List, Optional
 from project_types import ExtractedData, AuditFlag, AuditDecision, RiskLevel
 from config import Config
+from model_client import lazy_model, lazy_tiers, tiered_call
+from metrics import record_fallback
+from deadlines import DeadlineExceeded, degraded, expired
+from output_checks import decision_issues
+from single_flight import SingleFlight
 from dataclasses import asdict
 
+# Static part of the decision prompt, sent ahead of each audit's data (and cached where supported)
+DECISION_INSTRUCTIONS = """
+        You are an expert Indian statutory auditor analyzing invoice compliance.
+        The invoice, its reference PO, the flags raised by the rules engine and
+        additional context follow these instructions.
+
+        Provide a comprehensive audit decision with:
+        1. Risk score (0-100, where 100 is highest risk)
+        2. Risk level (LOW, MEDIUM, HIGH)
+        3. Step-by-step reasoning (as array of strings)
+        4. Overall explanation
+        5. Recommendation (APPROVE, REVIEW, REJECT)
+
+        Consider:
+        - Severity and number of compliance violations
+        - Financial impact and materiality
+        - Statutory requirements under Indian law
+        - Government procurement guidelines
+
+        Return ONLY valid JSON:
+        {
+          "riskScore": number,
+          "riskLevel": "LOW|MEDIUM|HIGH",
+          "reasoningSteps": ["step1", "step2", ...],
+          "explanation": "string",
+          "recommendation": "string"
+        }
+        """
+
 class RiskScoringService:
     """Service for calculating risk scores and making audit decisions"""
     
+    model = lazy_model()
+    tiers = lazy_tiers()
+    
     def __init__(self, api_key: Optional[str] = None):
         """Initialize risk scoring service with Gemini API"""
         self.api_key = api_key or Config.GEMINI_API_KEY
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel(Config.GEMINI_MODEL)
+        self._in_flight = SingleFlight('decision')
     
     def calculate_risk_score(
         self,
@@ -90,28 +126,51 @@ class RiskScoringService:
         # Fallback if no API key
         if not self.api_key or self.api_key == 'Your API key':
             print("WARNING: No valid Gemini API key found. Using fallback decision logic.")
+            record_fallback('decision', 'no_api_key')
+            return self._get_fallback_decision(invoice, po, flags)
+
+        if expired():
+            degraded('decision')
+            record_fallback('decision', 'deadline')
             return self._get_fallback_decision(invoice, po, flags)
 
         prompt = self._build_decision_prompt(invoice, po, flags, context)
         
-        try:
-            response = self.model.generate_content(prompt)
-            response_text = self._clean_json_response(response.text)
-            data = json.loads(response_text)
-            
-            return AuditDecision(
-                risk_score=data['riskScore'],
-                risk_level=RiskLevel(data['riskLevel']),
-                reasoning_steps=data['reasoningSteps'],
-                explanation=data['explanation'],
-                recommendation=data['recommendation']
+        def decide() -> AuditDecision:
+            # Cheapest tier first; escalate while the decision is malformed or contradicts the flags
+            decision, _ = tiered_call(
+                'decision', self.tiers, [prompt], self._parse_decision, lambda d: decision_issues(d, flags),
+                preamble=DECISION_INSTRUCTIONS
             )
+            return decision
+        
+        try:
+            key = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+            decision, _ = self._in_flight.do(key, decide)
+            return decision
             
+        except DeadlineExceeded:
+            print("AI decision out of time, using fallback")
+            degraded('decision')
+            record_fallback('decision', 'deadline')
+            return self._get_fallback_decision(invoice, po, flags)
         except Exception as e:
             print(f"AI decision failed, using fallback: {e}")
+            record_fallback('decision', 'api_error')
             # Fallback to deterministic decision
             return self._get_fallback_decision(invoice, po, flags)
     
+    def _parse_decision(self, response: Any) -> AuditDecision:
+        """AuditDecision from a decision response"""
+        data = json.loads(self._clean_json_response(response.text))
+        return AuditDecision(
+            risk_score=data['riskScore'],
+            risk_level=RiskLevel(data['riskLevel']),
+            reasoning_steps=data['reasoningSteps'],
+            explanation=data['explanation'],
+            recommendation=data['recommendation']
+        )
+    
     def _build_decision_prompt(
         self,
         invoice: ExtractedData,
@@ -119,10 +178,8 @@ class RiskScoringService:
         flags: List[AuditFlag],
         context: List[str]
     ) -> str:
-        """Build prompt for AI decision making"""
+        """Build the per-audit part of the decision prompt; DECISION_INSTRUCTIONS precede it"""
         return f"""
-        You are an expert Indian statutory auditor analyzing invoice compliance.
-        
         INVOICE DATA:
         {json.dumps(asdict(invoice), indent=2, default=str)}
         
@@ -134,28 +191,6 @@ class RiskScoringService:
         
         CONTEXT:
         {json.dumps(context, indent=2)}
-        
-        Provide a comprehensive audit decision with:
-        1. Risk score (0-100, where 100 is highest risk)
-        2. Risk level (LOW, MEDIUM, HIGH)
-        3. Step-by-step reasoning (as array of strings)
-        4. Overall explanation
-        5. Recommendation (APPROVE, REVIEW, REJECT)
-        
-        Consider:
-        - Severity and number of compliance violations
-        - Financial impact and materiality
-        - Statutory requirements under Indian law
-        - Government procurement guidelines
-        
-        Return ONLY valid JSON:
-        {{
-          "riskScore": number,
-          "riskLevel": "LOW|MEDIUM|HIGH",
-          "reasoningSteps": ["step1", "step2", ...],
-          "explanation": "string",
-          "recommendation": "string"
-        }}
         """
     
     def _clean_json_response(self, response_text: str) -> str:
@@ -1,9 +1,12 @@
 """
 rules_engine.py - Deterministic rules engine for invoice validation
 """
-from typing import List, Optional
+from typing import Iterable, List, Optional, Tuple
 from project_types import ExtractedData, AuditFlag, RiskLevel
 from config import Config
+from arithmetic import ArithmeticReport, check_invoice, check_invoices, to_decimal
+from gstin import same_pan, validate_gstin, validate_gstins
+from po_ledger import line_key
 
 class RulesEngine:
     """Engine for running deterministic validation rules on invoices"""
@@ -13,19 +16,27 @@ class RulesEngine:
         self.rules = [
             self._check_vendor_mismatch,
             self._check_amount_exceeds_po,
+            self._check_cumulative_po_billing,
             self._check_missing_gst,
+            self._check_gstin_pan_match,
             self._check_tax_calculation,
+            self._check_line_arithmetic,
             self._check_missing_po_reference,
             self._check_date_validity,
             self._check_line_items_match,
-            self._check_extracted_anomalies
+            self._check_extracted_anomalies,
+            self._check_unit_price_history,
+            self._check_resubmission
         ]
     
     def validate(
         self, 
         invoice: ExtractedData, 
         po: Optional[ExtractedData] = None,
-        matching_service: Optional['MatchingService'] = None
+        matching_service: Optional['MatchingService'] = None,
+        price_index: Optional['PriceIndex'] = None,
+        po_ledger: Optional['POLedger'] = None,
+        arithmetic: Optional[ArithmeticReport] = None
     ) -> List[AuditFlag]:
         """
         Run all validation rules on the invoice
@@ -33,6 +44,9 @@ class RulesEngine:
         Args:
             invoice: Invoice to validate
             po: Reference PO (optional)
+            price_index: Archived unit-price history (optional)
+            po_ledger: Amounts already billed against each PO (optional)
+            arithmetic: Precomputed arithmetic report (batch path); computed here if omitted
         
         Returns:
             List of audit flags for violations found
@@ -42,6 +56,12 @@ class RulesEngine:
         for rule in self.rules:
             if rule == self._check_vendor_mismatch:
                 result = rule(invoice, po, matching_service)
+            elif rule == self._check_unit_price_history:
+                result = rule(invoice, po, price_index)
+            elif rule == self._check_cumulative_po_billing:
+                result = rule(invoice, po, po_ledger)
+            elif rule == self._check_line_arithmetic:
+                result = rule(invoice, po, arithmetic)
             else:
                 result = rule(invoice, po)
             if isinstance(result, list):
@@ -51,6 +71,31 @@ class RulesEngine:
         
         return flags
     
+    def validate_batch(
+        self,
+        pairs: Iterable[Tuple[ExtractedData, Optional[ExtractedData]]],
+        matching_service: Optional['MatchingService'] = None,
+        price_index: Optional['PriceIndex'] = None,
+        po_ledger: Optional['POLedger'] = None
+    ) -> List[List[AuditFlag]]:
+        """
+        Run all validation rules on many (invoice, PO) pairs
+        
+        GSTINs are validated once per distinct value up front, so the
+        per-invoice rules only hit the validator's memo, and line arithmetic
+        is screened over all invoices' line items in one pass.
+        
+        Returns:
+            One list of audit flags per pair, in input order
+        """
+        pairs = list(pairs)
+        validate_gstins(doc.gst_no for pair in pairs for doc in pair if doc)
+        reports = check_invoices([invoice for invoice, _ in pairs])
+        return [
+            self.validate(invoice, po, matching_service, price_index, po_ledger, report)
+            for (invoice, po), report in zip(pairs, reports)
+        ]
+    
     def _check_extracted_anomalies(
         self, 
         invoice: ExtractedData, 
@@ -124,18 +169,91 @@ class RulesEngine:
         
         return None
     
+    def _check_cumulative_po_billing(
+        self, 
+        invoice: ExtractedData, 
+        po: Optional[ExtractedData],
+        po_ledger: Optional['POLedger'] = None
+    ) -> List[AuditFlag]:
+        """Rule R-PO-010: Check earlier invoices plus this one don't exceed the PO amount or line quantities"""
+        if not po or not po_ledger or not invoice.po_no:
+            return []
+        
+        billed = po_ledger.consumed(invoice.po_no, excluding=invoice)
+        if not billed:
+            return []  # First invoice against this PO; R-GST-002 covers it
+        
+        flags = []
+        cumulative = billed.amount + invoice.total_amount
+        max_allowed = po.total_amount * (1 + Config.PO_AMOUNT_TOLERANCE)
+        if cumulative > max_allowed:
+            excess_percent = ((cumulative - po.total_amount) / po.total_amount) * 100 if po.total_amount else 100.0
+            flags.append(AuditFlag(
+                id="R-PO-010",
+                rule="Cumulative PO Over-billing",
+                severity=RiskLevel.HIGH,
+                description=f"This invoice brings billing against {invoice.po_no} to ₹{cumulative:,.2f} across "
+                            f"{billed.invoice_count + 1} invoices, exceeding the PO amount ₹{po.total_amount:,.2f} by {excess_percent:.1f}%",
+                field="totalAmount"
+            ))
+        
+        ordered = {}
+        for po_item in po.line_items:
+            key = line_key(po_item)
+            ordered[key] = ordered.get(key, 0) + po_item.quantity
+        for i, item in enumerate(invoice.line_items):
+            key = line_key(item)
+            if key not in ordered:
+                continue
+            consumed = billed.quantities.get(key, 0) + item.quantity
+            if consumed > ordered[key] * (1 + Config.PO_AMOUNT_TOLERANCE):
+                flags.append(AuditFlag(
+                    id=f"R-PO-010-{i}",
+                    rule="Cumulative PO Over-billing",
+                    severity=RiskLevel.HIGH,
+                    description=f"'{item.description}' billed {consumed:g} units in total against {invoice.po_no}, "
+                                f"but the PO orders {ordered[key]:g}",
+                    field="lineItems"
+                ))
+        
+        return flags
+    
     def _check_missing_gst(
         self, 
         invoice: ExtractedData, 
         po: Optional[ExtractedData]
     ) -> Optional[AuditFlag]:
-        """Rule R-GST-003: Check GST number is present and valid"""
-        if not invoice.gst_no or len(invoice.gst_no) < Config.MIN_GST_LENGTH:
+        """Rule R-GST-003: Check GST number is present and valid (format, state code, check character)"""
+        check = validate_gstin(invoice.gst_no)
+        if not check.valid:
             return AuditFlag(
                 id="R-GST-003",
                 rule="Invalid GST Number",
                 severity=RiskLevel.MEDIUM,
-                description="GST number is missing or invalid format (must be 15 characters)",
+                description=check.error,
+                field="gstNo"
+            )
+        
+        return None
+    
+    def _check_gstin_pan_match(
+        self, 
+        invoice: ExtractedData, 
+        po: Optional[ExtractedData]
+    ) -> Optional[AuditFlag]:
+        """Rule R-GST-011: Check invoice and PO GSTINs belong to the same PAN holder"""
+        if not po:
+            return None
+        
+        invoice_check = validate_gstin(invoice.gst_no)
+        po_check = validate_gstin(po.gst_no)
+        if same_pan(invoice_check, po_check) is False:
+            return AuditFlag(
+                id="R-GST-011",
+                rule="GSTIN PAN Mismatch",
+                severity=RiskLevel.HIGH,
+                description=f"Invoice GSTIN {invoice_check.gstin} (PAN {invoice_check.pan}) and PO GSTIN "
+                            f"{po_check.gstin} (PAN {po_check.pan}) belong to different legal entities",
                 field="gstNo"
             )
         
@@ -163,6 +281,44 @@ class RulesEngine:
         
         return None
     
+    def _check_line_arithmetic(
+        self, 
+        invoice: ExtractedData, 
+        po: Optional[ExtractedData],
+        report: Optional[ArithmeticReport] = None
+    ) -> List[AuditFlag]:
+        """Rule R-FIN-012: Check quantity x unit price per line, and line totals + tax against the total"""
+        if report is None:
+            report = check_invoice(invoice)
+        if report.ok:
+            return []
+        
+        flags = []
+        for line in report.lines:
+            item = invoice.line_items[line.index]
+            flags.append(AuditFlag(
+                id=f"R-FIN-012-{line.index}",
+                rule="Line Arithmetic Error",
+                severity=RiskLevel.HIGH,
+                description=f"Line {line.index + 1} '{item.description}': {item.quantity} x ₹{to_decimal(item.unit_price):,.2f} "
+                            f"= ₹{line.expected:,.2f}, but the line total is ₹{line.stated:,.2f} (variance ₹{line.variance:+,.2f})",
+                field="lineItems",
+                coords=item.coords,
+                line_item=line.index
+            ))
+        if report.expected_total is not None:
+            variance = report.stated_total - report.expected_total
+            flags.append(AuditFlag(
+                id="R-FIN-012",
+                rule="Line Arithmetic Error",
+                severity=RiskLevel.HIGH,
+                description=f"Line totals plus tax come to ₹{report.expected_total:,.2f}, but the invoice total is "
+                            f"₹{report.stated_total:,.2f} (variance ₹{variance:+,.2f})",
+                field="totalAmount"
+            ))
+        
+        return flags
+    
     def _check_missing_po_reference(
         self, 
         invoice: ExtractedData, 
@@ -238,4 +394,62 @@ class RulesEngine:
                 field="lineItems"
             )
         
-        return None
\ No newline at end of file
+        return None
+    
+    def _check_unit_price_history(
+        self, 
+        invoice: ExtractedData, 
+        po: Optional[ExtractedData],
+        price_index: Optional['PriceIndex'] = None
+    ) -> List[AuditFlag]:
+        """Rule R-PRICE-009: Check unit prices against the vendor's history for the same HSN code"""
+        if not price_index:
+            return []
+        
+        flags = []
+        for i, item in enumerate(invoice.line_items):
+            history = price_index.lookup(invoice.vendor, item.hsn_code)
+            if not history or history.count < Config.PRICE_HISTORY_MIN_COUNT or not history.median:
+                continue
+            try:
+                price = float(item.unit_price)
+            except (TypeError, ValueError):
+                continue
+            
+            ratio = price / history.median
+            if Config.PRICE_OUTLIER_RATIO > ratio > 1 / Config.PRICE_OUTLIER_RATIO:
+                continue
+            z = history.z_score(price)
+            if z is not None and abs(z) < Config.PRICE_OUTLIER_Z_SCORE:
+                continue
+            
+            direction = f"{ratio:.1f}x above" if ratio > 1 else f"{1 / ratio:.1f}x below" if ratio > 0 else "far below"
+            flags.append(AuditFlag(
+                id=f"R-PRICE-009-{i}",
+                rule="Unit Price Outlier",
+                severity=RiskLevel.HIGH if ratio > 1 else RiskLevel.MEDIUM,
+                description=f"Unit price ₹{price:,.2f} for '{item.description}' (HSN {item.hsn_code}) is {direction} "
+                            f"this vendor's historical median ₹{history.median:,.2f} across {history.count} archived items",
+                field="lineItems",
+                coords=item.coords,
+                line_item=i
+            ))
+        
+        return flags
+    
+    def _check_resubmission(
+        self, 
+        invoice: ExtractedData, 
+        po: Optional[ExtractedData]
+    ) -> Optional[AuditFlag]:
+        """Rule R-DUP-013: Check the upload is not a rescan of an invoice already audited"""
+        if invoice.duplicate_of:
+            return AuditFlag(
+                id="R-DUP-013",
+                rule="Possible Resubmission",
+                severity=RiskLevel.HIGH,
+                description=f"Upload is a near-duplicate scan of invoice {invoice.duplicate_of}, which was audited earlier",
+                field="invoiceNo"
+            )
+        
+        return None
@@ -0,0 +1,123 @@
+"""
+static_assets.py - The built frontend, held in memory with precompressed variants
+
+The Vite build emits content-hashed file names (assets/index-CVWQgExD.js),
+so those files never change under their name and are served with a
+year-long immutable Cache-Control; everything else (index.html) is served
+with no-cache and revalidated by ETag. The static folder is scanned once at
+startup, so serving a file is a dict lookup with no filesystem access; a
+rebuilt frontend is picked up when the server restarts.
+
+Compressed variants come from .br/.gz files next to each asset, written at
+build time by running this module (see Dockerfile):
+
+    python Vision/static_assets.py static
+
+Without them, gzip variants are computed at startup. Brotli variants are only
+served from build-time files (the brotli package is optional).
+"""
+import gzip
+import mimetypes
+import os
+import re
+import sys
+from typing import Dict, Optional
+
+if __name__ == '__main__':
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compression import Representation, brotli, is_compressible
+from config import Config
+
+# Vite's default asset names: name-<8 character hash>.ext
+HASHED_NAME = re.compile(r'-[A-Za-z0-9_-]{8}\.[A-Za-z0-9]+$')
+
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+VARIANT_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+class StaticAsset:
+    """One file of the build: its representation, type and caching policy"""
+
+    __slots__ = ('representation', 'mimetype', 'cache_control')
+
+    def __init__(self, representation: Representation, mimetype: str, cache_control: str):
+        self.representation = representation
+        self.mimetype = mimetype
+        self.cache_control = cache_control
+
+def is_compressible_type(mimetype: str) -> bool:
+    return mimetype.startswith(COMPRESSIBLE_TYPES)
+
+def _read(path: str) -> Optional[bytes]:
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def load_asset(path: str, name: str) -> StaticAsset:
+    """Read a file and its precompressed siblings"""
+    body = _read(path)
+    mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    variants: Dict[str, bytes] = {}
+    if is_compressible_type(mimetype) and is_compressible(body):
+        for encoding, suffix in VARIANT_SUFFIXES.items():
+            variant = _read(path + suffix)
+            if variant is not None:
+                variants[encoding] = variant
+        if 'gzip' not in variants:
+            variants['gzip'] = gzip.compress(body, compresslevel=9, mtime=0)
+    if HASHED_NAME.search(name):
+        cache_control = f"public, max-age={Config.STATIC_IMMUTABLE_MAX_AGE}, immutable"
+    else:
+        cache_control = "no-cache"
+    return StaticAsset(Representation(body, variants=variants), mimetype, cache_control)
+
+class StaticAssets:
+    """The static folder's files by URL path"""
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        self.assets: Dict[str, StaticAsset] = {}
+        self.reload()
+
+    def reload(self) -> None:
+        """Rescan the folder; never done on the request path (restart the server after a rebuild)"""
+        assets = {}
+        for root, _, files in os.walk(self.folder):
+            for filename in files:
+                if filename.endswith(tuple(VARIANT_SUFFIXES.values())):
+                    continue
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, self.folder).replace(os.sep, '/')
+                assets[name] = load_asset(path, name)
+        self.assets = assets
+
+    def get(self, name: str) -> Optional[StaticAsset]:
+        return self.assets.get(name)
+
+def precompress(folder: str) -> int:
+    """Write maximum-compression .gz (and .br, with brotli installed) files beside each compressible asset"""
+    written = 0
+    for root, _, files in os.walk(folder):
+        for filename in files:
+            if filename.endswith(tuple(VARIANT_SUFFIXES.values())):
+                continue
+            path = os.path.join(root, filename)
+            mimetype = mimetypes.guess_type(filename)[0] or ''
+            body = _read(path)
+            if not is_compressible_type(mimetype) or len(body) < Config.COMPRESS_MIN_BYTES:
+                continue
+            variants = {'.gz': gzip.compress(body, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                variants['.br'] = brotli.compress(body, quality=11)
+            for suffix, data in variants.items():
+                with open(path + suffix, 'wb') as f:
+                    f.write(data)
+                written += 1
+    return written
+
+if __name__ == '__main__':
+    target = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
+    print(f"Wrote {precompress(target)} precompressed files in {target}")
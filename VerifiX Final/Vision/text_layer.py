@@ -0,0 +1,280 @@
+"""
+text_layer.py - Local extraction from the text layer of digital PDFs
+
+Digitally generated invoices carry their text, so header fields and the
+line-item table can be read without the vision model. The page text is taken
+in pypdf's layout mode, which keeps columns aligned; header fields are found
+by label, table rows are split on column gaps and assigned to the header's
+columns by position. Every field gets a confidence, and the caller asks the
+model only for the fields below Config.LOCAL_EXTRACTION_MIN_CONFIDENCE.
+
+pypdf is in requirements.txt; without it (an environment installed without
+it, or scanned PDFs with no text) every field is uncertain and the document
+goes to the model as before.
+"""
+import base64
+import io
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from arithmetic import check_invoice
+from gstin import validate_gstin
+from normalization import normalize_hsn_code, normalize_po_number, parse_amount, parse_date, parse_quantity
+from project_types import ExtractedData, LineItem
+
+# Fields of the extraction format, in camelCase as the model returns them
+FIELDS = ('vendor', 'seller', 'invoiceNo', 'date', 'totalAmount', 'taxAmount', 'gstNo', 'poNo', 'lineItems')
+
+# Fewer characters than this and the PDF is treated as scanned
+MIN_TEXT_CHARS = 40
+
+# Optional fields whose label is absent from a complete text layer are most likely absent from the document
+ABSENT_CONFIDENCE = 0.85
+
+_pypdf = None
+_pypdf_lock = threading.Lock()
+
+def load_pypdf():
+    """Import pypdf on first use; None when it is not installed"""
+    global _pypdf
+    if _pypdf is None:
+        with _pypdf_lock:
+            if _pypdf is None:
+                try:
+                    import pypdf
+                    _pypdf = pypdf
+                except ImportError:
+                    _pypdf = False
+    return _pypdf or None
+
+def available() -> bool:
+    return load_pypdf() is not None
+
+@dataclass
+class LocalExtraction:
+    """Fields read from the text layer (camelCase, as the model would return them) and their confidence"""
+    data: Dict[str, Any] = field(default_factory=dict)
+    confidence: Dict[str, float] = field(default_factory=dict)
+
+    def uncertain(self, threshold: float) -> List[str]:
+        return [name for name in FIELDS if self.confidence.get(name, 0.0) < threshold]
+
+# ==================== TEXT ====================
+
+def page_text(base64_data: str) -> str:
+    """Layout-preserving text of every page, or '' when there is no usable text layer"""
+    pypdf = load_pypdf()
+    if pypdf is None:
+        return ''
+    try:
+        reader = pypdf.PdfReader(io.BytesIO(base64.b64decode(base64_data)))
+        return '\n'.join(page.extract_text(extraction_mode='layout') or '' for page in reader.pages)
+    except Exception as e:  # Malformed or encrypted PDFs raise a variety of errors
+        print(f"Text layer unreadable, using the model: {str(e)}")
+        return ''
+
+# ==================== PARSING ====================
+
+_CELL = re.compile(r"\S+(?: \S+)*")
+_LABEL_VALUE = re.compile(r"^(?P<label>[A-Za-z][A-Za-z .#/&]*?)\s*[:#]?\s*[:\-]\s*(?P<value>\S.*)$")
+
+_INVOICE_NO = re.compile(r"(?i)^(?:tax\s+)?(?:invoice|bill)\s*(?:no\.?|number|#)\s*[:\-]?\s*(?P<value>[^\s:\-]\S*)$")
+_DATE = re.compile(r"(?i)^(?:invoice\s+|bill\s+)?date(?:d)?\s*[:\-]?\s*(?P<value>[^\s:\-].*)$")
+_PO_NO = re.compile(r"(?i)^(?:p\.?\s*o\.?|purchase\s+order)\s*(?:no\.?|number|#|ref\.?)\s*[:\-]?\s*(?P<value>[^\s:\-]\S*)$")
+_GSTIN_LABEL = re.compile(r"(?i)^(?:(?P<buyer>buyer'?s?|recipient'?s?|bill\s+to|consignee)\s+)?(?:gstin|gst\s*(?:no\.?|number|in))\s*[:\-]?\s*(?P<value>[^\s:\-]\S*)$")
+_VENDOR_LABEL = re.compile(r"(?i)^(?:vendor|supplier|seller|from|sold\s+by)\s*[:\-]\s*(?P<value>\S.*)$")
+_LEGAL_SUFFIX = re.compile(r"(?i)\b(?:pvt|private|ltd|limited|llp|inc|corporation|corp|co|company|enterprises|industries|traders|services|solutions|works)\b\.?")
+_TITLE = re.compile(r"(?i)^(?:tax\s+)?invoice$|^bill\s+of\s+supply$|^original\b|^duplicate\b")
+
+_TOTAL = re.compile(r"(?i)^(?:grand\s+|invoice\s+|net\s+)?total(?:\s+amount)?(?:\s+payable)?(?:\s*\(.*\))?\s*[:\-]?$")
+_TAX = re.compile(r"(?i)^(?:total\s+)?(?:[csiu]?gst|tax)\b.*$")
+_SUBTOTAL = re.compile(r"(?i)^sub[\s\-]?total\b|^taxable\s+(?:value|amount)\b")
+
+_HEADER_DESCRIPTION = re.compile(r"(?i)^(?:description|particulars|item(?:\s+description)?|goods|product|service)s?\b")
+_HEADER_QUANTITY = re.compile(r"(?i)^(?:qty|quantity|nos?\.?|units?)\b")
+_HEADER_PRICE = re.compile(r"(?i)^(?:rate|unit\s*price|price)\b")
+_HEADER_AMOUNT = re.compile(r"(?i)^(?:amount|total|value|taxable\s+value)\b")
+_HEADER_HSN = re.compile(r"(?i)^(?:hsn|sac)\b")
+
+def _cells(line: str) -> List[Tuple[int, str]]:
+    """(start column, text) of each cell; cells are separated by runs of two or more spaces"""
+    return [(match.start(), match.group()) for match in _CELL.finditer(line)]
+
+def _table_columns(cells: List[Tuple[int, str]]) -> Optional[Dict[str, int]]:
+    """Column name -> start position when cells look like a line-item table header"""
+    columns = {}
+    for start, text in cells:
+        for name, pattern in (('description', _HEADER_DESCRIPTION), ('hsnCode', _HEADER_HSN),
+                              ('quantity', _HEADER_QUANTITY), ('unitPrice', _HEADER_PRICE),
+                              ('total', _HEADER_AMOUNT)):
+            if name not in columns and pattern.match(text):
+                columns[name] = start
+                break
+    if {'description', 'quantity', 'unitPrice', 'total'} <= columns.keys():
+        return columns
+    return None
+
+def _assign(cells: List[Tuple[int, str]], columns: Dict[str, int]) -> Dict[str, str]:
+    """Put each cell in the column whose header starts nearest to it"""
+    row: Dict[str, str] = {}
+    for start, text in cells:
+        name = min(columns, key=lambda c: abs(columns[c] - start))
+        row[name] = f"{row[name]} {text}" if name in row else text
+    return row
+
+def _is_summary(label: str) -> bool:
+    return bool(_TOTAL.match(label) or _TAX.match(label) or _SUBTOTAL.match(label))
+
+def _parse_rows(lines: List[List[Tuple[int, str]]], start: int, columns: Dict[str, int]) -> Tuple[List[Dict[str, Any]], bool, int]:
+    """
+    Line items from lines[start:], below a table header
+
+    Returns:
+        (items, whether every row parsed cleanly, index of the first line after the table)
+    """
+    items: List[Dict[str, Any]] = []
+    clean = True
+    blank = 0
+    n = start
+    for n in range(start, len(lines)):
+        cells = lines[n]
+        if not cells:
+            blank += 1
+            if blank >= 2 and items:
+                break
+            continue
+        blank = 0
+        row = _assign(cells, columns)
+        if _is_summary(cells[0][1]) and 'quantity' not in row:
+            break
+        numbers = [row.get(name) for name in ('quantity', 'unitPrice', 'total')]
+        if all(value is None for value in numbers) and row.get('description') and items:
+            # Description wrapped onto the next line
+            items[-1]['description'] += ' ' + row['description']
+            continue
+        quantity = parse_quantity(row.get('quantity', ''))
+        unit_price = parse_amount(row.get('unitPrice', ''))
+        total = parse_amount(row.get('total', ''))
+        if not row.get('description') or None in (quantity, unit_price, total):
+            clean = False
+            continue
+        items.append({
+            'description': row['description'],
+            'quantity': int(quantity) if quantity.is_integer() else quantity,
+            'unitPrice': unit_price,
+            'total': total,
+            'hsnCode': normalize_hsn_code(row['hsnCode']) if row.get('hsnCode') else None
+        })
+    else:
+        n = len(lines)
+    return items, clean, n
+
+def parse_text(text: str) -> LocalExtraction:
+    """Read the extraction fields from layout text and score each one"""
+    result = LocalExtraction()
+    data, confidence = result.data, result.confidence
+    if len(text.strip()) < MIN_TEXT_CHARS:
+        return result
+
+    lines = [_cells(line) for line in text.splitlines()]
+    gstins: List[str] = []
+    table_at, columns = None, None
+
+    for n, cells in enumerate(lines):
+        if (columns := _table_columns(cells)):
+            table_at = n
+            break
+        for index, (_, cell) in enumerate(cells):
+            if cell.endswith(':') and index + 1 < len(cells):
+                # Label and value in separate cells
+                cell = f"{cell} {cells[index + 1][1]}"
+            if 'invoiceNo' not in data and (match := _INVOICE_NO.match(cell)):
+                data['invoiceNo'], confidence['invoiceNo'] = match.group('value'), 0.9
+            elif 'date' not in data and (match := _DATE.match(cell)):
+                parsed = parse_date(match.group('value'))
+                data['date'] = parsed or match.group('value')
+                confidence['date'] = 0.95 if parsed else 0.3
+            elif 'poNo' not in data and (match := _PO_NO.match(cell)):
+                data['poNo'], confidence['poNo'] = normalize_po_number(match.group('value')), 0.9
+            elif (match := _GSTIN_LABEL.match(cell)):
+                if not match.group('buyer'):
+                    gstins.append(match.group('value'))
+            elif 'vendor' not in data and (match := _VENDOR_LABEL.match(cell)):
+                data['vendor'], confidence['vendor'] = match.group('value').strip(), 0.9
+
+    items, clean, table_end = _parse_rows(lines, table_at + 1, columns) if table_at is not None else ([], False, len(lines))
+
+    # Summary rows below the table: label first, amount last
+    taxes: List[float] = []
+    for cells in lines[table_end:]:
+        if len(cells) < 2:
+            continue
+        label, amount = cells[0][1], parse_amount(cells[-1][1])
+        if amount is None:
+            continue
+        if _TOTAL.match(label):
+            data['totalAmount'] = amount
+        elif _TAX.match(label):
+            taxes.append(amount)
+
+    # Vendor without a label: the letterhead, i.e. the first cell on the page that is not a document title
+    if 'vendor' not in data:
+        for cells in lines:
+            if cells and not _TITLE.match(cells[0][1]):
+                name = cells[0][1]
+                if not _LABEL_VALUE.match(name):
+                    data['vendor'] = name
+                    confidence['vendor'] = 0.85 if _LEGAL_SUFFIX.search(name) else 0.5
+                break
+
+    checks = [validate_gstin(g) for g in dict.fromkeys(gstins)]
+    valid = [check for check in checks if check.valid]
+    if valid:
+        data['gstNo'] = valid[0].gstin
+        confidence['gstNo'] = 0.99 if len(valid) == 1 else 0.5
+    elif checks:
+        data['gstNo'], confidence['gstNo'] = checks[0].gstin, 0.3
+    else:
+        data['gstNo'], confidence['gstNo'] = None, ABSENT_CONFIDENCE
+
+    if 'poNo' not in data:
+        data['poNo'], confidence['poNo'] = None, ABSENT_CONFIDENCE
+    data['seller'], confidence['seller'] = None, ABSENT_CONFIDENCE
+    if taxes:
+        # CGST + SGST rows, or a single IGST/GST row
+        data['taxAmount'] = round(sum(taxes), 2)
+
+    data['lineItems'] = items
+    _score_amounts(data, confidence, clean)
+    return result
+
+def _score_amounts(data: Dict[str, Any], confidence: Dict[str, float], clean_rows: bool) -> None:
+    """Confidence of totals, tax and line items from whether they add up"""
+    has_totals = 'totalAmount' in data and 'taxAmount' in data
+    items = data['lineItems']
+    if not items:
+        confidence['lineItems'] = 0.0
+        confidence['totalAmount'] = 0.6 if 'totalAmount' in data else 0.0
+        confidence['taxAmount'] = 0.6 if 'taxAmount' in data else 0.0
+        return
+
+    document = ExtractedData(
+        vendor='', invoice_no='', date='',
+        total_amount=data.get('totalAmount', 0.0), tax_amount=data.get('taxAmount', 0.0),
+        line_items=[LineItem(i['description'], i['quantity'], i['unitPrice'], i['total'], i['hsnCode']) for i in items]
+    )
+    report = check_invoice(document)
+    lines_ok = clean_rows and not report.lines
+    totals_ok = has_totals and report.expected_total is None
+    # Rows and totals that agree with each other were almost certainly read right
+    confidence['lineItems'] = 0.98 if lines_ok and totals_ok else 0.7 if lines_ok else 0.4
+    confidence['totalAmount'] = 0.98 if totals_ok else 0.6 if 'totalAmount' in data else 0.0
+    confidence['taxAmount'] = 0.98 if totals_ok else 0.6 if 'taxAmount' in data else 0.0
+
+def extract(base64_data: str, mime_type: str) -> LocalExtraction:
+    """Fields readable from a PDF's text layer; empty for images, scanned PDFs or without pypdf"""
+    if mime_type != 'application/pdf':
+        return LocalExtraction()
+    return parse_text(page_text(base64_data))
@@ -0,0 +1,97 @@
+"""
+bench_context_cache.py - Input tokens and time to first token with and without context caching
+
+Extracts corpus documents through AuditOrchestrator._extract and asks for a
+decision on each, once sending the static instructions with every call and
+once from the context cache. benchmarks.fake_gemini stands in for the model:
+uncached prompt tokens add prefill time, cached ones do not. Reports prompt
+tokens per call (and how many of them were cached) and latency per
+service, which with non-streaming calls is the time to first token.
+
+The API rejects contexts below a model-dependent minimum size
+(Config.CONTEXT_CACHE_MIN_TOKENS); the benchmark lowers it with --min-tokens
+so the mechanism is measured even where today's preambles fall short of it.
+
+Usage:
+    python benchmarks/bench_context_cache.py --count 200 --latency-ms 150 --prefill-ms-per-1k 120
+"""
+import argparse
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCH_DIR))
+sys.path.append(os.path.join(os.path.dirname(BENCH_DIR), 'Vision'))
+sys.path.append(BENCH_DIR)
+
+from audit_orchestrator import AuditContext, AuditOrchestrator  # noqa: E402
+from config import Config  # noqa: E402
+from corpus import CorpusGenerator, as_document  # noqa: E402
+from fake_gemini import FakeGenerativeModel, install_fake_model  # noqa: E402
+from metrics import MODEL_CALLS, MODEL_TOKENS  # noqa: E402
+from repository import StatutoryArchive  # noqa: E402
+from risk_scoring import DECISION_INSTRUCTIONS  # noqa: E402
+from run_benchmarks import percentile  # noqa: E402
+
+SERVICES = ('extraction', 'decision')
+
+def snapshot():
+    return {service: (MODEL_CALLS.value(service=service, outcome='success'),
+                      MODEL_TOKENS.value(service=service, kind='prompt'),
+                      MODEL_TOKENS.value(service=service, kind='cached'))
+            for service in SERVICES}
+
+def run(label: str, records, args) -> None:
+    model = FakeGenerativeModel(args.latency_ms, sigma=args.sigma, seed=args.seed,
+                                prefill_ms_per_1k_tokens=args.prefill_ms_per_1k)
+    orchestrator = AuditOrchestrator(StatutoryArchive())
+    install_fake_model(orchestrator, model)
+    latencies = {service: [] for service in SERVICES}
+    before = snapshot()
+    for record in records:
+        start = time.perf_counter()
+        extracted = orchestrator._extract(AuditContext.create(), 'extraction', as_document(record.invoice), 'image/png')
+        latencies['extraction'].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        orchestrator.risk_scoring.get_ai_decision(extracted, None, [], [f"Invoice {record.invoice.invoice_no}"])
+        latencies['decision'].append(time.perf_counter() - start)
+    after = snapshot()
+
+    for service in SERVICES:
+        calls = after[service][0] - before[service][0]
+        prompt = (after[service][1] - before[service][1]) / calls
+        cached = (after[service][2] - before[service][2]) / calls
+        print(f"{label:<10} {service:<11} {prompt:>10.0f} {cached:>10.0f} {prompt - cached:>10.0f} "
+              f"{percentile(latencies[service], 50) * 1000:>9.1f} {percentile(latencies[service], 95) * 1000:>9.1f}")
+    if model.uploads:
+        print(f"{'':<10} {model.uploads} contexts uploaded for {model.calls} calls")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=200)
+    parser.add_argument('--latency-ms', type=float, default=150.0, help='Fake model latency per call before prefill')
+    parser.add_argument('--sigma', type=float, default=0.0)
+    parser.add_argument('--prefill-ms-per-1k', type=float, default=120.0, help='Added latency per 1,000 uncached prompt tokens')
+    parser.add_argument('--min-tokens', type=int, default=0, help='Smallest preamble cached (API minimum: see config.py)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    Config.NEAR_DUPLICATE_DETECTION = False
+    Config.LOCAL_PDF_EXTRACTION = False
+    Config.MODEL_TIERS = [Config.GEMINI_MODEL]
+    records = list(CorpusGenerator(seed=args.seed, anomaly_rate=0.1).records(args.count))
+
+    extraction_tokens = len(AuditOrchestrator(StatutoryArchive()).extraction_service._build_extraction_prompt()) // 4
+    print(f"{args.count} documents; static preambles ~{extraction_tokens} (extraction) and "
+          f"~{len(DECISION_INSTRUCTIONS) // 4} (decision) tokens, "
+          f"caching from {args.min_tokens} (configured: {Config.CONTEXT_CACHE_MIN_TOKENS})")
+    print(f"{'':<10} {'service':<11} {'prompt/call':>10} {'cached':>10} {'uncached':>10} {'p50 ms':>9} {'p95 ms':>9}")
+    Config.CONTEXT_CACHE_MIN_TOKENS = args.min_tokens
+    Config.CONTEXT_CACHING = False
+    run('full', records, args)
+    Config.CONTEXT_CACHING = True
+    run('cached', records, args)
+
+if __name__ == '__main__':
+    main()
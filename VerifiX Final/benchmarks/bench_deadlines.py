@@ -0,0 +1,88 @@
+"""
+bench_deadlines.py - Audit latency tail with and without per-stage deadlines
+
+Audits --audits corpus invoices on --threads threads through one
+AuditOrchestrator whose model (benchmarks.fake_gemini) has a heavy-tailed
+log-normal latency (--sigma). The first run has no deadlines, as before; the
+second uses an audit deadline of --deadline seconds with each model stage
+capped at --stage-budget seconds (extraction at --extraction-budget), so slow
+calls degrade to local vendor matching, the deterministic decision or an
+unavailable PO. Reports audit latency percentiles and how many audits
+degraded.
+
+Usage:
+    python benchmarks/bench_deadlines.py --audits 300 --threads 16 --latency-ms 150 --sigma 1.2 --stage-budget 0.5
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCH_DIR))
+sys.path.append(os.path.join(os.path.dirname(BENCH_DIR), 'Vision'))
+sys.path.append(BENCH_DIR)
+
+from audit_orchestrator import AuditOrchestrator  # noqa: E402
+from config import Config  # noqa: E402
+from corpus import CorpusGenerator, as_document  # noqa: E402
+from deadlines import DeadlineExceeded  # noqa: E402
+from fake_gemini import FakeGenerativeModel, install_fake_model  # noqa: E402
+from repository import StatutoryArchive  # noqa: E402
+from run_benchmarks import percentile  # noqa: E402
+
+def run(label: str, documents, args) -> None:
+    orchestrator = AuditOrchestrator(StatutoryArchive())
+    install_fake_model(orchestrator, FakeGenerativeModel(args.latency_ms, sigma=args.sigma, seed=args.seed))
+    degraded, failed = {}, [0]
+
+    def audit(document):
+        start = time.perf_counter()
+        try:
+            result = orchestrator.process_document(*document)
+            for stage in result.degraded_stages or []:
+                degraded[stage] = degraded.get(stage, 0) + 1
+        except DeadlineExceeded:
+            failed[0] += 1
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        latencies = list(pool.map(audit, documents))
+
+    stages = ', '.join(f"{stage} {count}" for stage, count in sorted(degraded.items())) or 'none'
+    print(f"{label:<12} p50 {percentile(latencies, 50) * 1000:6.0f} ms  p95 {percentile(latencies, 95) * 1000:6.0f} ms  "
+          f"p99 {percentile(latencies, 99) * 1000:6.0f} ms  max {max(latencies) * 1000:6.0f} ms   "
+          f"degraded: {stages}; timed out: {failed[0]}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--audits', type=int, default=300)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--latency-ms', type=float, default=150.0)
+    parser.add_argument('--sigma', type=float, default=1.2, help='Log-normal sigma of model latency')
+    parser.add_argument('--deadline', type=float, default=3.0, help='Audit deadline, seconds')
+    parser.add_argument('--stage-budget', type=float, default=0.5, help='Budget of each model stage but extraction, seconds')
+    parser.add_argument('--extraction-budget', type=float, default=2.0)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    Config.NEAR_DUPLICATE_DETECTION = False
+    Config.LOCAL_PDF_EXTRACTION = False
+    Config.MODEL_TIERS = [Config.GEMINI_MODEL]
+    documents = [(as_document(record.invoice), 'image/png')
+                 for record in CorpusGenerator(seed=args.seed, anomaly_rate=0.1).records(args.audits)]
+
+    print(f"{args.audits} audits on {args.threads} threads, fake latency {args.latency_ms:.0f} ms (sigma {args.sigma})")
+    budgets = dict(Config.STAGE_BUDGET_SECONDS)
+    Config.AUDIT_DEADLINE_SECONDS = None
+    Config.STAGE_BUDGET_SECONDS = {}
+    run('no deadline', documents, args)
+
+    Config.AUDIT_DEADLINE_SECONDS = args.deadline
+    Config.STAGE_BUDGET_SECONDS = {stage: args.stage_budget for stage in budgets}
+    Config.STAGE_BUDGET_SECONDS['extraction'] = args.extraction_budget
+    run('deadlines', documents, args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+bench_gstin.py - GSTIN validation throughput
+
+Reports validations per second for the uncached validator (every GSTIN
+distinct), the memoized single path with a realistic number of distinct
+vendors, and the batch path. A tenth of the GSTINs are corrupted so both
+outcomes are exercised.
+
+Usage:
+    python benchmarks/bench_gstin.py --count 1000000 --distinct 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCH_DIR))
+sys.path.append(os.path.join(os.path.dirname(BENCH_DIR), 'Vision'))
+sys.path.append(BENCH_DIR)
+
+import gstin  # noqa: E402
+from corpus import make_gstin  # noqa: E402
+
+def make_gstins(count: int, seed: int):
+    rng = random.Random(seed)
+    values = []
+    for _ in range(count):
+        value = make_gstin(rng)
+        if rng.random() < 0.1:
+            value = value[:14] + ('0' if value[14] != '0' else '1')
+        values.append(value)
+    return values
+
+def rate(label: str, fn, count: int) -> None:
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {count / elapsed / 1e6:>8.2f} M/s {elapsed * 1e9 / count:>8.0f} ns each")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=1000000)
+    parser.add_argument('--distinct', type=int, default=5000, help='Distinct vendor GSTINs in the workload')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    unique = make_gstins(min(args.count, 200000), args.seed)
+    vendors = make_gstins(args.distinct, args.seed + 1)
+    rng = random.Random(args.seed)
+    workload = [rng.choice(vendors) for _ in range(args.count)]
+    valid = sum(gstin.validate_gstin(g).valid for g in vendors)
+    print(f"{args.count} validations over {args.distinct} distinct GSTINs ({valid} valid)")
+
+    validate, validate_cached = gstin._validate, gstin.validate_gstin
+    rate('uncached, all distinct', lambda: [validate(g) for g in unique], len(unique))
+    rate('checksum only', lambda: [gstin.checksum(g[:14]) for g in unique], len(unique))
+    rate('validate_gstin, memoized', lambda: [validate_cached(g) for g in workload], len(workload))
+    rate('validate_gstins, batch', lambda: gstin.validate_gstins(workload), len(workload))
+
+if __name__ == '__main__':
+    main()
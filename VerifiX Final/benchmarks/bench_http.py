@@ -0,0 +1,93 @@
+"""
+bench_http.py - Bytes transferred and server CPU per dashboard load
+
+A dashboard load fetches index.html, the build assets it references, the
+archive, the rules list, the health check and one stored audit result,
+through the Flask test client against an archive of --archive-size corpus
+invoices. Three runs:
+
+  identity      HTTP_COMPRESSION off and no browser cache: every body, in full
+  first visit   compression negotiated (Accept-Encoding: gzip, br), empty cache
+  repeat visit  content-hashed assets from the browser cache (immutable), the
+                rest revalidated with If-None-Match
+
+CPU is process time per load (test client included), averaged over --loads.
+
+Usage:
+    python benchmarks/bench_http.py --archive-size 500 --loads 50
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCH_DIR))
+sys.path.append(os.path.join(os.path.dirname(BENCH_DIR), 'Vision'))
+sys.path.append(BENCH_DIR)
+
+import app as app_module  # noqa: E402
+from config import Config  # noqa: E402
+from corpus import make_corpus  # noqa: E402
+from fake_gemini import FakeGenerativeModel, install_fake_model  # noqa: E402
+
+def dashboard_paths(client, audit_id: str):
+    index = client.get('/').get_data(as_text=True)
+    assets = re.findall(r'(?:src|href)="/?(assets/[^"]+)"', index)
+    return ['/'] + [f'/{asset}' for asset in assets] + [
+        '/api/archive', '/api/rules/list', '/api/health', f'/api/audit/{audit_id}']
+
+def load(client, paths, headers, cache):
+    """One dashboard load; cache maps path -> (ETag, Cache-Control) from earlier loads, or is None"""
+    transferred = 0
+    for path in paths:
+        request_headers = dict(headers)
+        if cache is not None and path in cache:
+            etag, cache_control = cache[path]
+            if 'immutable' in (cache_control or ''):
+                continue
+            if etag:
+                request_headers['If-None-Match'] = etag
+        response = client.get(path, headers=request_headers)
+        transferred += len(response.data)
+        if cache is not None and response.status_code == 200:
+            cache[path] = (response.headers.get('ETag'), response.headers.get('Cache-Control'))
+    return transferred
+
+def run(label: str, client, paths, args, compression: bool, cached: bool) -> None:
+    Config.HTTP_COMPRESSION = compression
+    headers = {'Accept-Encoding': 'gzip, br'} if compression else {}
+    cache = {} if cached else None
+    if cached:
+        load(client, paths, headers, cache)  # The first visit fills the cache
+    transferred = 0
+    start = time.process_time()
+    for _ in range(args.loads):
+        transferred = load(client, paths, headers, cache)
+    cpu = (time.process_time() - start) / args.loads
+    print(f"{label:<14} {transferred / 1024:9.1f} KiB per load   {cpu * 1000:7.2f} ms CPU per load")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--archive-size', type=int, default=500, help='Archived invoices (and their POs)')
+    parser.add_argument('--loads', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    Config.NEAR_DUPLICATE_DETECTION = False
+    install_fake_model(app_module.orchestrator, FakeGenerativeModel(seed=args.seed))
+    for invoice, po in make_corpus(args.archive_size, 5, seed=args.seed):
+        app_module.archive.add_invoice(invoice)
+        app_module.archive.add_po(po.po_no, po)
+    result = app_module.run_audit(app_module.orchestrator.process_sample)
+
+    client = app_module.app.test_client()
+    paths = dashboard_paths(client, result.audit_id)
+    print(f"Dashboard load: {len(paths)} requests, archive of {args.archive_size} invoices")
+    run('identity', client, paths, args, compression=False, cached=False)
+    run('first visit', client, paths, args, compression=True, cached=False)
+    run('repeat visit', client, paths, args, compression=True, cached=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+bench_memory.py - Resident bytes per archived invoice
+
+Archives synthetic invoices three ways and reports traced bytes per invoice:
+dict-backed dataclasses (the previous types), slotted types, and slotted
+types with columnar line item storage.
+
+Usage:
+    python benchmarks/bench_memory.py --invoices 20000 --line-items 1 10 50
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+from dataclasses import dataclass
+from typing import List, Optional
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_DIR)
+sys.path.append(os.path.join(PROJECT_DIR, 'Vision'))
+
+from project_types import BoundingBox, ExtractedData, LineItem  # noqa: E402
+from repository import StatutoryArchive  # noqa: E402
+
+@dataclass
+class DictBoundingBox:
+    x: float
+    y: float
+    w: float
+    h: float
+
+@dataclass
+class DictLineItem:
+    description: str
+    quantity: int
+    unit_price: float
+    total: float
+    hsn_code: Optional[str] = None
+    coords: Optional[DictBoundingBox] = None
+
+@dataclass
+class DictExtractedData:
+    vendor: str
+    invoice_no: str
+    date: str
+    total_amount: float
+    tax_amount: float
+    line_items: List[DictLineItem]
+    seller: Optional[str] = None
+    gst_no: Optional[str] = None
+    po_no: Optional[str] = None
+    anomalies: Optional[List[str]] = None
+    field_coords: Optional[object] = None
+    flags: Optional[list] = None
+
+def make_invoice(i: int, line_items: int, invoice_cls, item_cls, box_cls):
+    """One synthetic invoice; strings are built per invoice as they would be from JSON"""
+    return invoice_cls(
+        vendor=f"Vendor {i % 500} Pvt Ltd",
+        invoice_no=f"INV-{i:08d}",
+        date="2024-02-20",
+        total_amount=1000.0 * line_items,
+        tax_amount=180.0 * line_items,
+        gst_no="29ABCDE1234F1Z5",
+        po_no=f"PO/BENCH/{i % 1000}",
+        anomalies=[],
+        line_items=[
+            item_cls(description=f"Item {j % 20}", quantity=j + 1, unit_price=1000.0,
+                     total=1000.0 * (j + 1), hsn_code=str(847130 + j % 5),
+                     coords=box_cls(x=10.0, y=40.0 + j, w=80.0, h=4.0))
+            for j in range(line_items)
+        ]
+    )
+
+def bytes_per_invoice(count: int, build, store) -> float:
+    """Traced bytes retained by store after archiving count invoices"""
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    for i in range(count):
+        store(build(i))
+    gc.collect()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (after - before) / count
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--invoices', type=int, default=20000)
+    parser.add_argument('--line-items', type=int, nargs='+', default=[1, 10, 50])
+    args = parser.parse_args()
+
+    print(f"{'line items':>10} {'dict dataclasses':>18} {'slotted':>10} {'slotted+columnar':>18}")
+    for line_items in args.line_items:
+        legacy: list = []
+        slotted = StatutoryArchive()
+        columnar = StatutoryArchive()
+        columnar.columnar = True
+        results = [
+            bytes_per_invoice(args.invoices, lambda i: make_invoice(i, line_items, DictExtractedData, DictLineItem, DictBoundingBox), legacy.append),
+            bytes_per_invoice(args.invoices, lambda i: make_invoice(i, line_items, ExtractedData, LineItem, BoundingBox), slotted.add_invoice),
+            bytes_per_invoice(args.invoices, lambda i: make_invoice(i, line_items, ExtractedData, LineItem, BoundingBox), columnar.add_invoice),
+        ]
+        print(f"{line_items:>10} {results[0]:>18,.0f} {results[1]:>10,.0f} {results[2]:>18,.0f}")
+        del legacy, slotted, columnar
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+bench_model_tiers.py - Cost and accuracy of tiered extraction against a single strong model
+
+Extracts corpus documents through AuditOrchestrator._extract twice: once
+with only the strong tier, once with a cheap tier first. Both tiers are
+benchmarks.fake_gemini models with their own latency and misread rate. Reports
+calls and latency per tier, the escalation rate, and how many extractions
+differ from the ground truth.
+
+Usage:
+    python benchmarks/bench_model_tiers.py --count 300 --cheap-latency-ms 300 --strong-latency-ms 900 --cheap-misread-rate 0.15
+"""
+import argparse
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCH_DIR))
+sys.path.append(os.path.join(os.path.dirname(BENCH_DIR), 'Vision'))
+sys.path.append(BENCH_DIR)
+
+from audit_orchestrator import AuditContext, AuditOrchestrator  # noqa: E402
+from config import Config  # noqa: E402
+from corpus import CorpusGenerator, as_document  # noqa: E402
+from fake_gemini import FakeGenerativeModel, install_fake_model  # noqa: E402
+from metrics import MODEL_ESCALATIONS  # noqa: E402
+from model_client import ModelTier  # noqa: E402
+from normalization import normalize_document  # noqa: E402
+from repository import StatutoryArchive  # noqa: E402
+from run_benchmarks import percentile  # noqa: E402
+
+def run(records, tiers, strong) -> None:
+    orchestrator = AuditOrchestrator(StatutoryArchive())
+    install_fake_model(orchestrator, strong, [ModelTier(model.model_name, model) for model in tiers])
+    latencies, wrong = [], 0
+    for record in records:
+        start = time.perf_counter()
+        extracted = orchestrator._extract(AuditContext.create(), 'extraction', as_document(record.invoice), 'image/png')
+        latencies.append(time.perf_counter() - start)
+        normalize_document(extracted)
+        wrong += (extracted.vendor, extracted.gst_no, [i.total for i in extracted.line_items]) != (
+            record.invoice.vendor, record.invoice.gst_no, [i.total for i in record.invoice.line_items])
+
+    names = ' -> '.join(model.model_name for model in tiers)
+    calls = ', '.join(f"{model.model_name} {model.calls}" for model in tiers)
+    print(f"{names:<18} p50 {percentile(latencies, 50) * 1000:7.1f} ms  p95 {percentile(latencies, 95) * 1000:7.1f} ms  "
+          f"calls: {calls:<22} wrong: {wrong / len(records):.1%}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=300)
+    parser.add_argument('--cheap-latency-ms', type=float, default=300.0)
+    parser.add_argument('--strong-latency-ms', type=float, default=900.0)
+    parser.add_argument('--cheap-misread-rate', type=float, default=0.15)
+    parser.add_argument('--strong-misread-rate', type=float, default=0.01)
+    parser.add_argument('--anomaly-rate', type=float, default=0.1, help='Corpus invoices with genuine anomalies')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    Config.NEAR_DUPLICATE_DETECTION = False
+    Config.LOCAL_PDF_EXTRACTION = False
+    records = list(CorpusGenerator(seed=args.seed, anomaly_rate=args.anomaly_rate).records(args.count))
+
+    def models():
+        return (FakeGenerativeModel(args.cheap_latency_ms, model_name='cheap', misread_rate=args.cheap_misread_rate),
+                FakeGenerativeModel(args.strong_latency_ms, model_name='strong', misread_rate=args.strong_misread_rate))
+
+    print(f"{args.count} documents, cheap tier misreads {args.cheap_misread_rate:.0%}, "
+          f"strong tier {args.strong_misread_rate:.0%}, {args.anomaly_rate:.0%} genuine anomalies")
+    _, strong = models()
+    run(records, [strong], strong)
+    cheap, strong = models()
+    run(records, [cheap, strong], strong)
+    reasons = ('error', 'low_confidence', 'missing_field', 'schema', 'date', 'gstin', 'arithmetic')
+    counts = {r: int(MODEL_ESCALATIONS.value(service='extraction', tier='cheap', reason=r)) for r in reasons}
+    print(f"escalations by reason: {', '.join(f'{r} {n}' for r, n in counts.items() if n)}")
+
+if __name__ == '__main__':
+    main()
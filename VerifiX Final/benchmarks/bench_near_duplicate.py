@@ -0,0 +1,128 @@
+"""
+bench_near_duplicate.py - Near-duplicate scan detection: accuracy and index speed
+
+Accuracy: renders --count corpus invoices as 150 dpi scans, indexes them,
+then looks up lossless copies, re-encodes (JPEG at varying quality), rescans
+(rotated, scaled, re-exposed), indexed invoices reissued with only the
+invoice number changed, and unseen invoices on the same template. Reports how
+often each would be reused outright, reused after the key-fields check,
+or extracted in full (flagged as a resubmission when the details match), and
+how often a key-fields call was made only to be followed by full extraction.
+
+Speed: fills a NearDuplicateIndex with --index-size random page hashes and
+times lookups at the configured radius against a linear scan.
+
+Usage:
+    python benchmarks/bench_near_duplicate.py --count 200 --index-size 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from dataclasses import replace
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCH_DIR))
+sys.path.append(os.path.join(os.path.dirname(BENCH_DIR), 'Vision'))
+sys.path.append(BENCH_DIR)
+
+import image_hash  # noqa: E402
+from config import Config  # noqa: E402
+from corpus import CorpusGenerator, as_scan  # noqa: E402
+from image_hash import NearDuplicateIndex, PageHash  # noqa: E402
+from run_benchmarks import percentile  # noqa: E402
+
+def classify(index: NearDuplicateIndex, base64_data: str, mime_type: str, upload) -> str:
+    """What the orchestrator would do, assuming the key-fields model call reads the upload correctly"""
+    pages = image_hash.hash_document(base64_data, mime_type)
+    if index.exact(pages) is not None:
+        return 'reused, exact'
+    matches = index.search(pages, Config.NEAR_DUPLICATE_RADIUS)[:Config.NEAR_DUPLICATE_MAX_CANDIDATES]
+    close = [m for m in matches if m.detail <= Config.NEAR_DUPLICATE_VERIFY_DISTANCE]
+    if any(image_hash.same_details(upload, m.value) for m in close):
+        return 'reused, verified'
+    flagged = any(image_hash.same_invoice(upload, m.value) for m in matches)
+    return ('extracted, flagged' if flagged else 'extracted') + (' after check' if close else '')
+
+def accuracy(count: int, seed: int) -> None:
+    rng = random.Random(seed)
+    invoices = [record.invoice for record in CorpusGenerator(seed=seed, anomaly_rate=0).records(count * 2)]
+    stored, unseen = invoices[:count], invoices[count:]
+
+    index = NearDuplicateIndex(Config.NEAR_DUPLICATE_INDEX_CHUNKS)
+    hash_times = []
+    for invoice in stored:
+        scan = as_scan(invoice)
+        start = time.perf_counter()
+        pages = image_hash.hash_document(scan, 'image/png')
+        hash_times.append(time.perf_counter() - start)
+        index.add(pages, invoice)
+
+    def renumbered(invoice):
+        last = invoice.invoice_no[-1]
+        return replace(invoice, invoice_no=invoice.invoice_no[:-1] + (str((int(last) + 1) % 10) if last.isdigit() else 'X'))
+
+    cases = {
+        'same pixels (TIFF)': [(as_scan(i, 'TIFF'), 'image/tiff', i) for i in stored],
+        're-encoded (JPEG q70-95)': [(as_scan(i, 'JPEG', rng.randint(70, 95)), 'image/jpeg', i) for i in stored],
+        'rescanned': [(as_scan(i, 'JPEG', 85, rescan=rng), 'image/jpeg', i) for i in stored],
+        'invoice no. changed': [(as_scan(r), 'image/png', r) for r in map(renumbered, stored)],
+        'unseen invoice': [(as_scan(i), 'image/png', i) for i in unseen],
+    }
+    outcomes = ('reused, exact', 'reused, verified', 'extracted, flagged', 'extracted')
+    print(f"{count} indexed scans, radius {Config.NEAR_DUPLICATE_RADIUS}/64, key-fields check within "
+          f"{Config.NEAR_DUPLICATE_VERIFY_DISTANCE}/1024; "
+          f"hashing p50 {percentile(hash_times, 50) * 1000:.1f} ms per page")
+    print(f"{'upload':<26}" + ''.join(f"{o:>19}" for o in outcomes) + f"{'extra check':>14}")
+    for name, uploads in cases.items():
+        results = [classify(index, data, mime, upload) for data, mime, upload in uploads]
+        shares = [sum(r.replace(' after check', '') == o for r in results) / len(results) for o in outcomes]
+        wasted = sum(r.endswith('after check') for r in results) / len(results)
+        print(f"{name:<26}" + ''.join(f"{share:>19.1%}" for share in shares) + f"{wasted:>14.1%}")
+
+def speed(size: int, queries: int, seed: int) -> None:
+    rng = random.Random(seed)
+    index = NearDuplicateIndex(Config.NEAR_DUPLICATE_INDEX_CHUNKS)
+    coarse = [rng.getrandbits(64) for _ in range(size)]
+    start = time.perf_counter()
+    for i, value in enumerate(coarse):
+        index.add([PageHash(value, rng.getrandbits(1024), i.to_bytes(16, 'big'))], i)
+    build = time.perf_counter() - start
+
+    radius = Config.NEAR_DUPLICATE_RADIUS
+    lookups, scans = [], []
+    for _ in range(queries):
+        target = rng.randrange(size)
+        query = coarse[target]
+        for bit in rng.sample(range(64), rng.randint(0, radius)):
+            query ^= 1 << bit
+        start = time.perf_counter()
+        found = index.search([PageHash(query, 0, b'')], radius)
+        lookups.append(time.perf_counter() - start)
+        assert any(m.value == target for m in found)
+        if len(scans) < 20:
+            start = time.perf_counter()
+            [i for i, value in enumerate(coarse) if (value ^ query).bit_count() <= radius]
+            scans.append(time.perf_counter() - start)
+
+    print(f"\n{size:,} indexed pages built in {build:.1f} s; {queries} lookups within {radius} bits")
+    print(f"multi-index lookup  p50 {percentile(lookups, 50) * 1000:8.2f} ms   p99 {percentile(lookups, 99) * 1000:8.2f} ms")
+    print(f"linear scan         p50 {percentile(scans, 50) * 1000:8.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=200, help='Invoices rendered for the accuracy run')
+    parser.add_argument('--index-size', type=int, default=1000000, help='Random page hashes for the speed run')
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    if not image_hash.available():
+        print("Pillow is not installed; uploads are never hashed (pip install pillow)")
+        return
+    accuracy(args.count, args.seed)
+    speed(args.index_size, args.queries, args.seed)
+
+if __name__ == '__main__':
+    main()
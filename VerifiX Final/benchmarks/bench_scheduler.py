@@ -0,0 +1,104 @@
+"""
+bench_scheduler.py - Interactive audit latency while a bulk batch saturates the model quota
+
+Runs --bulk-threads threads auditing corpus invoices back to back (a batch
+upload or re-audit) while interactive audits arrive every --interactive-every
+seconds, all through one AuditOrchestrator with benchmarks.fake_gemini as the
+model and at most --capacity model calls in flight. Compares one FIFO queue
+(every call in the same lane and flow) with the scheduler's priority lanes,
+reserving each --reserved number of slots for interactive calls. Reports
+interactive audit latency and the bulk throughput that remains.
+
+Usage:
+    python benchmarks/bench_scheduler.py --duration 20 --capacity 8 --reserved 0 1 2 --bulk-threads 48 --latency-ms 200
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCH_DIR))
+sys.path.append(os.path.join(os.path.dirname(BENCH_DIR), 'Vision'))
+sys.path.append(BENCH_DIR)
+
+import model_client  # noqa: E402
+from audit_orchestrator import AuditOrchestrator  # noqa: E402
+from config import Config  # noqa: E402
+from corpus import CorpusGenerator, as_document  # noqa: E402
+from fake_gemini import FakeGenerativeModel, install_fake_model  # noqa: E402
+from metrics import MODEL_QUEUE_WAIT  # noqa: E402
+from repository import StatutoryArchive  # noqa: E402
+from run_benchmarks import percentile  # noqa: E402
+from scheduler import FairScheduler, priority  # noqa: E402
+
+def run(label: str, lanes: bool, reserved: int, documents, args) -> None:
+    model_client.model_calls = FairScheduler(args.capacity, reserved)
+    orchestrator = AuditOrchestrator(StatutoryArchive())
+    install_fake_model(orchestrator, FakeGenerativeModel(args.latency_ms, sigma=args.sigma, seed=args.seed))
+    stop = time.perf_counter() + args.duration
+    bulk_done = [0] * args.bulk_threads
+    interactive = []
+
+    # The FIFO baseline puts every call in one lane and flow
+    def bulk(worker: int) -> None:
+        with priority('bulk', 'batch') if lanes else priority('interactive'):
+            i = worker
+            while time.perf_counter() < stop:
+                orchestrator.process_document(*documents[i % len(documents)])
+                bulk_done[worker] += 1
+                i += args.bulk_threads
+
+    def user(i: int) -> None:
+        with priority('interactive', f"user-{i % 3}") if lanes else priority('interactive'):
+            start = time.perf_counter()
+            orchestrator.process_document(*documents[-1 - i % len(documents)])
+            interactive.append(time.perf_counter() - start)
+
+    waits = MODEL_QUEUE_WAIT.count(lane='interactive')
+    threads = [threading.Thread(target=bulk, args=(w,)) for w in range(args.bulk_threads)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.interactive_every)
+    i = 0
+    while time.perf_counter() < stop - args.interactive_every:
+        thread = threading.Thread(target=user, args=(i,))
+        thread.start()
+        threads.append(thread)
+        i += 1
+        time.sleep(args.interactive_every)
+    for thread in threads:
+        thread.join()
+
+    calls = MODEL_QUEUE_WAIT.count(lane='interactive') - waits
+    print(f"{label:<13} interactive audits {len(interactive):>3}  p50 {percentile(interactive, 50) * 1000:7.0f} ms  "
+          f"p95 {percentile(interactive, 95) * 1000:7.0f} ms  max {max(interactive, default=0) * 1000:7.0f} ms   "
+          f"bulk {sum(bulk_done) / args.duration:5.1f} audits/s" + (f"  ({calls} interactive-lane calls)" if lanes else ''))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=20.0, help='Seconds per run')
+    parser.add_argument('--capacity', type=int, default=8, help='Model calls in flight')
+    parser.add_argument('--reserved', type=int, nargs='+', default=[0, 1, 2], help='Slots bulk calls may not take, one run each')
+    parser.add_argument('--bulk-threads', type=int, default=48)
+    parser.add_argument('--interactive-every', type=float, default=1.0, help='Seconds between interactive uploads')
+    parser.add_argument('--latency-ms', type=float, default=200.0)
+    parser.add_argument('--sigma', type=float, default=0.3)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    Config.NEAR_DUPLICATE_DETECTION = False
+    Config.LOCAL_PDF_EXTRACTION = False
+    Config.MODEL_TIERS = [Config.GEMINI_MODEL]
+    documents = [(as_document(record.invoice), 'image/png')
+                 for record in CorpusGenerator(seed=args.seed, anomaly_rate=0.1).records(500)]
+
+    print(f"{args.bulk_threads} bulk threads, an interactive upload every {args.interactive_every:.1f} s, "
+          f"{args.capacity} model calls in flight, fake latency {args.latency_ms:.0f} ms")
+    run('fifo', False, 0, documents, args)
+    for reserved in args.reserved:
+        run(f"lanes, {reserved} rsv", True, reserved, documents, args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+bench_serialization.py - Per-result serialization time and allocations
+
+Reports time per result, peak traced memory and net allocated blocks.
+Compares the previous response paths (dataclasses.asdict + json, and the
+recursive camelCase converter formerly in app.py) with the precompiled
+serializers in project_types.
+
+Usage:
+    python benchmarks/bench_serialization.py --line-items 5 50 500
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+from dataclasses import asdict, fields, is_dataclass
+from enum import Enum
+from typing import Any, Dict
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_DIR)
+
+from project_types import (  # noqa: E402
+    AgentStep, AuditFlag, AuditResult, AuditStatus, BoundingBox, ExtractedData,
+    FieldCoordinates, LineItem, RiskLevel, orjson, to_dict, to_json
+)
+
+def legacy_convert_to_dict(obj: Any) -> Dict:
+    """The recursive converter app.py used before the precompiled serializers"""
+    if isinstance(obj, (str, int, float, bool)) or obj is None:
+        return obj
+    elif isinstance(obj, Enum):
+        return obj.value
+    elif isinstance(obj, list):
+        return [legacy_convert_to_dict(item) for item in obj]
+    elif isinstance(obj, dict):
+        return {k: legacy_convert_to_dict(v) for k, v in obj.items()}
+    elif hasattr(obj, '__dict__') or is_dataclass(obj):
+        result = {}
+        # Slotted dataclasses have no __dict__; walk their fields in the same way
+        items = obj.__dict__.items() if hasattr(obj, '__dict__') else ((f.name, getattr(obj, f.name)) for f in fields(obj))
+        for key, value in items:
+            camel_key = ''.join(
+                word.capitalize() if i > 0 else word
+                for i, word in enumerate(key.split('_'))
+            )
+            result[camel_key] = legacy_convert_to_dict(value)
+        return result
+    else:
+        return str(obj)
+
+def build_result(line_items: int) -> AuditResult:
+    """A realistic audit result with the given number of line items"""
+    box = BoundingBox(x=10, y=45, w=80, h=8)
+    invoice = ExtractedData(
+        vendor="Tech Solutions India Pvt Ltd",
+        invoice_no="INV-2024-0891",
+        date="2024-02-20",
+        total_amount=590000.0,
+        tax_amount=90000.0,
+        gst_no="29ABCDE1234F1Z5",
+        po_no="PO/MEITY/2024/221",
+        anomalies=[],
+        line_items=[
+            LineItem(description=f"Item {i}", quantity=i + 1, unit_price=1000.0,
+                     total=1000.0 * (i + 1), hsn_code="847130", coords=box)
+            for i in range(line_items)
+        ],
+        field_coords=FieldCoordinates(vendor=box, invoice_no=box, gst_no=box,
+                                      total_amount=box, date=box, po_no=box)
+    )
+    return AuditResult(
+        id="AUDIT-IND-20240220120000-0123456789AB",
+        timestamp="2024-02-20T12:00:00",
+        status=AuditStatus.COMPLETED,
+        doc_type="INVOICE",
+        extracted_data=invoice,
+        po_match=invoice,
+        risk_score=55,
+        risk_level=RiskLevel.MEDIUM,
+        flags=[AuditFlag(id=f"R-{i}", rule="Rule", severity=RiskLevel.MEDIUM,
+                         description="Description", field="totalAmount") for i in range(4)],
+        reasoning=["step one", "step two", "step three"],
+        explanation="Explanation",
+        recommendation="REVIEW",
+        match_score=0.92,
+        hash="SHA256:0123456789abcde",
+        agent_trace=[AgentStep(agent="DOC_INTEL", action="Action", status="success",
+                               timestamp="12:00:00") for _ in range(10)]
+    )
+
+def measure(fn, number: int):
+    """Return (microseconds per call, peak KiB, net allocated blocks)"""
+    seconds = min(timeit.repeat(fn, number=number, repeat=5)) / number
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    kept = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+    del kept
+    return seconds * 1e6, peak / 1024, blocks
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--line-items', type=int, nargs='+', default=[5, 50, 500])
+    parser.add_argument('--number', type=int, default=200)
+    args = parser.parse_args()
+
+    for count in args.line_items:
+        result = build_result(count)
+        paths = {
+            'asdict + json.dumps (old upload)': lambda: json.dumps(asdict(result)),
+            'convert_to_dict + json.dumps (old archive)': lambda: json.dumps(legacy_convert_to_dict(result)),
+            'to_dict + json.dumps': lambda: json.dumps(to_dict(result)),
+            f"to_json ({'orjson' if orjson else 'json'})": lambda: to_json(result),
+        }
+        print(f"\nAuditResult with {count} line items")
+        print(f"{'path':<45} {'us/result':>10} {'peak KiB':>10} {'blocks':>8}")
+        for name, fn in paths.items():
+            micros, peak, blocks = measure(fn, max(1, args.number // max(1, count // 50)))
+            print(f"{name:<45} {micros:>10.1f} {peak:>10.1f} {blocks:>8}")
+
+if __name__ == '__main__':
+    main()
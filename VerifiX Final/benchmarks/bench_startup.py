@@ -0,0 +1,76 @@
+"""
+bench_startup.py - Cold-start cost: import time per module and time to first healthy response
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 5 --top 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.append(BENCH_DIR)
+
+from load_test import wait_until_healthy  # noqa: E402
+
+PROJECT_MODULES = {
+    'app', 'audit_orchestrator', 'extraction_service', 'matching_service', 'rules_engine',
+    'risk_scoring', 'repository', 'project_types', 'config', 'metrics', 'profiling', 'model_client'
+}
+
+def import_times(module: str = 'app'):
+    """Cumulative import time (ms) per module from python -X importtime"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=os.path.join(PROJECT_DIR, 'Vision'), capture_output=True, text=True,
+        env=dict(os.environ, PYTHONPATH=PROJECT_DIR)
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line.split('|')
+        times[name.strip()] = int(cumulative_us) / 1000
+    return times
+
+def time_to_healthy(port: int) -> float:
+    """Seconds from launching a one-worker server until /api/health answers"""
+    env = dict(os.environ, WEB_CONCURRENCY='1', PORT=str(port))
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--access-logfile', '/dev/null', 'wsgi:app'],
+        cwd=PROJECT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_until_healthy(f"http://127.0.0.1:{port}")
+        return time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--port', type=int, default=5057)
+    args = parser.parse_args()
+
+    times = import_times()
+    print(f"Total 'import app': {times.get('app', 0):.1f} ms")
+    print(f"\n{'module':<45} {'cumulative ms':>14}")
+    for name in sorted(times, key=lambda n: -times[n])[:args.top]:
+        print(f"{name:<45} {times[name]:>14.1f}")
+    print(f"\n{'project module':<45} {'cumulative ms':>14}")
+    for name in sorted(PROJECT_MODULES & set(times), key=lambda n: -times[n]):
+        print(f"{name:<45} {times[name]:>14.1f}")
+
+    samples = [time_to_healthy(args.port) for _ in range(args.runs)]
+    print(f"\nTime to first healthy response (gunicorn, 1 worker): "
+          f"min {min(samples):.2f}s  median {sorted(samples)[len(samples) // 2]:.2f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+bench_text_layer.py - How many documents the PDF text layer extracts without the model
+
+Runs the orchestrator's extraction step over a mix of digital PDFs (some
+without totals rows), scanned PDFs with no text layer and images, with
+benchmarks.fake_gemini standing in for the model. Reports the fraction of
+documents per extraction path and their median and p95 latency.
+
+Usage:
+    python benchmarks/bench_text_layer.py --count 500 --latency-ms 800 --scanned-rate 0.2
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCH_DIR))
+sys.path.append(os.path.join(os.path.dirname(BENCH_DIR), 'Vision'))
+sys.path.append(BENCH_DIR)
+
+import text_layer  # noqa: E402
+from audit_orchestrator import AuditContext, AuditOrchestrator  # noqa: E402
+from corpus import CorpusGenerator, as_document, as_pdf  # noqa: E402
+from fake_gemini import FakeGenerativeModel, install_fake_model  # noqa: E402
+from repository import StatutoryArchive  # noqa: E402
+from run_benchmarks import percentile  # noqa: E402
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=300)
+    parser.add_argument('--latency-ms', type=float, default=800.0, help='Fake model latency per call')
+    parser.add_argument('--scanned-rate', type=float, default=0.2, help='Fraction of PDFs with no text layer')
+    parser.add_argument('--image-rate', type=float, default=0.1, help='Fraction of uploads that are images')
+    parser.add_argument('--no-totals-rate', type=float, default=0.05, help='Fraction of digital PDFs without totals rows')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    if not text_layer.available():
+        print("pypdf is not installed; every document would go to the model (pip install pypdf)")
+        return
+
+    rng = random.Random(args.seed)
+    documents = []
+    for record in CorpusGenerator(seed=args.seed, anomaly_rate=0.1).records(args.count):
+        roll = rng.random()
+        if roll < args.image_rate:
+            documents.append((as_document(record.invoice), 'image/png'))
+        elif roll < args.image_rate + args.scanned_rate:
+            documents.append((as_pdf(record.invoice, text_layer=False), 'application/pdf'))
+        else:
+            totals = rng.random() >= args.no_totals_rate
+            documents.append((as_pdf(record.invoice, totals=totals), 'application/pdf'))
+
+    orchestrator = AuditOrchestrator(StatutoryArchive())
+    model = FakeGenerativeModel(latency_ms=args.latency_ms, seed=args.seed)
+    install_fake_model(orchestrator, model)
+
+    latencies = defaultdict(list)
+    for base64_data, mime_type in documents:
+        ctx = AuditContext.create()
+        start = time.perf_counter()
+        orchestrator._extract(ctx, 'extraction', base64_data, mime_type)
+        elapsed = time.perf_counter() - start
+        path = ('text_layer_partial' if any('model consulted' in s.action for s in ctx.steps)
+                else 'text_layer' if any('no model call' in s.action for s in ctx.steps) else 'model')
+        latencies[path].append(elapsed)
+
+    print(f"{len(documents)} documents, fake model latency {args.latency_ms:.0f} ms, {model.calls} model calls")
+    print(f"{'path':<22} {'share':>7} {'p50 ms':>9} {'p95 ms':>9}")
+    for path in ('text_layer', 'text_layer_partial', 'model'):
+        samples = latencies.get(path, [])
+        share = len(samples) / len(documents)
+        print(f"{path:<22} {share:>7.1%} {percentile(samples, 50) * 1000:>9.1f} {percentile(samples, 95) * 1000:>9.1f}")
+
+if __name__ == '__main__':
+    main()
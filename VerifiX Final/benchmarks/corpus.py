@@ -0,0 +1,430 @@
+"""
+corpus.py - Seeded synthetic invoice and PO corpora for load and accuracy tests
+
+CorpusGenerator streams (invoice, PO, labels) records with realistic vendor
+name variants, valid GSTINs, HSN codes and line-item counts, and injects
+labelled anomalies. Records can be written to and read back from gzipped
+JSON lines without holding the corpus in memory.
+
+Usage:
+    python benchmarks/corpus.py --count 1000000 --out corpus.jsonl.gz --anomaly-rate 0.1
+"""
+import argparse
+import base64
+import gzip
+import io
+import json
+import os
+import random
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass, field, replace
+from datetime import date, timedelta
+from typing import Iterator, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from project_types import ExtractedData, LineItem, to_dict  # noqa: E402
+
+# ==================== REFERENCE DATA ====================
+
+VENDORS = [
+    "Tech Solutions India", "Bharat Office Supplies", "Sahyadri Infra Projects",
+    "Ganga Logistics", "Deccan Electricals", "Nilgiri IT Services",
+    "Vindhya Construction", "Konkan Marine Works", "Aravalli Stationers",
+    "Brahmaputra Power Systems", "Kaveri Medical Devices", "Thar Solar Energy"
+]
+CITIES = ["Pune", "Chennai", "Kolkata", "Lucknow", "Jaipur", "Kochi", "Bhopal", "Nagpur",
+          "Surat", "Patna", "Guwahati", "Indore", "Mysuru", "Vizag", "Ranchi", "Dehradun"]
+LEGAL_SUFFIXES = ["Pvt Ltd", "Private Limited", "Pvt. Ltd.", "PVT LTD", "Limited", "Ltd"]
+STATE_CODES = ["07", "09", "19", "24", "27", "29", "32", "33", "36"]
+
+GOODS = [
+    ("Enterprise Server Hardware", "847130", 41000.0), ("Network Switch", "851762", 18500.0),
+    ("Office Chair", "940130", 6500.0), ("A4 Paper Ream", "480256", 320.0),
+    ("Installation Services", "998314", 90000.0), ("UPS 5kVA", "850440", 52000.0),
+    ("LED Panel Light", "940542", 1450.0), ("Steel Almirah", "940310", 12800.0),
+    ("Laptop", "847130", 62000.0), ("Annual Maintenance Contract", "998713", 150000.0),
+    ("Cement (50kg bag)", "252329", 410.0), ("Solar Panel 540W", "854140", 14200.0),
+    ("Printer Toner", "844399", 3800.0), ("Ambulance Stretcher", "940290", 23500.0)
+]
+
+GST_RATE = 0.18
+ANOMALY_KINDS = ("duplicate", "over_billing", "tax_error", "date_inversion", "line_arithmetic")
+
+_GSTIN_CHARS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+def gstin_checksum(first14: str) -> str:
+    """GSTIN check character (mod-36 weighted sum over the first 14 characters)"""
+    total = 0
+    for i, char in enumerate(first14):
+        product = _GSTIN_CHARS.index(char) * (2 if i % 2 else 1)
+        total += product // 36 + product % 36
+    return _GSTIN_CHARS[(36 - total % 36) % 36]
+
+def make_gstin(rng: random.Random) -> str:
+    """Valid GSTIN: state code, company PAN, entity number, 'Z', checksum"""
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    pan = (''.join(rng.choice(letters) for _ in range(3)) + 'C' + rng.choice(letters)
+           + f"{rng.randint(0, 9999):04d}" + rng.choice(letters))
+    first14 = rng.choice(STATE_CODES) + pan + str(rng.randint(1, 9)) + 'Z'
+    return first14 + gstin_checksum(first14)
+
+# ==================== RECORDS ====================
+
+@dataclass
+class CorpusRecord:
+    """One invoice with the PO it was billed against and its ground-truth anomaly labels"""
+    id: int
+    invoice: ExtractedData
+    po: ExtractedData
+    labels: List[str] = field(default_factory=list)
+
+@dataclass
+class Vendor:
+    name: str
+    gstin: str
+
+class CorpusGenerator:
+    """
+    Reproducible stream of CorpusRecords
+
+    Args:
+        seed: RNG seed; the same seed always yields the same corpus
+        anomaly_rate: Fraction of records carrying one injected anomaly
+        mean_line_items: Mean of the (geometric) line-item count distribution
+        vendors: Number of distinct vendors
+    """
+
+    def __init__(self, seed: int = 42, anomaly_rate: float = 0.1, mean_line_items: float = 4.0,
+                 vendors: int = 200, max_line_items: int = 200):
+        self.rng = random.Random(seed)
+        self.anomaly_rate = anomaly_rate
+        self.mean_line_items = mean_line_items
+        self.max_line_items = max_line_items
+        self.vendors = [
+            Vendor(f"{self._vendor_base(i)} {self.rng.choice(LEGAL_SUFFIXES[:2])}", make_gstin(self.rng))
+            for i in range(vendors)
+        ]
+        self._recent: deque = deque(maxlen=1000)
+        self._epoch = date(2023, 4, 1)
+
+    def _vendor_base(self, i: int) -> str:
+        """Distinct vendor names: base names, then base names with a city"""
+        name = VENDORS[i % len(VENDORS)]
+        branch = i // len(VENDORS)
+        if branch:
+            name += f" {CITIES[(branch - 1) % len(CITIES)]}"
+            if branch > len(CITIES):
+                name += f" {branch // len(CITIES) + 1}"
+        return name
+
+    def vendor_variant(self, name: str) -> str:
+        """How the same vendor tends to appear on invoices"""
+        rng = self.rng
+        roll = rng.random()
+        base = name
+        for legal in LEGAL_SUFFIXES:
+            if name.endswith(' ' + legal):
+                base = name[:-len(legal) - 1]
+                break
+        if roll < 0.5:
+            return name
+        if roll < 0.75:
+            return f"{base} {rng.choice(LEGAL_SUFFIXES)}"
+        if roll < 0.85:
+            return name.upper()
+        if roll < 0.95:
+            return base
+        # Adjacent-letter transposition typo
+        chars = list(name)
+        i = rng.randint(1, max(1, len(chars) - 3))
+        chars[i], chars[i + 1] = chars[i + 1], chars[i]
+        return ''.join(chars)
+
+    def _line_items(self) -> List[LineItem]:
+        rng = self.rng
+        count = 1
+        p = 1 / self.mean_line_items
+        while rng.random() > p and count < self.max_line_items:
+            count += 1
+        items = []
+        for _ in range(count):
+            description, hsn_code, price = rng.choice(GOODS)
+            price = round(price * rng.uniform(0.9, 1.1), 2)
+            quantity = rng.randint(1, 50)
+            items.append(LineItem(description=description, quantity=quantity, unit_price=price,
+                                  total=round(price * quantity, 2), hsn_code=hsn_code))
+        return items
+
+    def _clean_record(self, index: int) -> CorpusRecord:
+        rng = self.rng
+        vendor = rng.choice(self.vendors)
+        po_items = self._line_items()
+        po_subtotal = round(sum(item.total for item in po_items), 2)
+        po_tax = round(po_subtotal * GST_RATE, 2)
+        po_date = self._epoch + timedelta(days=rng.randint(0, 600))
+        po_no = f"PO/{rng.choice(['MEITY', 'MOHFW', 'MORTH', 'MOE', 'MHA'])}/{po_date.year}/{index:07d}"
+        po = ExtractedData(
+            vendor=vendor.name,
+            invoice_no=po_no,
+            date=po_date.isoformat(),
+            total_amount=round(po_subtotal + po_tax, 2),
+            tax_amount=po_tax,
+            gst_no=vendor.gstin,
+            po_no=po_no,
+            line_items=po_items
+        )
+        # Invoices bill the whole PO or a partial delivery of it
+        invoice_items = [replace(item) for item in po_items]
+        if len(invoice_items) > 1 and rng.random() < 0.2:
+            invoice_items = invoice_items[:rng.randint(1, len(invoice_items) - 1)]
+        subtotal = round(sum(item.total for item in invoice_items), 2)
+        tax = round(subtotal * GST_RATE, 2)
+        invoice = ExtractedData(
+            vendor=self.vendor_variant(vendor.name),
+            invoice_no=f"INV/{po_date.year}/{index:07d}",
+            date=(po_date + timedelta(days=rng.randint(1, 60))).isoformat(),
+            total_amount=round(subtotal + tax, 2),
+            tax_amount=tax,
+            gst_no=vendor.gstin,
+            po_no=po_no,
+            anomalies=[],
+            line_items=invoice_items
+        )
+        return CorpusRecord(id=index, invoice=invoice, po=po)
+
+    def _inject(self, record: CorpusRecord, kind: str) -> CorpusRecord:
+        rng = self.rng
+        invoice = record.invoice
+        if kind == "duplicate" and self._recent:
+            original = rng.choice(self._recent)
+            invoice_no = original.invoice.invoice_no
+            # Resubmissions often differ only in formatting of the invoice number
+            invoice_no = rng.choice([invoice_no, invoice_no.lower(), invoice_no.replace('/', '-'), f" {invoice_no}"])
+            return CorpusRecord(id=record.id, invoice=replace(original.invoice, invoice_no=invoice_no),
+                                po=original.po, labels=[kind])
+        if kind == "over_billing":
+            factor = rng.uniform(1.2, 3.0)
+            items = [replace(item, quantity=max(item.quantity + 1, round(item.quantity * factor)))
+                     for item in invoice.line_items]
+            for item in items:
+                item.total = round(item.unit_price * item.quantity, 2)
+            subtotal = round(sum(item.total for item in items), 2)
+            tax = round(subtotal * GST_RATE, 2)
+            record.invoice = replace(invoice, line_items=items, total_amount=round(subtotal + tax, 2), tax_amount=tax)
+        elif kind == "tax_error":
+            subtotal = invoice.total_amount - invoice.tax_amount
+            tax = round(subtotal * rng.choice([0.05, 0.12, 0.28, 0.25]), 2)
+            record.invoice = replace(invoice, tax_amount=tax, total_amount=round(subtotal + tax, 2))
+        elif kind == "date_inversion":
+            po_date = date.fromisoformat(record.po.date)
+            record.invoice = replace(invoice, date=(po_date - timedelta(days=rng.randint(1, 30))).isoformat())
+        elif kind == "line_arithmetic":
+            items = [replace(item) for item in invoice.line_items]
+            target = rng.choice(items)
+            target.total = round(target.total + rng.choice([-1, 1]) * max(100.0, target.total * rng.uniform(0.05, 0.5)), 2)
+            record.invoice = replace(invoice, line_items=items)
+        else:
+            return record
+        record.labels = [kind]
+        return record
+
+    def records(self, count: int) -> Iterator[CorpusRecord]:
+        """Yield count records; duplicates refer back to recently generated invoices"""
+        for index in range(count):
+            record = self._clean_record(index)
+            if self.rng.random() < self.anomaly_rate:
+                record = self._inject(record, self.rng.choice(ANOMALY_KINDS))
+            if not record.labels:
+                self._recent.append(record)
+            yield record
+
+# ==================== DISK FORMAT ====================
+
+def write_corpus(path: str, records: Iterator[CorpusRecord], compress_level: int = 6) -> int:
+    """Stream records to gzipped JSON lines; returns the number written"""
+    written = 0
+    with gzip.open(path, 'wt', encoding='utf-8', compresslevel=compress_level) as f:
+        for record in records:
+            f.write(json.dumps({
+                'id': record.id,
+                'labels': record.labels,
+                'invoice': to_dict(record.invoice, camel=True),
+                'po': to_dict(record.po, camel=True),
+            }, separators=(',', ':')))
+            f.write('\n')
+            written += 1
+    return written
+
+def _from_dict(data: dict) -> ExtractedData:
+    return ExtractedData(
+        vendor=data['vendor'],
+        invoice_no=data['invoiceNo'],
+        date=data['date'],
+        total_amount=data['totalAmount'],
+        tax_amount=data['taxAmount'],
+        gst_no=data.get('gstNo'),
+        po_no=data.get('poNo'),
+        anomalies=data.get('anomalies'),
+        line_items=[
+            LineItem(description=item['description'], quantity=item['quantity'],
+                     unit_price=item['unitPrice'], total=item['total'], hsn_code=item.get('hsnCode'))
+            for item in data['lineItems']
+        ]
+    )
+
+def read_corpus(path: str, limit: Optional[int] = None) -> Iterator[CorpusRecord]:
+    """Stream records back from a file written by write_corpus"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for n, line in enumerate(f):
+            if limit is not None and n >= limit:
+                return
+            data = json.loads(line)
+            yield CorpusRecord(id=data['id'], invoice=_from_dict(data['invoice']),
+                               po=_from_dict(data['po']), labels=data['labels'])
+
+# ==================== BENCHMARK HELPERS ====================
+
+def make_corpus(count: int, line_items: int, seed: int = 42) -> List[Tuple[ExtractedData, ExtractedData]]:
+    """count clean (invoice, PO) pairs with exactly line_items line items each"""
+    generator = CorpusGenerator(seed=seed, anomaly_rate=0.0)
+    pairs = []
+    for record in generator.records(count):
+        items = (record.po.line_items * line_items)[:line_items]
+        items = [replace(item) for item in items]
+        subtotal = round(sum(item.total for item in items), 2)
+        tax = round(subtotal * GST_RATE, 2)
+        invoice = replace(record.invoice, line_items=items, total_amount=round(subtotal + tax, 2), tax_amount=tax)
+        po = replace(record.po, line_items=[replace(item) for item in items],
+                     total_amount=invoice.total_amount, tax_amount=tax)
+        pairs.append((invoice, po))
+    return pairs
+
+def as_document(invoice: ExtractedData) -> str:
+    """Base64 'document' that fake_gemini extracts back into exactly this invoice"""
+    return base64.b64encode(json.dumps(to_dict(invoice, camel=True)).encode('utf-8')).decode('ascii')
+
+def _pdf(cells: List[Tuple[float, float, str]]) -> bytes:
+    """Minimal one-page PDF drawing each (x, y, text) cell in Helvetica"""
+    def escape(text: str) -> str:
+        return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+    content = ''.join(f"BT /F1 9 Tf {x} {y} Td ({escape(t)}) Tj ET\n" for x, y, t in cells).encode('latin-1')
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        b"<< /Length %d >>\nstream\n" % len(content) + content + b"endstream",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+def _rupees(amount: float) -> str:
+    """Indian digit grouping: 1234567.5 -> 12,34,567.50"""
+    whole, paise = f"{amount:.2f}".split('.')
+    head, tail = whole[:-3], whole[-3:]
+    groups = []
+    while len(head) > 2:
+        groups.insert(0, head[-2:])
+        head = head[:-2]
+    if head:
+        groups.insert(0, head)
+    return ','.join(groups + [tail]) + '.' + paise
+
+def _layout(invoice: ExtractedData, totals: bool = True) -> List[Tuple[float, float, str]]:
+    """(x, y, text) cells of an invoice in PDF points on an A4 page, laid out like a typical GST tax invoice"""
+    cells = [
+        (40, 800, invoice.vendor), (40, 786, f"GSTIN: {invoice.gst_no}"), (380, 800, "TAX INVOICE"),
+        (380, 786, f"Invoice No: {invoice.invoice_no}"),
+        (380, 772, f"Date: {date.fromisoformat(invoice.date).strftime('%d/%m/%Y')}"),
+    ]
+    if invoice.po_no:
+        cells.append((380, 758, f"PO No: {invoice.po_no}"))
+    y = 700
+    cells += [(40, y, "Description"), (250, y, "HSN"), (320, y, "Qty"), (380, y, "Rate"), (480, y, "Amount")]
+    for item in invoice.line_items:
+        y -= 14
+        cells += [(40, y, item.description), (250, y, item.hsn_code or ''), (320, y, str(item.quantity)),
+                  (380, y, _rupees(item.unit_price)), (480, y, _rupees(item.total))]
+    if totals:
+        subtotal = sum(item.total for item in invoice.line_items)
+        y -= 28
+        cells += [(380, y, "Subtotal"), (480, y, _rupees(subtotal)),
+                  (380, y - 14, f"GST @ {GST_RATE:.0%}"), (480, y - 14, _rupees(invoice.tax_amount)),
+                  (380, y - 28, "Total"), (480, y - 28, _rupees(invoice.total_amount))]
+    return cells
+
+def as_pdf(invoice: ExtractedData, text_layer: bool = True, totals: bool = True) -> str:
+    """
+    Base64 digital PDF of an invoice, laid out like a typical GST tax invoice
+
+    text_layer=False gives a page with no text, as a scanned invoice would
+    have; totals=False leaves out the subtotal, GST and total rows.
+    """
+    if not text_layer:
+        return base64.b64encode(_pdf([])).decode('ascii')
+    return base64.b64encode(_pdf(_layout(invoice, totals))).decode('ascii')
+
+def as_scan(invoice: ExtractedData, image_format: str = 'PNG', quality: int = 90,
+            rescan: Optional[random.Random] = None) -> str:
+    """
+    Base64 150 dpi page image of an invoice, as a scanner would produce (needs Pillow)
+
+    With rescan, the page is scanned again the way a second pass through a
+    scanner or a phone photo differs: slightly rotated, scaled and shifted,
+    with different exposure and blur.
+    """
+    from PIL import Image, ImageDraw, ImageEnhance, ImageFilter
+
+    scale = 150 / 72
+    page = Image.new('L', (round(595 * scale), round(842 * scale)), 255)
+    draw = ImageDraw.Draw(page)
+    for x, y, text in _layout(invoice):
+        draw.text((x * scale, (842 - y) * scale), text, fill=0, font_size=round(9 * scale))
+    if rescan:
+        page = page.rotate(rescan.uniform(-1.0, 1.0), resample=Image.Resampling.BICUBIC, fillcolor=255)
+        factor = rescan.uniform(0.6, 1.1)
+        page = page.resize((round(page.width * factor), round(page.height * factor)), Image.Resampling.BILINEAR)
+        sheet = Image.new('L', (page.width + 60, page.height + 60), rescan.randint(225, 255))
+        sheet.paste(page, (30 + rescan.randint(-20, 20), 30 + rescan.randint(-20, 20)))
+        page = ImageEnhance.Brightness(sheet).enhance(rescan.uniform(0.85, 1.1))
+        page = ImageEnhance.Contrast(page).enhance(rescan.uniform(0.8, 1.2))
+        page = page.filter(ImageFilter.GaussianBlur(rescan.uniform(0.0, 1.2)))
+    out = io.BytesIO()
+    page.save(out, image_format, quality=quality)
+    return base64.b64encode(out.getvalue()).decode('ascii')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=100000)
+    parser.add_argument('--out', default='corpus.jsonl.gz')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--anomaly-rate', type=float, default=0.1)
+    parser.add_argument('--mean-line-items', type=float, default=4.0)
+    parser.add_argument('--vendors', type=int, default=200)
+    parser.add_argument('--compress-level', type=int, default=6)
+    args = parser.parse_args()
+
+    generator = CorpusGenerator(seed=args.seed, anomaly_rate=args.anomaly_rate,
+                                mean_line_items=args.mean_line_items, vendors=args.vendors)
+    start = time.perf_counter()
+    written = write_corpus(args.out, generator.records(args.count), args.compress_level)
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(args.out)
+    print(f"Wrote {written:,} records to {args.out} in {elapsed:.1f}s "
+          f"({written / elapsed:,.0f} records/s, {size / written:.0f} bytes/record)")
+
+if __name__ == '__main__':
+    main()
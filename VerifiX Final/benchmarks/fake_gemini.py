@@ -0,0 +1,250 @@
+"""
+fake_gemini.py - Deterministic local stand-in for google.generativeai models
+
+FakeGenerativeModel answers the four kinds of prompts VerifiX sends
+(extraction, PO generation, vendor equivalence, audit decision) without any
+network access, with configurable latency and failure distributions. It also
+stands in for context caching: cache_context returns a model whose requests
+carry the cached preamble, which counts as cached tokens and adds no prefill
+time.
+"""
+import base64
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+@dataclass
+class UsageMetadata:
+    prompt_token_count: int
+    candidates_token_count: int
+    total_token_count: int
+    cached_content_token_count: int = 0
+
+@dataclass
+class FakeResponse:
+    text: str
+    usage_metadata: UsageMetadata
+
+class FakeModelError(Exception):
+    """Injected model failure"""
+
+class NotFound(FakeModelError):
+    """A cached context used after it expired, named as the API's error is"""
+
+class FakeCachedContent:
+    """An uploaded preamble; update(ttl=timedelta) extends it as CachedContent.update does"""
+
+    def __init__(self, preamble: str, ttl_seconds: float):
+        self.preamble = preamble
+        self.expire_time = time.monotonic() + ttl_seconds
+
+    def update(self, ttl) -> None:
+        self.expire_time = time.monotonic() + ttl.total_seconds()
+
+class FakeCachedModel:
+    """A FakeGenerativeModel bound to a cached preamble, as from GenerativeModel.from_cached_content"""
+
+    def __init__(self, model: 'FakeGenerativeModel', content: FakeCachedContent):
+        self.model = model
+        self.content = content
+        self.model_name = model.model_name
+
+    def generate_content(self, contents: Any, **kwargs) -> FakeResponse:
+        if time.monotonic() >= self.content.expire_time:
+            raise NotFound("Cached content not found")
+        return self.model._generate(contents, self.content.preamble)
+
+class FakeGenerativeModel:
+    """
+    Drop-in replacement for genai.GenerativeModel.generate_content
+
+    Latency is log-normal around latency_ms (sigma controls the tail);
+    failure_rate is the probability that a call raises FakeModelError.
+    misread_rate is the fraction of documents this model extracts wrongly, as
+    a cheaper model tier would: a dropped digit, a garbled GSTIN, a vendor
+    typo, or a low self-reported confidence. Responses depend only on the
+    request content and model_name, never on the RNG.
+
+    prefill_ms_per_1k_tokens adds time to first token in proportion to the
+    prompt tokens that are not cached.
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        sigma: float = 0.0,
+        failure_rate: float = 0.0,
+        seed: int = 0,
+        model_name: str = 'fake-gemini',
+        misread_rate: float = 0.0,
+        prefill_ms_per_1k_tokens: float = 0.0
+    ):
+        self.latency_ms = latency_ms
+        self.sigma = sigma
+        self.failure_rate = failure_rate
+        self.misread_rate = misread_rate
+        self.prefill_ms_per_1k_tokens = prefill_ms_per_1k_tokens
+        self.model_name = model_name
+        self.calls = 0
+        self.uploads = 0  # Contexts cached
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate_content(self, contents: Any, **kwargs) -> FakeResponse:
+        return self._generate(contents)
+
+    def cache_context(self, preamble: str, ttl_seconds: float):
+        """Upload a preamble: (model bound to it, handle), the protocol model_client.ContextCache expects"""
+        with self._lock:
+            self.uploads += 1
+        content = FakeCachedContent(preamble, ttl_seconds)
+        return FakeCachedModel(self, content), content
+
+    def _generate(self, contents: Any, cached: str = '') -> FakeResponse:
+        prompt, document = self._split_contents(contents)
+        cached_tokens = len(cached) // 4
+        prompt_tokens = cached_tokens + len(prompt) // 4 + (258 if document else 0)
+        with self._lock:
+            self.calls += 1
+            delay = self._sample_latency() + (prompt_tokens - cached_tokens) * self.prefill_ms_per_1k_tokens / 1e6
+            fail = self._rng.random() < self.failure_rate
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise FakeModelError("Injected model failure")
+
+        text = self._respond(cached + prompt, document)
+        output_tokens = len(text) // 4
+        return FakeResponse(text=text, usage_metadata=UsageMetadata(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=output_tokens,
+            total_token_count=prompt_tokens + output_tokens,
+            cached_content_token_count=cached_tokens
+        ))
+
+    def _sample_latency(self) -> float:
+        if self.latency_ms <= 0:
+            return 0.0
+        if self.sigma <= 0:
+            return self.latency_ms / 1000
+        return self.latency_ms * math.exp(self._rng.gauss(0, self.sigma)) / 1000
+
+    def _split_contents(self, contents: Any):
+        if isinstance(contents, str):
+            return contents, None
+        prompt = ''
+        document = None
+        for part in contents:
+            if isinstance(part, str):
+                prompt += part
+            elif isinstance(part, dict) and 'data' in part:
+                document = part['data']
+        return prompt, document
+
+    def _respond(self, prompt: str, document: Optional[str]) -> str:
+        if document is not None:
+            return self._extraction(document)
+        if 'Purchase Order' in prompt and 'Based on this invoice' in prompt:
+            return self._po_generation(prompt)
+        if 'refer to the same organization' in prompt:
+            return self._vendor_equivalence(prompt)
+        if 'audit decision' in prompt:
+            return self._decision(prompt)
+        return '{}'
+
+    def _extraction(self, document: str) -> str:
+        """Documents produced by benchmarks.corpus carry their ground truth as JSON"""
+        raw = base64.b64decode(document)
+        try:
+            data = json.loads(raw)
+            if isinstance(data, dict) and 'vendor' in data:
+                return json.dumps(self._misread(raw, data))
+        except ValueError:
+            pass
+        digest = int(hashlib.sha256(raw).hexdigest()[:8], 16)
+        amount = 1000.0 + digest % 100000
+        return json.dumps({
+            'vendor': f"Vendor {digest % 97} Pvt Ltd",
+            'seller': None,
+            'invoiceNo': f"INV-{digest % 100000:05d}",
+            'date': '2024-02-20',
+            'totalAmount': round(amount * 1.18, 2),
+            'taxAmount': round(amount * 0.18, 2),
+            'gstNo': '29AABCT1332L1ZA',
+            'poNo': f"PO/FAKE/{digest % 1000}",
+            'anomalies': [],
+            'lineItems': [{'description': 'Goods', 'quantity': 1, 'unitPrice': amount,
+                           'total': amount, 'hsnCode': '8471'}]
+        })
+
+    def _misread(self, raw: bytes, data: dict) -> dict:
+        """Corrupt misread_rate of documents, chosen by content so every call agrees"""
+        digest = int(hashlib.sha256(self.model_name.encode() + raw).hexdigest()[:8], 16)
+        if digest % 10000 >= self.misread_rate * 10000:
+            return data
+        kind = digest // 10000 % 4
+        if kind == 0 and data.get('lineItems'):
+            data['lineItems'][0]['total'] = round(data['lineItems'][0]['total'] / 10, 2)
+        elif kind == 1 and data.get('gstNo'):
+            gstin = data['gstNo']
+            data['gstNo'] = gstin[:2] + gstin[3] + gstin[2] + gstin[4:]
+        elif kind == 2:
+            data['confidence'] = 0.5
+        else:
+            data['vendor'] = data['vendor'].replace('a', 'o', 1)  # Passes every local check
+        return data
+
+    def _po_generation(self, prompt: str) -> str:
+        def after(label: str) -> str:
+            start = prompt.index(label) + len(label)
+            return prompt[start:prompt.index('\n', start)].strip()
+
+        items = json.loads(after('- Line Items:'))
+        total = float(after('- Total: ₹'))
+        return json.dumps({
+            'vendor': after('- Vendor:'),
+            'invoiceNo': f"PO-{after('- Invoice No:')}",
+            'date': '2024-01-01',
+            'totalAmount': total,
+            'taxAmount': round(total - total / 1.18, 2),
+            'gstNo': None,
+            'poNo': f"PO/FAKE/2024/{int(hashlib.sha256(prompt.encode()).hexdigest()[:4], 16)}",
+            'lineItems': [{'description': i['description'], 'quantity': i['quantity'],
+                           'unitPrice': i['unit_price'], 'total': i['total'],
+                           'hsnCode': i.get('hsn_code')} for i in items]
+        })
+
+    def _vendor_equivalence(self, prompt: str) -> str:
+        lines = [l.strip() for l in prompt.splitlines() if l.strip()[:3] in ('1. ', '2. ')]
+        names = [l[3:].strip('"').lower() for l in lines]
+        if len(names) == 2:
+            a, b = (n.replace('limited', 'ltd').replace('private', 'pvt').replace('.', '') for n in names)
+            return 'True' if a.split()[:2] == b.split()[:2] else 'False'
+        return 'False'
+
+    def _decision(self, prompt: str) -> str:
+        flags = prompt.count('"severity"')
+        score = min(100, flags * 25)
+        level = 'HIGH' if score >= 60 else 'MEDIUM' if score >= 30 else 'LOW'
+        return json.dumps({
+            'riskScore': score,
+            'riskLevel': level,
+            'reasoningSteps': [f"Reviewed {flags} flags"],
+            'explanation': 'Deterministic stand-in decision',
+            'recommendation': {'HIGH': 'REJECT', 'MEDIUM': 'REVIEW'}.get(level, 'APPROVE')
+        })
+
+def install_fake_model(orchestrator, model: FakeGenerativeModel, tiers: Optional[List[Any]] = None) -> None:
+    """Route every model call made by an AuditOrchestrator to model, or for tiered calls to tiers if given"""
+    from model_client import ModelTier
+
+    for service in (orchestrator.extraction_service, orchestrator.matching_service, orchestrator.risk_scoring):
+        service.api_key = 'fake-key'
+        service.model = model
+    for service in (orchestrator.extraction_service, orchestrator.risk_scoring):
+        service.tiers = tiers or [ModelTier(model.model_name, model)]
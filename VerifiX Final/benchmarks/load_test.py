@@ -0,0 +1,103 @@
+"""
+load_test.py - Requests/second and latency versus gunicorn worker count
+
+Starts the production server (gunicorn.conf.py) once per worker count, fires a
+fixed number of requests from concurrent client threads and prints a table.
+
+Usage:
+    python benchmarks/load_test.py --workers 1 2 4 --requests 500 --concurrency 32
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def wait_until_healthy(base_url: str, timeout: float = 60) -> float:
+    """Poll the health endpoint; return seconds until the first healthy response"""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            with urllib.request.urlopen(f"{base_url}/api/health", timeout=2) as response:
+                if response.status == 200:
+                    return time.perf_counter() - start
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server at {base_url} did not become healthy within {timeout}s")
+
+def run_load(base_url: str, path: str, method: str, total: int, concurrency: int) -> Dict:
+    """Send total requests with the given concurrency and collect latencies"""
+    def one_request(_):
+        request = urllib.request.Request(f"{base_url}{path}", method=method, data=b'' if method == 'POST' else None)
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=120) as response:
+                response.read()
+                ok = response.status < 400
+        except Exception:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one_request, range(total)))
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for latency, _ in results]
+    return {
+        'rps': total / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'errors': sum(1 for _, ok in results if not ok)
+    }
+
+def run_for_workers(workers: int, threads: int, port: int, args) -> Dict:
+    """Boot gunicorn with the given worker count and load it"""
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), WORKER_THREADS=str(threads), PORT=str(port))
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--access-logfile', '/dev/null', 'wsgi:app'],
+        cwd=PROJECT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        startup = wait_until_healthy(base_url)
+        run_load(base_url, args.path, args.method, min(50, args.requests), args.concurrency)  # warm-up
+        stats = run_load(base_url, args.path, args.method, args.requests, args.concurrency)
+        stats['startup_s'] = startup
+        return stats
+    finally:
+        server.terminate()
+        server.wait(timeout=float(env.get('GRACEFUL_TIMEOUT', 120)) + 5)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--path', default='/api/audit/sample')
+    parser.add_argument('--method', default='POST')
+    parser.add_argument('--port', type=int, default=5055)
+    args = parser.parse_args()
+
+    print(f"{'workers':>8} {'threads':>8} {'startup s':>10} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10} {'errors':>7}")
+    for workers in args.workers:
+        stats = run_for_workers(workers, args.threads, args.port, args)
+        print(f"{workers:>8} {args.threads:>8} {stats['startup_s']:>10.2f} {stats['rps']:>10.1f} "
+              f"{stats['p50_ms']:>10.1f} {stats['p99_ms']:>10.1f} {stats['errors']:>7}")
+
+if __name__ == '__main__':
+    main()
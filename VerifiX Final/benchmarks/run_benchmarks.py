@@ -0,0 +1,309 @@
+"""
+run_benchmarks.py - Offline benchmark suite for the audit pipeline
+
+Runs AuditOrchestrator, RulesEngine, MatchingService and the Flask endpoints
+against benchmarks.fake_gemini with synthetic corpora, prints throughput,
+latency percentiles, per-stage time and peak memory, and saves the results
+to benchmarks/results/ so runs from different versions can be compared.
+
+Usage:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --latency-ms 200 --sigma 0.5 --failure-rate 0.02
+    python benchmarks/run_benchmarks.py --only pipeline rules --compare benchmarks/results/<file>.json
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+sys.path.append(PROJECT_DIR)
+sys.path.append(os.path.join(PROJECT_DIR, 'Vision'))
+sys.path.append(BENCH_DIR)
+
+from corpus import as_document, make_corpus  # noqa: E402
+from fake_gemini import FakeGenerativeModel, install_fake_model  # noqa: E402
+
+# ==================== MEASUREMENT HELPERS ====================
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def summarize(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    """Throughput and latency percentiles (milliseconds)"""
+    return {
+        'count': len(latencies),
+        'throughput_per_s': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+def peak_memory_mib(fn: Callable[[], None]) -> float:
+    """Peak traced allocations while running fn"""
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+def timed_run(work: Callable[[int], None], count: int, concurrency: int) -> Dict[str, float]:
+    """Run work(i) for i in range(count) on concurrency threads"""
+    latencies: List[float] = []
+
+    def one(i):
+        start = time.perf_counter()
+        work(i)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    if concurrency <= 1:
+        for i in range(count):
+            one(i)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one, range(count)))
+    return summarize(latencies, time.perf_counter() - start)
+
+class StageTimer:
+    """Wraps service methods to record how long each pipeline stage takes"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+
+    def wrap(self, obj, method: str, stage: str) -> None:
+        original = getattr(obj, method)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.samples[stage].append(time.perf_counter() - start)
+
+        setattr(obj, method, timed)
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        return {
+            stage: {
+                'calls': len(samples),
+                'mean_ms': sum(samples) / len(samples) * 1000,
+                'p95_ms': percentile(samples, 95) * 1000,
+            }
+            for stage, samples in self.samples.items() if samples
+        }
+
+# ==================== SCENARIOS ====================
+
+def make_model(args) -> FakeGenerativeModel:
+    return FakeGenerativeModel(latency_ms=args.latency_ms, sigma=args.sigma,
+                               failure_rate=args.failure_rate, seed=args.seed)
+
+def build_orchestrator(args, archive_size: int):
+    """Orchestrator on the fake model with archive_size reference POs preloaded"""
+    from audit_orchestrator import AuditOrchestrator
+    from repository import StatutoryArchive
+
+    archive = StatutoryArchive()
+    for invoice, po in make_corpus(archive_size, 3, seed=args.seed + 1):
+        archive.add_po(po.po_no, po)
+    orchestrator = AuditOrchestrator(archive)
+    install_fake_model(orchestrator, make_model(args))
+    return orchestrator, archive
+
+def bench_pipeline(args) -> Dict:
+    """End-to-end process_document, half the invoices with a PO already archived"""
+    results = {}
+    for line_items in args.line_items:
+        orchestrator, archive = build_orchestrator(args, args.archive_sizes[0])
+        corpus = make_corpus(args.audits, line_items, seed=args.seed)
+        for invoice, po in corpus[::2]:
+            archive.add_po(po.po_no, po)
+        documents = [as_document(invoice) for invoice, _ in corpus]
+
+        timer = StageTimer()
+        timer.wrap(orchestrator.extraction_service, 'extract_from_image', 'extraction')
+        timer.wrap(orchestrator, '_find_or_generate_po', 'po_lookup')
+        timer.wrap(orchestrator.rules_engine, 'validate', 'rules')
+        timer.wrap(orchestrator.risk_scoring, 'get_ai_decision', 'decision')
+        timer.wrap(orchestrator.matching_service, 'calculate_match_score', 'match_score')
+
+        def audit(i):
+            try:
+                orchestrator.process_document(documents[i % len(documents)], 'application/pdf')
+            except Exception:
+                pass  # Injected extraction failures surface as audit errors
+
+        stats = timed_run(audit, args.audits, args.concurrency)
+        stats['stages'] = timer.report()
+        stats['peak_mib'] = peak_memory_mib(lambda: [audit(i) for i in range(min(20, args.audits))])
+        results[f"line_items={line_items}"] = stats
+    return results
+
+def bench_rules(args) -> Dict:
+    """RulesEngine.validate without model calls"""
+    from rules_engine import RulesEngine
+
+    engine = RulesEngine()
+    results = {}
+    for line_items in args.line_items:
+        corpus = make_corpus(args.audits * 10, line_items, seed=args.seed)
+        stats = timed_run(lambda i: engine.validate(*corpus[i]), len(corpus), 1)
+        stats['peak_mib'] = peak_memory_mib(lambda: [engine.validate(*pair) for pair in corpus[:200]])
+        results[f"line_items={line_items}"] = stats
+    return results
+
+def bench_matching(args) -> Dict:
+    """PO lookup and match scoring against archives of several sizes"""
+    from matching_service import MatchingService
+
+    service = MatchingService()
+    service.api_key = 'fake-key'
+    service.model = make_model(args)
+    results = {}
+    for archive_size in args.archive_sizes:
+        corpus = make_corpus(archive_size, 5, seed=args.seed)
+        repository = {po.po_no: po for _, po in corpus}
+        count = min(len(corpus), args.audits * 10)
+
+        def match(i):
+            invoice, _ = corpus[i]
+            po = service.find_matching_po(invoice, repository)
+            service.calculate_match_score(invoice, po)
+
+        stats = timed_run(match, count, args.concurrency)
+        results[f"archive={archive_size}"] = stats
+    return results
+
+def bench_endpoints(args) -> Dict:
+    """Flask upload and archive endpoints through the test client"""
+    import app as app_module
+    from repository import StatutoryArchive
+
+    install_fake_model(app_module.orchestrator, make_model(args))
+    client = app_module.app.test_client()
+    results = {}
+    for archive_size in args.archive_sizes:
+        archive = StatutoryArchive()
+        for invoice, po in make_corpus(archive_size, 5, seed=args.seed):
+            archive.add_invoice(invoice)
+            archive.add_po(po.po_no, po)
+        app_module.archive = archive
+        app_module.orchestrator.archive = archive
+
+        documents = [as_document(inv) for inv, _ in make_corpus(args.audits, 5, seed=args.seed + 2)]
+        upload_bytes = [0]
+
+        def upload(i):
+            from io import BytesIO
+            import base64
+            data = {'file': (BytesIO(base64.b64decode(documents[i % len(documents)])), 'invoice.pdf')}
+            response = client.post('/api/audit/upload', data=data, content_type='multipart/form-data')
+            upload_bytes[0] += len(response.data)
+
+        archive_bytes = [0]
+
+        def get_archive(_):
+            archive_bytes[0] = len(client.get('/api/archive').data)
+
+        results[f"upload archive={archive_size}"] = timed_run(upload, args.audits, 1)
+        stats = timed_run(get_archive, max(5, args.audits // 10), 1)
+        stats['response_bytes'] = archive_bytes[0]
+        results[f"GET /api/archive archive={archive_size}"] = stats
+    return results
+
+SCENARIOS = {
+    'pipeline': bench_pipeline,
+    'rules': bench_rules,
+    'matching': bench_matching,
+    'endpoints': bench_endpoints,
+}
+
+# ==================== REPORTING ====================
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def latest_results(exclude: Optional[str] = None) -> Optional[str]:
+    files = sorted(f for f in glob.glob(os.path.join(RESULTS_DIR, '*.json')) if f != exclude)
+    return files[-1] if files else None
+
+def print_results(results: Dict, baseline: Optional[Dict]) -> None:
+    for scenario, cases in results['scenarios'].items():
+        print(f"\n== {scenario} ==")
+        print(f"{'case':<36} {'ops/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak MiB':>9} {'vs base':>8}")
+        for case, stats in cases.items():
+            delta = ''
+            base = (baseline or {}).get('scenarios', {}).get(scenario, {}).get(case)
+            if base and base.get('throughput_per_s'):
+                change = stats['throughput_per_s'] / base['throughput_per_s'] - 1
+                delta = f"{change:+.0%}"
+            peak = f"{stats['peak_mib']:.2f}" if 'peak_mib' in stats else '-'
+            print(f"{case:<36} {stats['throughput_per_s']:>10.1f} {stats['p50_ms']:>9.2f} "
+                  f"{stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f} {peak:>9} {delta:>8}")
+            for stage, timing in stats.get('stages', {}).items():
+                print(f"    {stage:<32} {timing['calls']:>6} calls  mean {timing['mean_ms']:.2f} ms  p95 {timing['p95_ms']:.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', nargs='+', choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--audits', type=int, default=200, help='Audits per pipeline case')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--line-items', type=int, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--archive-sizes', type=int, nargs='+', default=[100, 10000])
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Median fake model latency')
+    parser.add_argument('--sigma', type=float, default=0.0, help='Log-normal latency spread')
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--compare', help='Results file to compare against (default: latest saved run)')
+    parser.add_argument('--no-save', action='store_true')
+    args = parser.parse_args()
+
+    results = {
+        'revision': git_revision(),
+        'created': datetime.now(timezone.utc).isoformat(),
+        'params': {k: v for k, v in vars(args).items() if k not in ('compare', 'no_save', 'only')},
+        'scenarios': {},
+    }
+    for name in args.only:
+        print(f"Running {name}...", file=sys.stderr)
+        results['scenarios'][name] = SCENARIOS[name](args)
+
+    baseline_path = args.compare or latest_results()
+    baseline = None
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        print(f"Comparing against {os.path.basename(baseline_path)} (revision {baseline.get('revision')})")
+    print_results(results, baseline)
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{results['revision']}.json")
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved {path}")
+
+if __name__ == '__main__':
+    main()
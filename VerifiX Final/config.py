@@ -2,7 +2,7 @@
 config.py - Configuration settings for the Invoice Audit Agent
 """
 import os
-from dotenv import load_dotenv
+import tempfile
 
 # Load from .env in current directory OR verifyx subdirectory
 # We use absolute paths based on this file's location to be safe
@@ -10,13 +10,17 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 ROOT_ENV = os.path.join(BASE_DIR, '.env')
 VERIFYX_ENV = os.path.join(BASE_DIR, 'verifyx', '.env')
 
-# Load root .env firs
-if os.path.exists(ROOT_ENV):
-    load_dotenv(ROOT_ENV)
+# Only import python-dotenv when there is a file to read (deployments set env vars directly)
+if os.path.exists(ROOT_ENV) or os.path.exists(VERIFYX_ENV):
+    from dotenv import load_dotenv
 
-# Then load verifyx .env (overrides root if present, assuming user edits this one)
-if os.path.exists(VERIFYX_ENV):
-    load_dotenv(VERIFYX_ENV, override=True)
+    # Load root .env firs
+    if os.path.exists(ROOT_ENV):
+        load_dotenv(ROOT_ENV)
+
+    # Then load verifyx .env (overrides root if present, assuming user edits this one)
+    if os.path.exists(VERIFYX_ENV):
+        load_dotenv(VERIFYX_ENV, override=True)
 
 class Config:
     # API Keys
@@ -25,16 +29,94 @@ class Config:
     # Model Configuration
     GEMINI_MODEL = 'gemini-2.0-flash'
     
+    # Model Tiering Configuration (model_client.py)
+    # Extraction and decisions try each tier in turn, cheapest first, until the output passes local checks
+    MODEL_TIERS = [name.strip() for name in os.getenv('MODEL_TIERS', f'gemini-2.0-flash-lite,{GEMINI_MODEL}').split(',') if name.strip()]
+    TIER_MIN_CONFIDENCE = float(os.getenv('TIER_MIN_CONFIDENCE', 0.8))  # Self-reported extraction confidence below which a tier escalates
+
+    # Context Caching Configuration (model_client.py)
+    # Static instructions are uploaded once per model and referenced from each call, where the SDK supports it
+    CONTEXT_CACHING = os.getenv('CONTEXT_CACHING', 'true').lower() == 'true'
+    CONTEXT_CACHE_TTL_SECONDS = int(os.getenv('CONTEXT_CACHE_TTL_SECONDS', 3600))  # Lifetime of an uploaded context
+    CONTEXT_CACHE_REFRESH_SECONDS = 300  # Extend a cached context's lifetime when it has less than this left
+    CONTEXT_CACHE_RETRY_SECONDS = 600  # After a failed upload, send the full prompt this long before trying again
+    CONTEXT_CACHE_MIN_TOKENS = int(os.getenv('CONTEXT_CACHE_MIN_TOKENS', 1024))  # The API rejects smaller contexts (minimum varies by model)
+
+    # Model Call Scheduling Configuration (scheduler.py)
+    # Model calls queue in priority lanes (interactive, bulk); flows (clients or batches) share a lane by weight
+    MODEL_CONCURRENCY = int(os.getenv('MODEL_CONCURRENCY', 16))  # Model calls in flight per worker process
+    MODEL_INTERACTIVE_RESERVED = int(os.getenv('MODEL_INTERACTIVE_RESERVED', 1))  # Slots bulk calls may not take, so interactive calls rarely queue
+    # Relative share of named flows within their lane, e.g. "nightly-reaudit=0.5,finance-team=2" (others weigh 1)
+    MODEL_FLOW_WEIGHTS = {name.strip(): float(weight) for name, _, weight in (
+        entry.partition('=') for entry in os.getenv('MODEL_FLOW_WEIGHTS', '').split(',')) if name.strip() and weight}
+
+    # Audit Deadline Configuration (deadlines.py)
+    # Model calls still running when a budget runs out are abandoned and the stage degrades to a local result
+    AUDIT_DEADLINE_SECONDS = float(os.getenv('AUDIT_DEADLINE_SECONDS', 60))  # Whole audit, from upload to result
+    STAGE_BUDGET_SECONDS = {  # Per stage, within what is left of the audit deadline
+        'extraction': 40,  # No local fallback: the audit fails if extraction runs out of time
+        'po_extraction': 20,  # Uploaded PO; without it the audit continues with no reference PO
+        'po_generation': 10,  # Synthetic PO; marked unavailable if out of time
+        'rules': 8,  # Vendor equivalence falls back to local name matching
+        'decision': 15,  # Falls back to the deterministic decision
+        'match_score': 4,
+    }
+
     # Server Configuration
     HOST = '0.0.0.0'
     PORT = int(os.getenv('PORT', 5000))
-    DEBUG = True
+    DEBUG = os.getenv('DEBUG', 'false').lower() == 'true'  # Flask debug mode for the development server; never on in production
+    SSE_KEEPALIVE_SECONDS = 15  # Idle interval before a keep-alive comment on audit streams
+
+    # HTTP Configuration (Vision/compression.py, Vision/static_assets.py)
+    HTTP_COMPRESSION = os.getenv('HTTP_COMPRESSION', 'true').lower() == 'true'  # Negotiate gzip/brotli for JSON and static assets
+    COMPRESS_MIN_BYTES = 1024  # Smaller bodies are sent as they are; compression would not pay for itself
+    GZIP_LEVEL = 6  # Responses compressed at request time (each cached body is compressed once)
+    BROTLI_QUALITY = 5  # Request-time brotli, when the brotli package is installed
+    STATIC_IMMUTABLE_MAX_AGE = 31536000  # Seconds browsers may cache content-hashed build assets without revalidating
+    
+    # Production Server Configuration (gunicorn.conf.py)
+    # The archive, PO ledger, price index and caches live in process memory: scale with threads, not workers
+    WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', 1))  # Worker processes; more than one splits the archive between them
+    WORKER_THREADS = int(os.getenv('WORKER_THREADS', 8))  # Request threads per worker
+    REQUEST_TIMEOUT = int(os.getenv('REQUEST_TIMEOUT', 300))  # Seconds before a stuck worker is recycled
+    GRACEFUL_TIMEOUT = int(os.getenv('GRACEFUL_TIMEOUT', 120))  # Seconds to drain in-flight audits on shutdown
+    SHUTDOWN_MARGIN_SECONDS = 5  # Of GRACEFUL_TIMEOUT, left for gunicorn to close connections after the drain
+    
+    # Profiling Configuration (Vision/profiling.py)
+    PROFILE_TOKEN = os.getenv('PROFILE_TOKEN')  # Callers presenting this token may request a profile
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0.0))  # Fraction of audits profiled automatically
+    PROFILE_STORE_SIZE = 100  # Profiles kept in memory per worker
+
+    # Result Store Configuration (Vision/result_store.py)
+    RESULT_STORE_SIZE = int(os.getenv('RESULT_STORE_SIZE', 1000))  # Audit results (and idempotency keys) kept in memory per worker
+    # Also write results here, shared by all workers; unset keeps them in memory, unless more than one worker runs
+    RESULT_STORE_DIR = os.getenv('RESULT_STORE_DIR') or (
+        os.path.join(tempfile.gettempdir(), 'verifix-results') if WEB_CONCURRENCY > 1 else None)
+
+    # Local Extraction Configuration (Vision/text_layer.py)
+    LOCAL_PDF_EXTRACTION = os.getenv('LOCAL_PDF_EXTRACTION', 'true').lower() == 'true'  # Read digital PDFs' text layer before calling the model (needs pypdf)
+    LOCAL_EXTRACTION_MIN_CONFIDENCE = 0.8  # Fields read locally below this confidence are asked of the model
+    LOCAL_EXTRACTION_MAX_MODEL_FIELDS = 4  # More uncertain fields than this and the whole document goes to the model
+    
+    # Near-Duplicate Detection Configuration (Vision/image_hash.py)
+    NEAR_DUPLICATE_DETECTION = os.getenv('NEAR_DUPLICATE_DETECTION', 'true').lower() == 'true'  # Hash scanned uploads before extraction (needs Pillow)
+    NEAR_DUPLICATE_INDEX_CHUNKS = 3  # Hash tables in the multi-index; about log2(stored pages) bits per chunk is optimal
+    NEAR_DUPLICATE_RADIUS = 8  # Coarse hash bits (of 64) a rescan may differ by and still be a candidate
+    NEAR_DUPLICATE_MAX_CANDIDATES = 5  # Closest earlier documents a near-duplicate upload is compared with
+    NEAR_DUPLICATE_VERIFY_DISTANCE = 24  # Detail hash bits (of 1024) within which a key-fields check is tried before full extraction
     
     # Audit Rules Configuration
     PO_AMOUNT_TOLERANCE = 0.10  # 10% tolerance
     TAX_CALCULATION_TOLERANCE = 1000  # ₹1000 tolerance
+    ARITHMETIC_TOLERANCE = '1.00'  # ₹ allowed between stated and computed line and invoice totals (rupee rounding)
     GST_RATE = 0.18  # 18% GST
-    MIN_GST_LENGTH = 15
+    PRICE_HISTORY_MIN_COUNT = 5  # Archived prices needed for a vendor + HSN before outliers are flagged
+    PRICE_OUTLIER_Z_SCORE = 3.0  # Standard deviations from the historical mean
+    PRICE_OUTLIER_RATIO = 2.0  # Minimum factor above or below the historical median
+    PRICE_INDEX_SEEN_INVOICES = 10000  # Recent invoices remembered so a re-audit is not counted into the price history twice
     
     # Archive Configuration
-    MAX_ARCHIVE_SIZE = 1000
\ No newline at end of file
+    MAX_ARCHIVE_SIZE = 1000
+    # Store archived line items as per-invoice columns instead of LineItem objects
+    ARCHIVE_COLUMNAR_LINE_ITEMS = os.getenv('ARCHIVE_COLUMNAR_LINE_ITEMS', 'false').lower() == 'true'
\ No newline at end of file
@@ -0,0 +1,123 @@
+"""
+deadlines.py - Per-audit latency budgets, propagated to every model call
+
+An audit runs inside budget(Config.AUDIT_DEADLINE_SECONDS), and each stage
+that calls the model inside a nested budget of its own; a nested budget
+never extends its parent's deadline. The deadline travels in a context
+variable, so services need no extra arguments. Waits and model calls give up
+when it passes:
+
+- scheduler.FairScheduler stops queueing for a slot
+- single_flight.SingleFlight stops waiting for a shared call
+- model_client.generate passes the time left to the SDK as the request
+  timeout, where the SDK accepts one; otherwise the call runs on a bounded
+  thread pool and is abandoned (it finishes in the background and keeps its
+  scheduler slot until it does, so the quota is not overcommitted)
+
+Each raises DeadlineExceeded, which services turn into their local fallback
+and report with degraded(stage); the audit result lists those stages.
+"""
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, List, Optional
+
+from config import Config
+
+class DeadlineExceeded(TimeoutError):
+    """The current audit or stage ran out of time"""
+
+class Budget:
+    """A deadline and the stages that degraded under it, shared by nested budgets"""
+
+    def __init__(self, expires: float, degraded: List[str]):
+        self.expires = expires
+        self.degraded = degraded
+
+    def remaining(self) -> float:
+        return max(self.expires - time.monotonic(), 0.0)
+
+_budget: contextvars.ContextVar = contextvars.ContextVar('deadline_budget', default=None)
+
+@contextmanager
+def budget(seconds: Optional[float], stages: Optional[List[str]] = None) -> Iterator[Budget]:
+    """
+    Run the block with at most seconds left (None: only the enclosing deadline, if any)
+
+    Degraded stages are collected in the outermost budget's list (stages,
+    when given).
+    """
+    parent = _budget.get()
+    expires = time.monotonic() + seconds if seconds is not None else float('inf')
+    if parent is not None:
+        expires = min(expires, parent.expires)
+        stages = parent.degraded
+    current = Budget(expires, stages if stages is not None else [])
+    token = _budget.set(current)
+    try:
+        yield current
+    finally:
+        _budget.reset(token)
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline; None when there is none"""
+    current = _budget.get()
+    if current is None or current.expires == float('inf'):
+        return None
+    return current.remaining()
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+def check() -> None:
+    """Raise DeadlineExceeded if the current deadline has passed"""
+    if expired():
+        raise DeadlineExceeded("Audit deadline exceeded")
+
+def degraded(stage: str) -> None:
+    """Record that stage fell back to a local result for lack of time"""
+    current = _budget.get()
+    if current is not None and stage not in current.degraded:
+        current.degraded.append(stage)
+
+# Model calls that cannot be given a timeout; one thread per scheduler slot, so abandoned calls cannot pile up
+_abandonable = ThreadPoolExecutor(max_workers=Config.MODEL_CONCURRENCY, thread_name_prefix='verifix-model-call')
+
+def run(fn: Callable[[], Any], on_done: Callable[[], None], timed: bool = False) -> Any:
+    """
+    fn(), ended with DeadlineExceeded if the current deadline passes first
+
+    on_done runs when fn finishes, whether or not the caller is still waiting.
+    Without a deadline, or when fn is timed (it passes remaining() to the SDK
+    as its timeout), fn runs on the calling thread; a timed call that fails
+    once the deadline has passed raises DeadlineExceeded. Otherwise fn runs
+    on the bounded pool and is abandoned at the deadline.
+    """
+    left = remaining()
+    if left is not None and left <= 0:
+        on_done()
+        raise DeadlineExceeded("Audit deadline exceeded")
+    if left is None or timed:
+        try:
+            return fn()
+        except Exception as e:
+            if expired() and not isinstance(e, DeadlineExceeded):
+                raise DeadlineExceeded("Model call timed out at the audit deadline") from e
+            raise
+        finally:
+            on_done()
+
+    def call() -> Any:
+        try:
+            return fn()
+        finally:
+            on_done()
+
+    future = _abandonable.submit(call)
+    if not wait([future], timeout=left).done:
+        if future.cancel():
+            on_done()  # Never started: nothing else will release it
+        raise DeadlineExceeded("Model call abandoned at the audit deadline")
+    return future.result()
@@ -1,20 +1,40 @@
 """
 extraction_service.py - Document extraction service using Gemini Vision API
 """
+import copy
+import hashlib
 import json
-import google.generativeai as genai
-from typing import Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from project_types import ExtractedData, LineItem
 from config import Config
+from model_client import generate, lazy_model, lazy_tiers, tiered_call
+from single_flight import SingleFlight
+
+# JSON shape of each field in the extraction format, for partial extraction prompts
+FIELD_SCHEMAS = {
+    'vendor': '"string"',
+    'seller': '"string or null"',
+    'invoiceNo': '"string"',
+    'date': '"string"',
+    'totalAmount': 'number',
+    'taxAmount': 'number',
+    'gstNo': '"string or null"',
+    'poNo': '"string or null"',
+    'lineItems': '[{"description": "string", "quantity": number, "unitPrice": number, "total": number, "hsnCode": "string or null"}]',
+}
 
 class ExtractionService:
     """Service for extracting structured data from invoice documents"""
     
+    model = lazy_model()
+    tiers = lazy_tiers()
+    
     def __init__(self, api_key: Optional[str] = None):
         """Initialize the extraction service with Gemini API"""
         self.api_key = api_key or Config.GEMINI_API_KEY
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel(Config.GEMINI_MODEL)
+        self._in_flight = SingleFlight('extraction')
+        # Local checks on a tier's extraction (issue codes, empty when it passes); set by the orchestrator
+        self.output_check: Optional[Callable[[ExtractedData], List[str]]] = None
     
     def extract_from_image(self, base64_data: str, mime_type: str) -> ExtractedData:
         """
@@ -44,19 +64,92 @@ class ExtractionService:
                 'data': base64_data
             }
             
-            response = self.model.generate_content([prompt, image_part])
-            
-            # Clean and parse response
-            response_text = self._clean_json_response(response.text)
-            data = json.loads(response_text)
+            def extract() -> ExtractedData:
+                # Cheapest tier first; escalate while the output fails local checks
+                # The prompt is the same for every document, so it is sent as a cacheable preamble
+                (_, extracted), _ = tiered_call(
+                    'extraction', self.tiers, [image_part], self._parse_extraction, self._extraction_issues,
+                    preamble=prompt
+                )
+                return extracted
             
-            # Convert to ExtractedData
-            return self._convert_to_extracted_data(data)
+            # Identical uploads arriving together share one extraction
+            key = hashlib.sha256(f"{mime_type}:{base64_data}".encode('utf-8')).hexdigest()
+            extracted, _ = self._in_flight.do(key, extract)
+            # Every audit, the leader included, gets its own copy to normalize and annotate;
+            # the shared original is never mutated, so followers never copy a half-normalized one
+            return copy.deepcopy(extracted)
             
         except Exception as e:
             print(f"Error calling Gemini API: {str(e)}")
             raise e
     
+    def extract_fields(self, base64_data: str, mime_type: str, fields: List[str]) -> Dict[str, Any]:
+        """
+        Ask the model for only some fields of a document
+        
+        Args:
+            base64_data: Base64 encoded document data
+            mime_type: MIME type of the document
+            fields: camelCase field names from the extraction format
+        
+        Returns:
+            Dict of the requested fields the model supplied; fields it left
+            out or returned as null are absent, so callers keep their own values
+        """
+        if not self.api_key:
+            raise ValueError("Gemini API Key is MISSING. Please create a .env file in the 'Verifix new' folder with: GEMINI_API_KEY=your_key")
+        
+        prompt = self._build_field_prompt(fields)
+        image_part = {
+            'mime_type': mime_type,
+            'data': base64_data
+        }
+        
+        def extract() -> Dict[str, Any]:
+            response = generate('extraction', self.model, [prompt, image_part])
+            data = json.loads(self._clean_json_response(response.text))
+            return {name: data[name] for name in fields if data.get(name) is not None}
+        
+        key = hashlib.sha256(f"{mime_type}:{','.join(fields)}:{base64_data}".encode('utf-8')).hexdigest()
+        values, _ = self._in_flight.do(key, extract)
+        return copy.deepcopy(values)
+    
+    def _parse_extraction(self, response: Any) -> Tuple[Dict[str, Any], ExtractedData]:
+        """Parsed JSON and ExtractedData of an extraction response"""
+        data = json.loads(self._clean_json_response(response.text))
+        return data, self._convert_to_extracted_data(data)
+    
+    def _extraction_issues(self, parsed: Tuple[Dict[str, Any], ExtractedData]) -> List[str]:
+        """Reasons to escalate a tier's extraction: low self-reported confidence, or failed output checks"""
+        data, extracted = parsed
+        issues = []
+        confidence = data.get('confidence')
+        if isinstance(confidence, (int, float)) and confidence < Config.TIER_MIN_CONFIDENCE:
+            issues.append('low_confidence')
+        if self.output_check:
+            issues.extend(self.output_check(extracted))
+        return issues
+    
+    def build_document(self, data: Dict[str, Any]) -> ExtractedData:
+        """ExtractedData from fields in the extraction format, e.g. merged local and model fields"""
+        return self._convert_to_extracted_data(data)
+    
+    def _build_field_prompt(self, fields: List[str]) -> str:
+        """Prompt for a subset of the extraction fields"""
+        schema = ',\n'.join(f'          "{name}": {FIELD_SCHEMAS[name]}' for name in fields)
+        return f"""
+        You are an expert Indian statutory auditor and data extractor.
+        Most of this invoice has already been read. Extract ONLY these fields with high precision.
+        
+        Return ONLY a valid JSON object with exactly these keys:
+        {{
+{schema}
+        }}
+        
+        Do not include any markdown formatting or explanation, only the JSON.
+        """
+    
     def _build_extraction_prompt(self) -> str:
         """Build the prompt for deep data extraction and document audit"""
         return """
@@ -76,9 +169,7 @@ class ExtractionService:
         
         DEEP AUDIT ANALYSIS:
         Also perform a structural audit of the document and identify "anomalies":
-        - Mathematical errors: Do line item (qty * price) results match the line totals? Does sum of line totals + tax match the total amount?
         - Visual flags: Are there font mismatches, suspicious stamp overlays, or digitally altered text areas?
-        - Compliance flags: Is the GST number valid? (Starts with state code 1-37, followed by PAN, 1, Z, and checksum).
         - Logic flags: Is the date valid? Are there unrealistic amounts?
         
         Return ONLY a valid JSON object with this exact structure:
@@ -100,7 +191,8 @@ class ExtractionService:
               "total": number,
               "hsnCode": "string or null"
             }
-          ]
+          ],
+          "confidence": number between 0 and 1 (how sure you are that every field above was read correctly)
         }
         
         Do not include any markdown formatting or explanation, only the JSON.
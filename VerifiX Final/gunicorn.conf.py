@@ -0,0 +1,61 @@
+"""
+gunicorn.conf.py - Production server settings
+
+One worker process serving requests on Config.WORKER_THREADS threads. The
+archive, PO ledger, price index, generated-PO and near-duplicate caches and
+the result store are in process memory, so a second worker would see only
+part of the history; the app is thread-safe, so capacity comes from threads.
+
+The worker imports the app itself (no preload), so model clients are built
+in the serving process; gRPC channels must not be shared across fork.
+"""
+import signal
+import threading
+
+from config import Config
+
+bind = f"{Config.HOST}:{Config.PORT}"
+workers = Config.WEB_CONCURRENCY
+threads = Config.WORKER_THREADS
+worker_class = 'gthread'
+timeout = Config.REQUEST_TIMEOUT
+graceful_timeout = Config.GRACEFUL_TIMEOUT
+keepalive = 5
+accesslog = '-'
+preload_app = False
+
+def post_worker_init(worker):
+    """Warm model clients in the background; the worker starts serving at once"""
+    from wsgi import start_background_warm_up
+    start_background_warm_up()
+    worker.log.info("Worker %s warming up in background", worker.pid)
+    signal.signal(signal.SIGTERM, drain_then_exit(worker, worker.handle_exit))
+
+def drain_then_exit(worker, handle_exit):
+    """
+    SIGTERM handler: drain in-flight audits before gunicorn stops accepting
+
+    The worker keeps serving while /api/health reports draining (503) and
+    running audits, including detached SSE audit threads, finish; then
+    gunicorn's own graceful shutdown starts. The wait ends in time for that
+    shutdown to complete within the arbiter's graceful_timeout.
+    """
+    from wsgi import in_flight
+
+    def finish():
+        if not in_flight.drain(timeout=Config.GRACEFUL_TIMEOUT - Config.SHUTDOWN_MARGIN_SECONDS):
+            worker.log.warning("Worker %s stopping with %s audits still running", worker.pid, in_flight.count)
+        handle_exit(signal.SIGTERM, None)
+
+    def on_sigterm(sig, frame):
+        if not in_flight.draining:
+            in_flight.start_draining()
+            threading.Thread(target=finish, name='verifix-drain', daemon=True).start()
+
+    return on_sigterm
+
+def worker_exit(server, worker):
+    """Report audits cut short (SIGINT/SIGQUIT quick shutdown, or a drain that ran out of time)"""
+    from wsgi import in_flight
+    if in_flight.count:
+        worker.log.warning("Worker %s exiting with %s audits still running", worker.pid, in_flight.count)
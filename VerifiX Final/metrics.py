@@ -0,0 +1,210 @@
+"""
+metrics.py - In-process metrics for the Invoice Audit Agent
+
+Counters and histograms with Prometheus text exposition. Observations take
+one short lock, so instrumenting the hot path costs well under a microsecond.
+Each server worker process keeps its own registry.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+LabelValues = Tuple[str, ...]
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(labels[name] for name in self.labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        # Per label set: [bucket counts..., +Inf count, sum]
+        self._values: Dict[LabelValues, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(labels[name] for name in self.labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, **labels: str) -> int:
+        series = self._values.get(tuple(labels[name] for name in self.labels))
+        return int(sum(series[:-1])) if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            values = [(key, list(series)) for key, series in self._values.items()]
+        for key, series in values:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels + ('le',), key + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {series[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues) -> str:
+    if not names:
+        return ''
+    pairs = ','.join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return '{' + pairs + '}'
+
+class Registry:
+    """Holds every metric and renders them in Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+# ==================== METRICS ====================
+
+STAGE_DURATION = REGISTRY.register(Histogram(
+    'verifix_stage_duration_seconds', 'Duration of each audit pipeline stage', ('stage',)))
+AUDITS = REGISTRY.register(Counter(
+    'verifix_audits_total', 'Audits processed', ('outcome',)))
+MODEL_CALL_DURATION = REGISTRY.register(Histogram(
+    'verifix_model_call_duration_seconds', 'Duration of model calls', ('service',)))
+MODEL_CALLS = REGISTRY.register(Counter(
+    'verifix_model_calls_total', 'Model calls by outcome', ('service', 'outcome')))
+MODEL_TOKENS = REGISTRY.register(Counter(
+    'verifix_model_tokens_total', 'Model tokens consumed (kind: prompt, of which cached, and output)',
+    ('service', 'kind')))
+MODEL_FALLBACKS = REGISTRY.register(Counter(
+    'verifix_model_fallbacks_total', 'Results produced by a mock or deterministic fallback instead of the model',
+    ('service', 'reason')))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    'verifix_cache_requests_total', 'Cache lookups by result', ('cache', 'result')))
+EXTRACTIONS = REGISTRY.register(Counter(
+    'verifix_extractions_total', 'Documents extracted, by whether the model was needed', ('path',)))
+EXTRACTION_DURATION = REGISTRY.register(Histogram(
+    'verifix_extraction_duration_seconds', 'Document extraction time, by whether the model was needed', ('path',)))
+MODEL_TIER_CALLS = REGISTRY.register(Counter(
+    'verifix_model_tier_calls_total', 'Tiered model calls by tier and result (accepted, escalated, error)',
+    ('service', 'tier', 'result')))
+MODEL_TIER_DURATION = REGISTRY.register(Histogram(
+    'verifix_model_tier_call_duration_seconds', 'Duration of tiered model calls, including output checks',
+    ('service', 'tier')))
+MODEL_ESCALATIONS = REGISTRY.register(Counter(
+    'verifix_model_escalations_total', 'Tier escalations by the check that failed', ('service', 'tier', 'reason')))
+COALESCED_CALLS = REGISTRY.register(Counter(
+    'verifix_coalesced_calls_total', 'Model calls answered by joining an identical call already in flight',
+    ('service',)))
+CONTEXT_CACHE_EVENTS = REGISTRY.register(Counter(
+    'verifix_context_cache_events_total', 'Cached model context lifecycle (created, refreshed, failed, expired)',
+    ('event',)))
+MODEL_QUEUE_WAIT = REGISTRY.register(Histogram(
+    'verifix_model_queue_wait_seconds', 'Time model calls waited for a slot, by priority lane', ('lane',)))
+
+# ==================== HELPERS ====================
+
+@contextmanager
+def stage_timer(stage: str, timings: Optional[Dict[str, float]] = None) -> Iterator[None]:
+    """Time a pipeline stage; also record milliseconds into timings if given"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_DURATION.observe(elapsed, stage=stage)
+        if timings is not None:
+            timings[stage] = round(timings.get(stage, 0.0) + elapsed * 1000, 3)
+
+def instrumented_call(service: str, model, contents: Any, **kwargs):
+    """Call model.generate_content, recording latency, outcome and token usage"""
+    start = time.perf_counter()
+    try:
+        response = model.generate_content(contents, **kwargs)
+    except Exception:
+        MODEL_CALL_DURATION.observe(time.perf_counter() - start, service=service)
+        MODEL_CALLS.inc(service=service, outcome='error')
+        raise
+    MODEL_CALL_DURATION.observe(time.perf_counter() - start, service=service)
+    MODEL_CALLS.inc(service=service, outcome='success')
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is not None:
+        MODEL_TOKENS.inc(getattr(usage, 'prompt_token_count', 0) or 0, service=service, kind='prompt')
+        MODEL_TOKENS.inc(getattr(usage, 'cached_content_token_count', 0) or 0, service=service, kind='cached')
+        MODEL_TOKENS.inc(getattr(usage, 'candidates_token_count', 0) or 0, service=service, kind='output')
+    return response
+
+def record_fallback(service: str, reason: str) -> None:
+    """Count a result served by a fallback path instead of the model"""
+    MODEL_FALLBACKS.inc(service=service, reason=reason)
+
+def record_cache(cache: str, hit: bool) -> None:
+    """Count a cache hit or miss"""
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+def record_extraction(path: str, seconds: float) -> None:
+    """Count one extracted document and its latency by extraction path"""
+    EXTRACTIONS.inc(path=path)
+    EXTRACTION_DURATION.observe(seconds, path=path)
+
+def record_tier_call(service: str, tier: str, result: str, seconds: float, reasons: Tuple[str, ...] = ()) -> None:
+    """Count one tiered model call, its latency and, when escalated, the failed checks"""
+    MODEL_TIER_CALLS.inc(service=service, tier=tier, result=result)
+    MODEL_TIER_DURATION.observe(seconds, service=service, tier=tier)
+    for reason in reasons:
+        MODEL_ESCALATIONS.inc(service=service, tier=tier, reason=reason)
+
+def record_coalesced(service: str) -> None:
+    """Count a caller that shared another caller's in-flight model call"""
+    COALESCED_CALLS.inc(service=service)
+
+def record_context_cache(event: str) -> None:
+    """Count a cached model context being created, refreshed or given up on"""
+    CONTEXT_CACHE_EVENTS.inc(event=event)
+
+def record_queue_wait(lane: str, seconds: float) -> None:
+    """Record how long a model call queued in its lane before starting"""
+    MODEL_QUEUE_WAIT.observe(seconds, lane=lane)
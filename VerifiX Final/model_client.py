@@ -0,0 +1,307 @@
+"""
+model_client.py - Deferred construction of Gemini model clients, and tier routing
+
+google.generativeai takes most of a second to import, so services declare
+their model with lazy_model and nothing is imported or built until the first
+model call (or an explicit warm-up).
+
+Services that route by tier also declare lazy_tiers and call tiered_call:
+each tier in Config.MODEL_TIERS is tried in turn, cheapest first, and a
+tier's output is accepted only if it parses and passes the caller's local
+checks; otherwise the call escalates to the next tier.
+
+A tiered call may pass its static instructions separately as a preamble.
+Where the model supports context caching, the preamble is uploaded once per
+model (ContextCache) and each call sends only its own data; otherwise the
+preamble is sent in front of the data as before.
+
+Every model call goes through generate, which waits for a slot from the
+scheduler's priority lanes before calling the model, and gives up at the
+current audit deadline (deadlines.py).
+"""
+import datetime
+import hashlib
+import inspect
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, TypeVar
+
+import deadlines
+from config import Config
+from metrics import instrumented_call, record_cache, record_context_cache, record_tier_call
+from scheduler import model_calls
+from single_flight import SingleFlight
+
+T = TypeVar('T')
+
+_genai = None
+_configured_key: Optional[str] = None
+_lock = threading.Lock()
+
+def get_genai():
+    """Import google.generativeai on first use"""
+    global _genai
+    if _genai is None:
+        with _lock:
+            if _genai is None:
+                import google.generativeai as genai
+                _genai = genai
+    return _genai
+
+def create_model(api_key: Optional[str], model_name: str = Config.GEMINI_MODEL) -> Any:
+    """Configure the SDK for api_key (once) and build a GenerativeModel"""
+    global _configured_key
+    genai = get_genai()
+    with _lock:
+        if _configured_key != api_key:
+            genai.configure(api_key=api_key)
+            _configured_key = api_key
+    return genai.GenerativeModel(model_name)
+
+class lazy_model:
+    """
+    Service attribute that builds the GenerativeModel on first access
+
+    Non-data descriptor: the built model is stored on the instance, so later
+    reads are plain attribute lookups and tests can still assign service.model.
+    """
+
+    def __set_name__(self, owner, name: str) -> None:
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        model = create_model(instance.api_key)
+        instance.__dict__[self.name] = model
+        return model
+
+class ModelTier(NamedTuple):
+    name: str
+    model: Any
+
+class lazy_tiers:
+    """
+    Service attribute listing one model per Config.MODEL_TIERS entry, cheapest first
+
+    The tier named Config.GEMINI_MODEL is the service's own model attribute,
+    so assigning service.model replaces that tier; the others are built on
+    first use. Assign service.tiers to replace the whole list.
+    """
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        built = instance.__dict__.setdefault('_tier_models', {})
+        tiers = []
+        for name in Config.MODEL_TIERS:
+            if name == Config.GEMINI_MODEL:
+                tiers.append(ModelTier(name, instance.model))
+                continue
+            if name not in built:
+                built[name] = create_model(instance.api_key, name)
+            tiers.append(ModelTier(name, built[name]))
+        return tiers
+
+# ==================== CONTEXT CACHING ====================
+
+class _CachedContext(NamedTuple):
+    model: Optional[Any]  # Bound to the uploaded preamble; None to send the preamble with each call
+    handle: Optional[Any]  # Uploaded context, for extending its lifetime
+    expires: float  # time.monotonic() at which the upload lapses
+    renew: float  # time.monotonic() after which the entry is refreshed or retried
+
+def _genai_cache_context(model: Any, preamble: str, ttl: float) -> Tuple[Any, Any]:
+    genai = get_genai()
+    handle = genai.caching.CachedContent.create(
+        model=model.model_name, system_instruction=preamble, ttl=datetime.timedelta(seconds=ttl)
+    )
+    return genai.GenerativeModel.from_cached_content(cached_content=handle), handle
+
+def _context_creator(model: Any) -> Optional[Callable[[str, float], Tuple[Any, Any]]]:
+    """
+    How to upload a preamble for model: a function (preamble, ttl seconds) ->
+    (model bound to the upload, upload handle), or None when the model cannot cache
+
+    Local stand-ins provide cache_context themselves. For Gemini models the
+    installed SDK must have the caching API (google-generativeai >= 0.7).
+    """
+    create = getattr(model, 'cache_context', None)
+    if create is not None:
+        return create
+    if not type(model).__module__.startswith('google.generativeai'):
+        return None
+    genai = get_genai()
+    if not hasattr(genai, 'caching') or not hasattr(genai.GenerativeModel, 'from_cached_content'):
+        return None
+    return lambda preamble, ttl: _genai_cache_context(model, preamble, ttl)
+
+def _is_not_found(error: Exception) -> bool:
+    """Whether a call failed because its cached context no longer exists"""
+    return type(error).__name__ == 'NotFound'
+
+class ContextCache:
+    """
+    Uploaded preambles, one per (model, preamble)
+
+    An upload is created on first use, its lifetime extended when it is
+    within Config.CONTEXT_CACHE_REFRESH_SECONDS of expiring, and re-created
+    if it lapses or the API reports it gone. Models that cannot cache,
+    preambles below Config.CONTEXT_CACHE_MIN_TOKENS and failed uploads get
+    None, so the caller sends the full prompt; a failed upload is retried
+    after Config.CONTEXT_CACHE_RETRY_SECONDS.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Tuple[int, str], _CachedContext] = {}
+        self._models: Dict[int, Any] = {}  # Keeps keyed models alive so their ids are not reused
+        self._renewals = SingleFlight('context_cache')
+
+    @staticmethod
+    def _key(model: Any, preamble: str) -> Tuple[int, str]:
+        return id(model), hashlib.sha256(preamble.encode('utf-8')).hexdigest()
+
+    def model_for(self, model: Any, preamble: str) -> Optional[Any]:
+        """model bound to an upload of preamble, or None to send the preamble with the call"""
+        if not Config.CONTEXT_CACHING:
+            return None
+        key = self._key(model, preamble)
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() >= entry.renew:
+            entry, _ = self._renewals.do(f"{key[0]}:{key[1]}", lambda: self._renew(key, model, preamble))
+        record_cache('context', entry.model is not None)
+        return entry.model
+
+    def invalidate(self, model: Any, preamble: str) -> None:
+        """Forget an upload the API no longer has; the next call re-creates it"""
+        if self._entries.pop(self._key(model, preamble), None) is not None:
+            record_context_cache('expired')
+
+    def _renew(self, key: Tuple[int, str], model: Any, preamble: str) -> _CachedContext:
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and now < entry.renew:
+            return entry  # Renewed by the call this one waited on
+        ttl = Config.CONTEXT_CACHE_TTL_SECONDS
+        renew = now + max(ttl - Config.CONTEXT_CACHE_REFRESH_SECONDS, 0)
+
+        if entry is not None and entry.handle is not None and now < entry.expires:
+            try:
+                entry.handle.update(ttl=datetime.timedelta(seconds=ttl))
+                entry = entry._replace(expires=now + ttl, renew=renew)
+                record_context_cache('refreshed')
+            except Exception as e:
+                print(f"Context cache refresh failed ({str(e)}), uploading again")
+                entry = None
+            if entry is not None:
+                self._entries[key] = entry
+                return entry
+
+        create = _context_creator(model)
+        if create is None or len(preamble) // 4 < Config.CONTEXT_CACHE_MIN_TOKENS:
+            entry = _CachedContext(None, None, float('inf'), float('inf'))
+        else:
+            try:
+                cached_model, handle = create(preamble, ttl)
+                entry = _CachedContext(cached_model, handle, now + ttl, renew)
+                record_context_cache('created')
+            except Exception as e:
+                print(f"Context cache unavailable ({str(e)}), sending full prompts")
+                retry = now + Config.CONTEXT_CACHE_RETRY_SECONDS
+                entry = _CachedContext(None, None, retry, retry)
+                record_context_cache('failed')
+        self._models[key[0]] = model
+        self._entries[key] = entry
+        return entry
+
+CONTEXT_CACHE = ContextCache()
+
+def _request_options(model: Any) -> Dict[str, Any]:
+    """Per-request timeout for the current deadline, for SDKs whose generate_content accepts one"""
+    left = deadlines.remaining()
+    if left is None or not type(model).__module__.startswith('google.generativeai'):
+        return {}
+    if 'request_options' not in inspect.signature(model.generate_content).parameters:
+        return {}  # Before google-generativeai 0.4 the call runs on deadlines' pool and is abandoned instead
+    return {'request_options': {'timeout': max(left, 1.0)}}
+
+def _scheduled_call(service: str, model: Any, contents: Any) -> Any:
+    """One model call in a scheduler slot, within the current deadline"""
+    release = model_calls.acquire()
+    kwargs = _request_options(model)
+    return deadlines.run(lambda: instrumented_call(service, model, contents, **kwargs), release, timed=bool(kwargs))
+
+def generate(service: str, model: Any, contents: Any, preamble: Optional[str] = None) -> Any:
+    """
+    Make one model call once the scheduler gives it a slot (see scheduler.py)
+
+    Raises deadlines.DeadlineExceeded when the current audit deadline passes
+    while queued or waiting for the model.
+
+    With a static preamble, contents must be a list; the preamble comes from
+    the context cache when possible, and a call whose cached context has
+    lapsed on the API side is retried once with the preamble sent in full.
+    """
+    if preamble is None:
+        return _scheduled_call(service, model, contents)
+    cached = CONTEXT_CACHE.model_for(model, preamble)
+    if cached is not None:
+        try:
+            return _scheduled_call(service, cached, contents)
+        except Exception as e:
+            if not _is_not_found(e):
+                raise
+            CONTEXT_CACHE.invalidate(model, preamble)
+    return _scheduled_call(service, model, [preamble] + contents)
+
+# ==================== TIERS ====================
+
+def tiered_call(
+    service: str,
+    tiers: List[ModelTier],
+    contents: Any,
+    parse: Callable[[Any], T],
+    check: Callable[[T], List[str]],
+    preamble: Optional[str] = None
+) -> Tuple[T, str]:
+    """
+    Call each tier in turn until one's parsed output passes check
+
+    A tier whose call fails, whose response does not parse, or whose output
+    check reports issues escalates to the next tier. The last tier's output
+    is returned unchecked, and its exceptions propagate, as does
+    DeadlineExceeded from any tier.
+
+    Args:
+        service: Metrics label of the calling service
+        tiers: Models to try, cheapest first
+        contents: generate_content input; a list when preamble is given
+        parse: Turns a response into the output; raising escalates
+        check: Issue codes for an output, empty when it is acceptable
+        preamble: Static instructions sent (or cached) ahead of contents
+
+    Returns:
+        The accepted output and the name of the tier that produced it
+    """
+    for i, tier in enumerate(tiers):
+        last = i == len(tiers) - 1
+        start = time.perf_counter()
+        try:
+            output = parse(generate(service, tier.model, contents, preamble))
+        except deadlines.DeadlineExceeded:
+            record_tier_call(service, tier.name, 'error', time.perf_counter() - start)
+            raise  # No time left for another tier
+        except Exception as e:
+            record_tier_call(service, tier.name, 'error', time.perf_counter() - start, () if last else ('error',))
+            if last:
+                raise
+            print(f"{service}: {tier.name} failed ({str(e)}), escalating")
+            continue
+        issues = [] if last else check(output)
+        elapsed = time.perf_counter() - start
+        if not issues:
+            record_tier_call(service, tier.name, 'accepted', elapsed)
+            return output, tier.name
+        record_tier_call(service, tier.name, 'escalated', elapsed, tuple(issues))
+        print(f"{service}: {tier.name} output failed checks ({', '.join(issues)}), escalating")
+    raise ValueError(f"No model tiers configured for {service}")
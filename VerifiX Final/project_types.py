@@ -2,8 +2,14 @@
 types.py - Data types and models for the Invoice Audit Agent
 """
 from enum import Enum
-from typing import List, Optional
-from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union, get_args, get_origin, get_type_hints
+from dataclasses import dataclass, fields, is_dataclass
+
+try:
+    import orjson
+except ImportError:  # Optional faster JSON backend
+    orjson = None
+import json
 
 class RiskLevel(str, Enum):
     LOW = "LOW"
@@ -16,7 +22,10 @@ class AuditStatus(str, Enum):
     COMPLETED = "completed"
     FAILED = "failed"
 
-@dataclass
+# Archived documents are kept for the life of the process, so the types that
+# make up ExtractedData use __slots__; coordinates are immutable as well.
+
+@dataclass(frozen=True, slots=True)
 class BoundingBox:
     x: float
     y: float
@@ -31,8 +40,9 @@ class AuditFlag:
     description: str
     field: str
     coords: Optional[BoundingBox] = None
+    line_item: Optional[int] = None  # Index into the invoice's line items for line-level flags
 
-@dataclass
+@dataclass(slots=True)
 class LineItem:
     description: str
     quantity: int
@@ -41,7 +51,7 @@ class LineItem:
     hsn_code: Optional[str] = None
     coords: Optional[BoundingBox] = None
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class FieldCoordinates:
     vendor: Optional[BoundingBox] = None
     invoice_no: Optional[BoundingBox] = None
@@ -50,7 +60,7 @@ class FieldCoordinates:
     date: Optional[BoundingBox] = None
     po_no: Optional[BoundingBox] = None
 
-@dataclass
+@dataclass(slots=True)
 class ExtractedData:
     vendor: str
     invoice_no: str
@@ -64,6 +74,9 @@ class ExtractedData:
     anomalies: Optional[List[str]] = None
     field_coords: Optional[FieldCoordinates] = None
     flags: Optional[List[AuditFlag]] = None # Added for trace
+    provenance: Optional[str] = None  # How a reference PO was obtained; None for extracted documents
+    normalized_fields: Optional[List[str]] = None  # Fields rewritten into canonical form after extraction
+    duplicate_of: Optional[str] = None  # Earlier invoice this upload is a near-duplicate scan of
 
 @dataclass
 class AgentStep:
@@ -96,4 +109,90 @@ class AuditResult:
     recommendation: str
     match_score: float
     hash: str
-    agent_trace: List[AgentStep]
\ No newline at end of file
+    agent_trace: List[AgentStep]
+    stage_timings: Optional[Dict[str, float]] = None  # Milliseconds per pipeline stage
+    degraded_stages: Optional[List[str]] = None  # Stages that fell back to local results when the audit ran out of time
+
+
+# ==================== SERIALIZATION ====================
+#
+# One serializer is compiled per (dataclass, key style) the first time it is
+# needed. Field names, camelCase keys and per-field converters are resolved at
+# compile time, so serializing an object is a single dict literal per level
+# with no deep copies (unlike dataclasses.asdict) and no key rebuilding.
+
+_SCALARS = (str, int, float, bool, type(None))
+_SERIALIZERS: Dict[Tuple[type, bool], Callable[[Any], Dict[str, Any]]] = {}
+
+def camel_case(name: str) -> str:
+    """Convert snake_case to camelCase"""
+    head, *rest = name.split('_')
+    return head + ''.join(word.capitalize() for word in rest)
+
+def to_dict(obj: Any, camel: bool = False) -> Any:
+    """Convert dataclasses, enums, lists and dicts to JSON-ready values"""
+    cls = type(obj)
+    if cls in _SCALARS:
+        return obj
+    if isinstance(obj, Enum):
+        return obj.value
+    if cls is list or cls is tuple:
+        return [to_dict(item, camel) for item in obj]
+    if cls is dict:
+        return {k: to_dict(v, camel) for k, v in obj.items()}
+    if is_dataclass(obj):
+        return _serializer_for(cls, camel)(obj)
+    if isinstance(obj, _SCALARS):
+        return obj
+    return str(obj)
+
+def to_json(obj: Any, camel: bool = False) -> bytes:
+    """Serialize to UTF-8 JSON bytes, using orjson when it is installed"""
+    data = to_dict(obj, camel)
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def _serializer_for(cls: type, camel: bool) -> Callable[[Any], Dict[str, Any]]:
+    serializer = _SERIALIZERS.get((cls, camel))
+    if serializer is None:
+        serializer = _SERIALIZERS[(cls, camel)] = _compile_serializer(cls, camel)
+    return serializer
+
+def _field_converter(annotation: Any, camel: bool, refs: Dict[str, Any]) -> Optional[str]:
+    """Return a source expression template for a field value, None if it is already JSON-ready"""
+    if annotation in _SCALARS:
+        return None
+    origin, args = get_origin(annotation), get_args(annotation)
+    if origin is Union:
+        inner = [a for a in args if a is not type(None)]
+        if len(inner) == 1:
+            converter = _field_converter(inner[0], camel, refs)
+            return None if converter is None else f"(None if {{v}} is None else {converter})"
+    elif origin in (list, List) and args:
+        converter = _field_converter(args[0], camel, refs)
+        if converter is None:
+            return "list({v})"
+        return f"[{converter.format(v='i')} for i in {{v}}]"
+    elif isinstance(annotation, type) and issubclass(annotation, Enum):
+        return "{v}.value"
+    elif isinstance(annotation, type) and is_dataclass(annotation):
+        name = f"_ser_{annotation.__name__}"
+        refs[name] = lambda obj, cls=annotation: _serializer_for(cls, camel)(obj)
+        return f"{name}({{v}})"
+    return f"to_dict({{v}}, {camel})"
+
+def _compile_serializer(cls: type, camel: bool) -> Callable[[Any], Dict[str, Any]]:
+    hints = get_type_hints(cls)
+    refs: Dict[str, Any] = {'to_dict': to_dict}
+    items = []
+    for f in fields(cls):
+        key = camel_case(f.name) if camel else f.name
+        value = f"obj.{f.name}"
+        converter = _field_converter(hints[f.name], camel, refs)
+        if converter is not None:
+            value = converter.format(v=value)
+        items.append(f"{key!r}: {value}")
+    source = f"def serialize(obj):\n    return {{{', '.join(items)}}}\n"
+    exec(source, refs)
+    return refs['serialize']
@@ -0,0 +1,165 @@
+"""
+scheduler.py - Priority lanes and fair sharing for model calls
+
+Model calls share one quota, so a worker runs at most
+Config.MODEL_CONCURRENCY of them at a time and queues the rest. Each call
+belongs to a lane and a flow:
+
+- lane: 'interactive' (dashboard uploads, the default) or 'bulk' (batch
+  uploads and re-audits). Queued interactive calls always start first, and
+  bulk calls never occupy the last Config.MODEL_INTERACTIVE_RESERVED slots,
+  so interactive calls start at once while fewer than that are running,
+  however much bulk work is queued; bulk work uses the rest.
+- flow: the client or batch the call is made for. Within a lane, flows share
+  slots in proportion to their weight (start-time fair queueing, Goyal et al.
+  1996), so one large batch cannot starve a smaller one.
+
+The lane and flow are set per audit with the priority() context manager and
+picked up by every model call made inside it.
+"""
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Mapping, Optional, Tuple
+
+import deadlines
+from config import Config
+from metrics import record_queue_wait
+
+LANES = ('interactive', 'bulk')  # Highest priority first
+
+# Flow records whose finish tag is behind the lane's virtual time carry no
+# state worth keeping; they are pruned once a lane tracks this many flows
+_MAX_IDLE_FLOWS = 1024
+
+_priority: contextvars.ContextVar = contextvars.ContextVar('model_priority', default=('interactive', 'default'))
+
+@contextmanager
+def priority(lane: str, flow: str = 'default') -> Iterator[None]:
+    """Run model calls made in the block in lane, on behalf of flow"""
+    if lane not in LANES:
+        raise ValueError(f"Unknown lane: {lane}")
+    token = _priority.set((lane, flow))
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def priority_for(headers: Mapping[str, str], default_flow: Optional[str]) -> Tuple[str, str]:
+    """
+    Lane and flow requested by an API call
+
+    X-VerifiX-Priority: bulk puts the audit in the bulk lane (anything else is
+    interactive); X-VerifiX-Flow names the batch or client, defaulting to
+    default_flow (e.g. the client address).
+    """
+    lane = 'bulk' if headers.get('X-VerifiX-Priority', '').strip().lower() == 'bulk' else 'interactive'
+    return lane, headers.get('X-VerifiX-Flow') or default_flow or 'default'
+
+class _Waiter:
+    __slots__ = ('granted', 'enqueued')
+
+    def __init__(self):
+        self.granted = threading.Event()
+        self.enqueued = time.perf_counter()
+
+class _Lane:
+    def __init__(self):
+        self.queue: List[Tuple[float, int, _Waiter]] = []  # (start tag, arrival, waiter)
+        self.finish: Dict[str, float] = {}  # Flow -> finish tag of its latest call
+        self.virtual_time = 0.0  # Start tag of the call most recently started
+        self.running = 0
+
+    def tag(self, flow: str, weight: float) -> float:
+        """Start tag of a new call for flow, advancing the flow's finish tag by 1 / weight"""
+        if len(self.finish) > _MAX_IDLE_FLOWS:
+            self.finish = {f: t for f, t in self.finish.items() if t > self.virtual_time}
+        start = max(self.virtual_time, self.finish.get(flow, 0.0))
+        self.finish[flow] = start + 1.0 / weight
+        return start
+
+class FairScheduler:
+    """Limits concurrent calls, starting queued ones by lane, then by weighted fair share within the lane"""
+
+    def __init__(
+        self,
+        capacity: Optional[int] = None,
+        reserved: Optional[int] = None,
+        weights: Optional[Dict[str, float]] = None
+    ):
+        self.capacity = capacity if capacity is not None else Config.MODEL_CONCURRENCY
+        reserved = reserved if reserved is not None else Config.MODEL_INTERACTIVE_RESERVED
+        self.reserved = min(reserved, self.capacity - 1)
+        self.weights = weights if weights is not None else Config.MODEL_FLOW_WEIGHTS
+        self._lanes = {lane: _Lane() for lane in LANES}
+        self._arrivals = itertools.count()
+        self._lock = threading.Lock()
+
+    def _limit(self, lane: str) -> int:
+        return self.capacity if lane == LANES[0] else self.capacity - self.reserved
+
+    def _running(self) -> int:
+        return sum(lane.running for lane in self._lanes.values())
+
+    def depth(self, lane: str) -> int:
+        """Calls queued in lane"""
+        return len(self._lanes[lane].queue)
+
+    def running(self, lane: str) -> int:
+        """Calls in flight from lane"""
+        return self._lanes[lane].running
+
+    def acquire(self) -> Callable[[], None]:
+        """
+        Wait for a slot for the current lane and flow; returns the function that frees it
+
+        Raises deadlines.DeadlineExceeded, leaving the queue, if the current
+        deadline passes first.
+        """
+        name, flow = _priority.get()
+        waiter = _Waiter()
+        with self._lock:
+            lane = self._lanes[name]
+            entry = (lane.tag(flow, self.weights.get(flow, 1.0)), next(self._arrivals), waiter)
+            heapq.heappush(lane.queue, entry)
+            self._dispatch()
+        if not waiter.granted.wait(deadlines.remaining()):
+            with self._lock:
+                if not waiter.granted.is_set():
+                    lane.queue.remove(entry)
+                    heapq.heapify(lane.queue)
+                    raise deadlines.DeadlineExceeded("Audit deadline passed while queued for a model call")
+        record_queue_wait(name, time.perf_counter() - waiter.enqueued)
+
+        def release() -> None:
+            with self._lock:
+                lane.running -= 1
+                self._dispatch()
+        return release
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold one call slot for the block"""
+        release = self.acquire()
+        try:
+            yield
+        finally:
+            release()
+
+    def _dispatch(self) -> None:
+        """Start queued calls while slots are free: higher lanes first, lowest start tag within a lane"""
+        for name in LANES:
+            lane = self._lanes[name]
+            while lane.queue and self._running() < self._limit(name):
+                start, _, waiter = heapq.heappop(lane.queue)
+                lane.virtual_time = start
+                lane.running += 1
+                waiter.granted.set()
+            if lane.queue:
+                return  # Lower lanes wait while this one has queued calls
+
+# Shared by every model call in the process
+model_calls = FairScheduler()
@@ -0,0 +1,71 @@
+"""
+single_flight.py - Coalescing of identical in-flight model calls
+
+When several threads ask the same question at once (the same document
+uploaded twice, two audits checking the same vendor pair), only the first
+caller runs the call; the others wait for it and receive the same result or
+exception. Nothing is remembered once the call completes, so this complements
+rather than replaces caching.
+
+Waiting callers give up at their own audit deadline (see deadlines.py).
+"""
+import threading
+from typing import Any, Callable, Dict, Tuple
+
+import deadlines
+from metrics import record_coalesced
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers share it"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run fn() unless a call for key is already in flight
+
+        Returns:
+            (result, shared) where shared is True for callers that waited on
+            another thread's call instead of running fn themselves
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            record_coalesced(self.name)
+            if not call.done.wait(deadlines.remaining()):
+                raise deadlines.DeadlineExceeded("Audit deadline passed while waiting for a shared call")
+            if isinstance(call.error, deadlines.DeadlineExceeded) and not deadlines.expired():
+                return self.do(key, fn)  # The leader's deadline, not ours; try again
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
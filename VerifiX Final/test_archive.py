@@ -0,0 +1,108 @@
+import os
+import sys
+
+# Ensure we can import modules
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'Vision'))
+
+from audit_orchestrator import AuditOrchestrator
+from matching_service import PROVENANCE_SYNTHETIC
+from project_types import BoundingBox, LineItem, to_json
+from repository import StatutoryArchive, get_sample_invoice
+from rules_engine import RulesEngine
+
+def test_columnar_roundtrip():
+    print("Testing columnar line item storage round-trip...")
+    invoice = get_sample_invoice()
+    invoice.line_items += [
+        LineItem(description="Cabling", quantity=2.5, unit_price=100.0, total=250.0),
+        LineItem(description="Racks", quantity=3, unit_price=50, total=150, hsn_code="9403",
+                 coords=BoundingBox(x=1, y=2, w=3, h=4)),
+        LineItem(description="Patch cords", quantity=10.0, unit_price=20.0, total=200.0),
+    ]
+
+    archive = StatutoryArchive()
+    archive.columnar = True
+    archive.add_invoice(invoice)
+
+    restored = archive.get_all_invoices()[0]
+    assert restored == invoice, restored
+    assert type(restored.line_items[1].quantity) is int
+    assert type(restored.line_items[-1].quantity) is float and type(restored.line_items[-2].quantity) is int
+    assert [type(n) for n in (restored.line_items[-2].unit_price, restored.line_items[-2].total)] == [int, int]
+    assert [type(n) for n in (restored.line_items[-1].unit_price, restored.line_items[-1].total)] == [float, float]
+    assert restored.line_items[2].coords is None and restored.line_items[-2].coords is not None
+    assert to_json(restored, camel=True) == to_json(invoice, camel=True)
+    print("SUCCESS: Archived invoice rebuilt unchanged from columns")
+
+def test_generated_po_reused_across_reaudits():
+    print("Testing generated PO cache for invoices without a PO number...")
+    orchestrator = AuditOrchestrator(StatutoryArchive())
+    orchestrator.matching_service.api_key = None
+    orchestrator.risk_scoring.api_key = None
+    generated = []
+
+    def fake_generate(invoice):
+        po = orchestrator.matching_service._get_mock_po(invoice)
+        po.provenance = PROVENANCE_SYNTHETIC
+        generated.append(po)
+        return po
+
+    orchestrator.matching_service.generate_reference_po = fake_generate
+
+    def upload(invoice_no, po_no=None):
+        invoice = get_sample_invoice()
+        invoice.po_no = po_no
+        invoice.invoice_no = invoice_no
+        orchestrator.extraction_service.extract_from_image = lambda data, mime: invoice
+        return orchestrator.process_document("ZHVtbXk=", "image/png")
+
+    first = upload("INV-1")
+    second = upload("INV-1-RESCAN")
+    assert len(generated) == 1, len(generated)
+    assert second.po_match is first.po_match
+    assert second.po_match.provenance == PROVENANCE_SYNTHETIC
+
+    # The same bill quoting a PO number gets the cached PO under that number, registered in the archive
+    for po_no in ("PO/NEW/2024/1", "PO/NEW/2024/2"):
+        result = upload(f"INV-{po_no}", po_no)
+        assert result.po_match.po_no == po_no and orchestrator.archive.get_po(po_no) is result.po_match
+    assert len(generated) == 1, len(generated)
+    print("SUCCESS: Re-audit reused the synthetic PO without regenerating it")
+
+def test_cumulative_po_billing():
+    print("Testing cumulative billing against one PO across invoices...")
+    archive = StatutoryArchive()
+    engine = RulesEngine()
+    po = archive.get_po("PO/MEITY/2024/221")
+
+    def partial_invoice(number):
+        # 90% of the PO amount and 9 of its 10 servers: fine on its own
+        invoice = get_sample_invoice()
+        invoice.invoice_no = number
+        invoice.total_amount = 450000.0
+        invoice.tax_amount = 68644.07
+        invoice.line_items = [LineItem("Enterprise Server Hardware", 9, 41000.0, 369000.0, "847130")]
+        return invoice
+
+    def cumulative_flags(invoice):
+        flags = engine.validate(invoice, po, None, archive.price_index, archive.po_ledger)
+        return sorted(f.id for f in flags if f.id.startswith("R-PO-010"))
+
+    first = partial_invoice("INV-A")
+    assert cumulative_flags(first) == []
+    archive.add_invoice(first)
+
+    # Re-auditing the same invoice is not counted against itself
+    assert cumulative_flags(partial_invoice("INV-A")) == []
+    archive.add_invoice(partial_invoice("INV-A"))
+    assert archive.po_ledger.consumed(po.po_no).invoice_count == 1
+
+    second = partial_invoice("INV-B")
+    assert cumulative_flags(second) == ["R-PO-010", "R-PO-010-0"], cumulative_flags(second)
+    print("SUCCESS: Second 90% invoice flagged for amount and quantity")
+
+if __name__ == "__main__":
+    test_columnar_roundtrip()
+    test_generated_po_reused_across_reaudits()
+    test_cumulative_po_billing()
@@ -0,0 +1,64 @@
+import os
+import sys
+from dataclasses import replace
+
+# Ensure we can import modules
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'Vision'))
+
+from project_types import LineItem
+from repository import get_sample_invoice
+from rules_engine import RulesEngine
+
+def arithmetic_flags(flags):
+    return [f for f in flags if f.id.startswith("R-FIN-012")]
+
+def test_line_arithmetic_rule():
+    print("Testing deterministic line arithmetic rule...")
+    engine = RulesEngine()
+    assert arithmetic_flags(engine.validate(get_sample_invoice())) == []
+
+    # 3 x 0.1 is 0.30000000000000004 in floats; Decimal keeps it at 0.30
+    exact = replace(get_sample_invoice(), total_amount=0.36, tax_amount=0.06,
+                    line_items=[LineItem("Paper clips", 3, 0.1, 0.3, "8305")])
+    assert arithmetic_flags(engine.validate(exact)) == []
+
+    wrong = get_sample_invoice()
+    wrong.line_items[1] = LineItem("Network Infrastructure Setup", 2, 90000.0, 90000.0, "998314",
+                                   coords=wrong.line_items[1].coords)
+    flags = arithmetic_flags(engine.validate(wrong))
+    line_flag = next(f for f in flags if f.line_item is not None)
+    assert line_flag.id == "R-FIN-012-1" and line_flag.coords == wrong.line_items[1].coords
+    assert "variance ₹-90,000.00" in line_flag.description, line_flag.description
+    # The stated line total still adds up to the invoice total
+    assert len(flags) == 1, flags
+
+    padded = replace(get_sample_invoice(), total_amount=600000.0)
+    flags = arithmetic_flags(engine.validate(padded))
+    assert [f.id for f in flags] == ["R-FIN-012"] and "₹+10,000.00" in flags[0].description, flags
+    print(f"SUCCESS: {line_flag.description}")
+
+def test_line_arithmetic_batch_matches_single():
+    print("Testing batch arithmetic path against the single-invoice path...")
+    engine = RulesEngine()
+    invoices = []
+    for i in range(50):
+        invoice = get_sample_invoice()
+        if i % 7 == 0:
+            invoice.line_items[0].total += 5  # Off by ₹5 on one line
+        if i % 5 == 0:
+            invoice.total_amount += 2.5
+        if i % 11 == 0:
+            invoice.line_items[1].quantity = "one"  # Unparseable; skipped, not an error
+        invoices.append(invoice)
+
+    pairs = [(invoice, None) for invoice in invoices]
+    single = [sorted(f.id for f in arithmetic_flags(engine.validate(*pair))) for pair in pairs]
+    batch = [sorted(f.id for f in arithmetic_flags(flags)) for flags in engine.validate_batch(pairs)]
+    assert single == batch
+    assert sum(1 for ids in single if "R-FIN-012-0" in ids) == 8
+    print("SUCCESS: Batch and single paths agree")
+
+if __name__ == "__main__":
+    test_line_arithmetic_rule()
+    test_line_arithmetic_batch_matches_single()
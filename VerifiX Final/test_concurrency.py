@@ -0,0 +1,133 @@
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Ensure we can import modules
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'Vision'))
+
+from audit_orchestrator import AuditOrchestrator
+from extraction_service import ExtractionService
+from matching_service import MatchingService
+from model_client import ModelTier
+from repository import StatutoryArchive, get_sample_invoice
+
+THREADS = 16
+AUDITS = 400
+
+def build_orchestrator():
+    archive = StatutoryArchive()
+    orchestrator = AuditOrchestrator(archive)
+    # Keep every stage local: no model calls, deterministic fallbacks only
+    orchestrator.matching_service.api_key = None
+    orchestrator.risk_scoring.api_key = None
+
+    def fake_extract(base64_data, mime_type):
+        invoice = get_sample_invoice()
+        invoice.vendor = base64_data
+        invoice.po_no = f"PO/STRESS/{base64_data}"
+        return invoice
+
+    orchestrator.extraction_service.extract_from_image = fake_extract
+    return orchestrator, archive
+
+def test_concurrent_audits():
+    print("Testing concurrent audits on a shared orchestrator...")
+    orchestrator, archive = build_orchestrator()
+    start = threading.Barrier(THREADS)
+
+    def run(i):
+        if i < THREADS:
+            start.wait()
+        return orchestrator.process_document(f"VENDOR-{i}", "image/png")
+
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        results = list(pool.map(run, range(AUDITS)))
+
+    ids = {r.id for r in results}
+    hashes = {r.hash for r in results}
+    assert len(ids) == AUDITS, f"duplicate audit ids: {AUDITS - len(ids)}"
+    assert len(hashes) == AUDITS, f"duplicate audit hashes: {AUDITS - len(hashes)}"
+
+    for i, result in enumerate(results):
+        vendor = f"VENDOR-{i}"
+        assert result.extracted_data.vendor == vendor
+        # Every trace must belong to its own audit and be complete
+        framed = [s.action for s in result.agent_trace if s.action.startswith("Entity Framed")]
+        assert framed == [f"Entity Framed: {vendor}"], framed
+        assert result.agent_trace[0].action.startswith("Executing OCR")
+        assert result.agent_trace[-1].agent == "DECISION_AGENT"
+        assert result.po_match.po_no == f"PO/STRESS/{vendor}"
+
+    assert len(archive.get_all_invoices()) == AUDITS
+    assert len(archive.get_all_pos()) == AUDITS + 1
+    print(f"SUCCESS: {AUDITS} audits on {THREADS} threads with isolated traces and unique ids")
+
+class SlowModel:
+    """Counts calls and holds each one open long enough for duplicates to pile up"""
+
+    def __init__(self, text):
+        self.text = text
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, contents):
+        with self._lock:
+            self.calls += 1
+        time.sleep(0.2)
+        return type('Response', (), {'text': self.text})()
+
+def test_identical_calls_coalesce():
+    print("Testing single-flight coalescing of identical model calls...")
+    invoice = get_sample_invoice()
+    extraction = ExtractionService(api_key='test-key')
+    extraction.model = SlowModel(json.dumps({
+        'vendor': invoice.vendor, 'invoiceNo': invoice.invoice_no, 'date': invoice.date,
+        'totalAmount': invoice.total_amount, 'taxAmount': invoice.tax_amount, 'lineItems': []
+    }))
+    extraction.tiers = [ModelTier('slow', extraction.model)]
+    originals = []
+    parse = extraction._parse_extraction
+
+    def capture(response):
+        parsed = parse(response)
+        originals.append(parsed[1])
+        return parsed
+
+    extraction._parse_extraction = capture
+    matching = MatchingService(api_key='test-key')
+    matching.model = SlowModel('True')
+    start = threading.Barrier(THREADS)
+
+    def upload(_):
+        start.wait()
+        return extraction.extract_from_image("c2FtZS1ieXRlcw==", "image/png")
+
+    def compare(i):
+        start.wait()
+        names = ("ABC Ltd", "A.B.C. Limited")
+        return matching.is_semantically_equivalent(*(names if i % 2 else names[::-1]))
+
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        extracted = list(pool.map(upload, range(THREADS)))
+        equivalent = list(pool.map(compare, range(THREADS)))
+
+    assert extraction.model.calls == 1, extraction.model.calls
+    assert matching.model.calls == 1, matching.model.calls
+    assert all(e.vendor == invoice.vendor for e in extracted)
+    assert len({id(e) for e in extracted}) == THREADS, "audits must not share one ExtractedData"
+    # The leader gets a copy too, so no audit mutates the object the others copy from
+    assert not any(e is originals[0] for e in extracted)
+    assert all(equivalent)
+
+    # Nothing is remembered once the call has finished
+    extraction.extract_from_image("c2FtZS1ieXRlcw==", "image/png")
+    assert extraction.model.calls == 2
+    print(f"SUCCESS: {THREADS} identical requests per call type served by one model call each")
+
+if __name__ == "__main__":
+    test_concurrent_audits()
+    test_identical_calls_coalesce()
@@ -0,0 +1,105 @@
+import os
+import sys
+
+# Ensure we can import modules
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'Vision'))
+sys.path.append(os.path.join(os.getcwd(), 'benchmarks'))
+
+from audit_orchestrator import AuditOrchestrator
+from config import Config
+from fake_gemini import FakeGenerativeModel, install_fake_model
+from metrics import CONTEXT_CACHE_EVENTS, MODEL_TOKENS
+from model_client import CONTEXT_CACHE, generate
+from repository import StatutoryArchive, get_sample_invoice
+
+class RecordingModel:
+    """Records requests; has no cache_context, like a model whose SDK cannot cache"""
+
+    def __init__(self):
+        self.requests = []
+
+    def generate_content(self, contents):
+        self.requests.append(contents)
+        return type('Response', (), {'text': '{}'})()
+
+DEFAULTS = {name: getattr(Config, name) for name in (
+    'CONTEXT_CACHING', 'CONTEXT_CACHE_MIN_TOKENS', 'CONTEXT_CACHE_TTL_SECONDS', 'CONTEXT_CACHE_REFRESH_SECONDS')}
+
+def restore():
+    for name, value in DEFAULTS.items():
+        setattr(Config, name, value)
+
+def caching(min_tokens=0, ttl=3600, refresh=300):
+    Config.CONTEXT_CACHING = True
+    Config.CONTEXT_CACHE_MIN_TOKENS = min_tokens
+    Config.CONTEXT_CACHE_TTL_SECONDS = ttl
+    Config.CONTEXT_CACHE_REFRESH_SECONDS = refresh
+
+def test_preamble_uploaded_once():
+    print("Testing context cache reuse...")
+    caching()
+    model = FakeGenerativeModel()
+    orchestrator = AuditOrchestrator(StatutoryArchive())
+    install_fake_model(orchestrator, model)
+    cached = MODEL_TOKENS.value(service='decision', kind='cached')
+
+    # Decisions from the cached context match those with the full prompt
+    risk = orchestrator.risk_scoring
+    first = risk.get_ai_decision(get_sample_invoice(), None, [], ["first"])
+    second = risk.get_ai_decision(get_sample_invoice(), None, [], ["second"])
+    assert model.uploads == 1 and model.calls == 2
+    assert MODEL_TOKENS.value(service='decision', kind='cached') > cached
+    Config.CONTEXT_CACHING = False
+    assert risk.get_ai_decision(get_sample_invoice(), None, [], ["third"]) == first == second
+    assert model.uploads == 1
+
+    # Models without caching, and preambles below the API minimum, get the full prompt
+    plain = RecordingModel()
+    caching()
+    generate('decision', plain, ["data"], preamble="instructions")
+    assert plain.requests == [["instructions", "data"]]
+    caching(min_tokens=1024)
+    other = FakeGenerativeModel()
+    generate('decision', other, ["data"], preamble="instructions")
+    assert other.uploads == 0
+    restore()
+    print("SUCCESS: Preamble cached once per model, full prompt otherwise")
+
+def test_lifecycle():
+    print("Testing context cache refresh and expiry...")
+    events = {e: CONTEXT_CACHE_EVENTS.value(event=e) for e in ('created', 'refreshed', 'failed', 'expired')}
+
+    # Within the refresh window each use extends the upload instead of re-creating it
+    caching(refresh=3600)
+    model = FakeGenerativeModel()
+    for _ in range(3):
+        generate('decision', model, ["data"], preamble="refresh me")
+    assert model.uploads == 1 and model.calls == 3
+    assert CONTEXT_CACHE_EVENTS.value(event='refreshed') == events['refreshed'] + 2
+
+    # An upload the API has expired is dropped, the call retried in full, and the next call re-uploads
+    caching()
+    model = FakeGenerativeModel()
+    generate('decision', model, ["data"], preamble="expire me")
+    CONTEXT_CACHE.model_for(model, "expire me").content.expire_time = 0
+    assert generate('decision', model, ["data"], preamble="expire me").text
+    generate('decision', model, ["data"], preamble="expire me")
+    assert model.uploads == 2
+    assert CONTEXT_CACHE_EVENTS.value(event='expired') == events['expired'] + 1
+
+    # A failed upload falls back to full prompts and is not retried straight away
+    model = FakeGenerativeModel()
+    def unavailable(preamble, ttl):
+        raise RuntimeError("caching not supported for this model")
+    model.cache_context = unavailable
+    for _ in range(2):
+        assert generate('decision', model, ["data"], preamble="fail me").text
+    assert model.calls == 2
+    assert CONTEXT_CACHE_EVENTS.value(event='failed') == events['failed'] + 1
+    restore()
+    print("SUCCESS: Uploads refreshed, re-created after expiry, skipped after failure")
+
+if __name__ == "__main__":
+    test_preamble_uploaded_once()
+    test_lifecycle()
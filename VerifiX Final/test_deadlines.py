@@ -0,0 +1,146 @@
+import os
+import sys
+import threading
+import time
+from dataclasses import replace
+
+# Ensure we can import modules
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'Vision'))
+sys.path.append(os.path.join(os.getcwd(), 'benchmarks'))
+
+import deadlines
+from audit_orchestrator import AuditOrchestrator
+from config import Config
+from fake_gemini import FakeGenerativeModel, install_fake_model
+from repository import StatutoryArchive, get_sample_invoice
+from scheduler import FairScheduler
+from single_flight import SingleFlight
+
+class HangingModel(FakeGenerativeModel):
+    """Answers document extraction at once; every other call hangs until released"""
+
+    def __init__(self):
+        super().__init__()
+        self.released = threading.Event()
+
+    def generate_content(self, contents, **kwargs):
+        if isinstance(contents, str) or not any(isinstance(part, dict) for part in contents):
+            self.released.wait(10)
+        return super().generate_content(contents, **kwargs)
+
+def test_hung_calls_degrade_within_budget():
+    print("Testing deadline degradation...")
+    budgets = dict(Config.STAGE_BUDGET_SECONDS)
+    Config.STAGE_BUDGET_SECONDS.update({'po_generation': 0.2, 'rules': 0.2, 'decision': 0.2, 'match_score': 0.2})
+    model = HangingModel()
+    try:
+        orchestrator = AuditOrchestrator(StatutoryArchive())
+        install_fake_model(orchestrator, model)
+        invoice = get_sample_invoice()
+
+        # No archived PO: generation hangs, so the PO is unavailable and the decision deterministic
+        orchestrator.extraction_service.extract_from_image = lambda data, mime: replace(invoice, po_no="PO/NEW/1")
+        start = time.perf_counter()
+        result = orchestrator.process_document("ZmlsZQ==", "image/png")
+        assert time.perf_counter() - start < 2.0
+        assert result.po_match is None
+        assert result.degraded_stages == ['po_generation', 'decision']
+        assert result.explanation == orchestrator.risk_scoring._get_fallback_decision(invoice, None, result.flags).explanation
+
+        # Archived PO with the vendor written differently: the hung equivalence check falls back to local matching
+        archived = replace(orchestrator.archive.reference_documents[invoice.po_no], vendor="TECH SOLUTIONS INDIA PRIVATE LIMITED")
+        orchestrator.archive.reference_documents[invoice.po_no] = archived
+        orchestrator.extraction_service.extract_from_image = lambda data, mime: replace(invoice)
+        result = orchestrator.process_document("ZmlsZTI=", "image/png")
+        assert 'vendor_match' in result.degraded_stages
+        assert not any(flag.id == "R-SEM-001" for flag in result.flags)
+        assert orchestrator.matching_service.is_locally_equivalent("Acme Pvt. Ltd.", "ACME PRIVATE LIMITED")
+        assert not orchestrator.matching_service.is_locally_equivalent("Acme Pvt Ltd", "Apex Pvt Ltd")
+    finally:
+        model.released.set()
+        Config.STAGE_BUDGET_SECONDS.clear()
+        Config.STAGE_BUDGET_SECONDS.update(budgets)
+    print("SUCCESS: Hung model calls degraded to local results within the stage budgets")
+
+def test_waits_respect_deadline():
+    print("Testing deadline-aware waits...")
+    # Queued for a scheduler slot
+    scheduler = FairScheduler(capacity=1, reserved=0)
+    release = scheduler.acquire()
+    with deadlines.budget(0.05):
+        try:
+            scheduler.acquire()
+            assert False, "acquire should give up at the deadline"
+        except deadlines.DeadlineExceeded:
+            pass
+    assert scheduler.depth('interactive') == 0
+    release()
+    scheduler.acquire()()
+
+    # Waiting on another caller's in-flight call
+    flight, started, finish = SingleFlight('test'), threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        finish.wait(5)
+        return 'done'
+
+    leader = threading.Thread(target=lambda: flight.do('key', slow))
+    leader.start()
+    started.wait(1)
+    with deadlines.budget(0.05):
+        try:
+            flight.do('key', slow)
+            assert False, "follower should give up at the deadline"
+        except deadlines.DeadlineExceeded:
+            pass
+    finish.set()
+    leader.join(1)
+
+    # A call given the budget as its timeout stays on the calling thread; its late failure is the deadline
+    threads, released = [], []
+
+    def timed_call():
+        threads.append(threading.current_thread())
+        time.sleep(0.1)
+        raise RuntimeError("504 Deadline Exceeded")
+
+    with deadlines.budget(0.05):
+        try:
+            deadlines.run(timed_call, lambda: released.append(True), timed=True)
+            assert False, "a timed call failing after the deadline should raise DeadlineExceeded"
+        except deadlines.DeadlineExceeded:
+            pass
+    assert threads == [threading.current_thread()] and released == [True]
+
+    # Untimed calls run on the bounded pool; abandoned ones release when they finish, queued ones at once
+    pool_size = deadlines._abandonable._max_workers
+    finish = threading.Event()
+    before = threading.active_count()
+    for _ in range(pool_size + 2):
+        with deadlines.budget(0.02):
+            try:
+                deadlines.run(lambda: finish.wait(5), lambda: released.append(True))
+                assert False, "an untimed call should be abandoned at the deadline"
+            except deadlines.DeadlineExceeded:
+                pass
+    assert threading.active_count() <= before + pool_size and len(released) >= 3, len(released)
+    finish.set()
+    deadline = time.monotonic() + 2
+    while len(released) < pool_size + 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(released) == pool_size + 3, len(released)
+
+    # Nested budgets never extend the enclosing deadline, and share its degraded list
+    stages = []
+    with deadlines.budget(0.5, stages):
+        with deadlines.budget(60):
+            assert deadlines.remaining() <= 0.5
+            deadlines.degraded('decision')
+    assert stages == ['decision'] and deadlines.remaining() is None
+    print("SUCCESS: Scheduler and shared-call waits end at the deadline")
+
+if __name__ == "__main__":
+    test_hung_calls_degrade_within_budget()
+    test_waits_respect_deadline()
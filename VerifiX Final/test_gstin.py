@@ -0,0 +1,50 @@
+import os
+import sys
+from dataclasses import replace
+
+# Ensure we can import modules
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'Vision'))
+
+from gstin import checksum, validate_gstin
+from repository import StatutoryArchive, get_sample_invoice
+from rules_engine import RulesEngine
+
+def test_gstin_validation():
+    print("Testing local GSTIN validation...")
+    assert validate_gstin("27AABCU9603R1ZN").valid
+    check = validate_gstin(" 29aabct1332l1za ")
+    assert check.valid and check.state == "Karnataka" and check.pan == "AABCT1332L", check
+
+    assert "missing" in validate_gstin(None).error
+    assert "15 characters" in validate_gstin("27AABCU9603R1Z").error
+    assert "format" in validate_gstin("27AABXU9603R1ZN").error  # X is not a PAN holder type
+    assert "state code" in validate_gstin("45AABCU9603R1ZN").error
+    assert "expected N" in validate_gstin("27AABCU9603R1ZM").error
+    assert checksum("27AABCU9603R1Z") == "N"
+    print("SUCCESS: Format, state code and check character verified locally")
+
+def test_gstin_rules_single_and_batch():
+    print("Testing GSTIN rules on single and batch paths...")
+    archive = StatutoryArchive()
+    engine = RulesEngine()
+    po = archive.get_po("PO/MEITY/2024/221")
+
+    valid = get_sample_invoice()
+    typo = replace(get_sample_invoice(), gst_no="29AABCT1332L1ZB")
+    other_entity = replace(get_sample_invoice(), gst_no="27AABCU9603R1ZN")
+    branch = replace(get_sample_invoice(), gst_no="27AABCT1332L1Z" + checksum("27AABCT1332L1Z"))
+
+    def gst_flags(flags):
+        return sorted(f.id for f in flags if f.id.startswith(("R-GST-003", "R-GST-011")))
+
+    pairs = [(valid, po), (typo, po), (other_entity, po), (branch, po)]
+    single = [gst_flags(engine.validate(invoice, p)) for invoice, p in pairs]
+    assert single == [[], ["R-GST-003"], ["R-GST-011"], []], single
+    batch = [gst_flags(flags) for flags in engine.validate_batch(pairs)]
+    assert batch == single, batch
+    print("SUCCESS: Checksum typos and PAN mismatches flagged; same-PAN branches pass")
+
+if __name__ == "__main__":
+    test_gstin_validation()
+    test_gstin_rules_single_and_batch()
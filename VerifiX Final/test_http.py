@@ -0,0 +1,94 @@
+import gzip
+import os
+import sys
+import tempfile
+
+# Ensure we can import modules
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'Vision'))
+
+import app as app_module
+from repository import get_sample_invoice
+from static_assets import StaticAssets, precompress
+
+def test_static_assets_cached_and_precompressed():
+    print("Testing static asset caching and precompression...")
+    with tempfile.TemporaryDirectory() as folder:
+        os.makedirs(os.path.join(folder, 'assets'))
+        script = b"console.log('verifix');\n" * 200
+        for name, body in (('index.html', b'<html><script src="/assets/index-CVWQgExD.js"></script></html>'),
+                           ('assets/index-CVWQgExD.js', script)):
+            with open(os.path.join(folder, name), 'wb') as f:
+                f.write(body)
+        assert precompress(folder) >= 1
+        assert os.path.exists(os.path.join(folder, 'assets', 'index-CVWQgExD.js.gz'))
+
+        assets = StaticAssets(folder)
+        assert 'assets/index-CVWQgExD.js.gz' not in assets.assets
+        script_asset = assets.get('assets/index-CVWQgExD.js')
+        assert 'immutable' in script_asset.cache_control
+        assert assets.get('index.html').cache_control == 'no-cache'
+        assert gzip.decompress(script_asset.representation.encoded('gzip')) == script
+
+        app_module.static_assets, original = assets, app_module.static_assets
+        try:
+            client = app_module.app.test_client()
+            response = client.get('/assets/index-CVWQgExD.js', headers={'Accept-Encoding': 'gzip'})
+            assert response.headers['Content-Encoding'] == 'gzip'
+            assert gzip.decompress(response.data) == script
+            assert 'Accept-Encoding' in response.headers['Vary']
+            assert client.get('/assets/index-CVWQgExD.js').data == script
+
+            # Client-side routes get index.html, revalidated by ETag
+            page = client.get('/audits/42')
+            assert page.mimetype == 'text/html' and b'index-CVWQgExD.js' in page.data
+            assert client.get('/audits/42', headers={'If-None-Match': page.headers['ETag']}).status_code == 304
+
+            # Unknown files never rescan the folder
+            def rescan():
+                raise AssertionError("static folder rescanned on a request")
+            assets.reload = rescan
+            for path in ('/favicon.ico', '/robots.txt', '/assets/missing-12345678.js'):
+                assert client.get(path).mimetype == 'text/html'
+        finally:
+            app_module.static_assets = original
+    print("SUCCESS: Hashed assets immutable and served precompressed")
+
+def test_json_compression_and_archive_etags():
+    print("Testing JSON compression and archive ETags...")
+    client = app_module.app.test_client()
+    rules = client.get('/api/rules/list', headers={'Accept-Encoding': 'gzip'})
+    assert rules.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(rules.data).startswith(b'{')
+    assert 'Content-Encoding' not in client.get('/api/rules/list').headers
+    assert 'Content-Encoding' not in client.get('/api/health', headers={'Accept-Encoding': 'gzip'}).headers
+
+    first = client.get('/api/archive/invoices')
+    etag = first.headers['ETag']
+    assert client.get('/api/archive/invoices', headers={'If-None-Match': etag}).status_code == 304
+    pos_etag = client.get('/api/archive/pos').headers['ETag']
+
+    # Archiving an invoice changes the invoice listings, not the PO listing
+    app_module.archive.add_invoice(get_sample_invoice())
+    changed = client.get('/api/archive/invoices', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and len(changed.get_json()) == len(first.get_json()) + 1
+    assert client.get('/api/archive/pos', headers={'If-None-Match': pos_etag}).status_code == 304
+    print("SUCCESS: Large JSON compressed on request; unchanged archive answered with 304")
+
+def test_health_reports_draining_while_serving():
+    print("Testing health check during a drain...")
+    client = app_module.app.test_client()
+    assert client.get('/api/health').status_code == 200
+    app_module.in_flight.start_draining()
+    try:
+        health = client.get('/api/health')
+        assert health.status_code == 503 and health.get_json()['status'] == 'draining'
+        assert client.get('/api/rules/list').status_code == 200
+    finally:
+        app_module.in_flight._draining = False
+    print("SUCCESS: Draining worker answers 503 on health and keeps serving")
+
+if __name__ == "__main__":
+    test_static_assets_cached_and_precompressed()
+    test_json_compression_and_archive_etags()
+    test_health_reports_draining_while_serving()
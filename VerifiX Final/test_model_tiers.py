@@ -0,0 +1,79 @@
+import json
+import os
+import sys
+
+# Ensure we can import modules
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'Vision'))
+
+from audit_orchestrator import AuditOrchestrator
+from metrics import MODEL_ESCALATIONS, MODEL_TIER_CALLS
+from model_client import ModelTier
+from project_types import AuditFlag, RiskLevel, to_dict
+from repository import StatutoryArchive, get_sample_invoice
+
+class ScriptedModel:
+    """Returns a fixed response text and counts calls"""
+
+    def __init__(self, text):
+        self.text = text
+        self.calls = 0
+
+    def generate_content(self, contents):
+        self.calls += 1
+        return type('Response', (), {'text': self.text})()
+
+def extraction_json(**changes):
+    data = to_dict(get_sample_invoice(), camel=True)
+    data.update(changes)
+    return json.dumps(data)
+
+def tiered_orchestrator(cheap, strong):
+    orchestrator = AuditOrchestrator(StatutoryArchive())
+    for service in (orchestrator.extraction_service, orchestrator.risk_scoring):
+        service.api_key = 'test-key'
+        service.tiers = [ModelTier('cheap', cheap), ModelTier('strong', strong)]
+    orchestrator.matching_service.api_key = None
+    return orchestrator
+
+def test_extraction_escalates_on_failed_checks():
+    print("Testing extraction tier escalation...")
+    escalated = MODEL_TIER_CALLS.value(service='extraction', tier='cheap', result='escalated')
+
+    # A clean extraction from the cheap tier is kept
+    cheap, strong = ScriptedModel(extraction_json()), ScriptedModel(extraction_json())
+    invoice = tiered_orchestrator(cheap, strong).extraction_service.extract_from_image("ZmlsZS0x", "image/png")
+    assert (cheap.calls, strong.calls) == (1, 0) and invoice.gst_no == "29AABCT1332L1ZA"
+
+    # A garbled GSTIN (bad check character) or a dropped digit escalates to the strong tier
+    for bad in (extraction_json(gstNo="29AABCT1332L1ZB"), extraction_json(totalAmount=59000.0),
+                extraction_json(confidence=0.4), "not json"):
+        cheap, strong = ScriptedModel(bad), ScriptedModel(extraction_json())
+        invoice = tiered_orchestrator(cheap, strong).extraction_service.extract_from_image("ZmlsZS0y", "image/png")
+        assert (cheap.calls, strong.calls) == (1, 1), bad
+        assert invoice.gst_no == "29AABCT1332L1ZA" and invoice.total_amount == 590000.0
+
+    assert MODEL_TIER_CALLS.value(service='extraction', tier='cheap', result='escalated') == escalated + 3
+    assert MODEL_ESCALATIONS.value(service='extraction', tier='cheap', reason='gstin') >= 1
+    print("SUCCESS: Cheap tier kept when checks pass, escalated otherwise")
+
+def test_decision_escalates_when_contradicting_flags():
+    print("Testing decision tier escalation...")
+    approve = json.dumps({'riskScore': 5, 'riskLevel': 'LOW', 'reasoningSteps': ['Looks fine'],
+                          'explanation': 'No issues', 'recommendation': 'APPROVE'})
+    reject = json.dumps({'riskScore': 80, 'riskLevel': 'HIGH', 'reasoningSteps': ['Vendor mismatch'],
+                         'explanation': 'Vendor differs from PO', 'recommendation': 'REJECT'})
+    high = [AuditFlag(id="R-SEM-001", rule="Vendor Mismatch", severity=RiskLevel.HIGH, description="x", field="vendor")]
+
+    cheap, strong = ScriptedModel(approve), ScriptedModel(reject)
+    risk = tiered_orchestrator(cheap, strong).risk_scoring
+    decision = risk.get_ai_decision(get_sample_invoice(), None, high, [])
+    assert (cheap.calls, strong.calls) == (1, 1) and decision.recommendation == 'REJECT'
+
+    decision = risk.get_ai_decision(get_sample_invoice(), None, [], ["no flags"])
+    assert (cheap.calls, strong.calls) == (2, 1) and decision.recommendation == 'APPROVE'
+    print("SUCCESS: Contradictory cheap decision escalated")
+
+if __name__ == "__main__":
+    test_extraction_escalates_on_failed_checks()
+    test_decision_escalates_when_contradicting_flags()
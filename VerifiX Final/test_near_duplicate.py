@@ -0,0 +1,87 @@
+import os
+import random
+import sys
+from dataclasses import replace
+
+# Ensure we can import modules
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'Vision'))
+sys.path.append(os.path.join(os.getcwd(), 'benchmarks'))
+
+import image_hash
+from audit_orchestrator import AuditOrchestrator
+from corpus import as_scan
+from image_hash import NearDuplicateIndex, PageHash
+from repository import StatutoryArchive, get_sample_invoice
+
+def test_multi_index_matches_linear_scan():
+    print("Testing multi-index hash lookup against a linear scan...")
+    rng = random.Random(7)
+    index = NearDuplicateIndex(chunks=3)
+    stored = [rng.getrandbits(64) for _ in range(5000)]
+    for i, coarse in enumerate(stored):
+        index.add([PageHash(coarse, i, bytes([i % 256]))], i)
+
+    for _ in range(200):
+        query = rng.choice(stored)
+        for bit in rng.sample(range(64), rng.randint(0, 10)):
+            query ^= 1 << bit
+        found = {m.value for m in index.search([PageHash(query, 0, b'')], 8)}
+        expected = {i for i, coarse in enumerate(stored) if (coarse ^ query).bit_count() <= 8}
+        assert found == expected, (found, expected)
+    print("SUCCESS: Same results as the linear scan")
+
+def test_rescanned_invoice_reuses_extraction():
+    print("Testing near-duplicate scans before extraction...")
+    if not image_hash.available():
+        print("SKIPPED: Pillow is not installed")
+        return
+    orchestrator = AuditOrchestrator(StatutoryArchive())
+    orchestrator.matching_service.api_key = None
+    orchestrator.risk_scoring.api_key = None
+    service = orchestrator.extraction_service
+    calls = []
+    uploads = {}
+
+    def full_extract(base64_data, mime_type):
+        calls.append('full')
+        return replace(uploads[base64_data], line_items=list(uploads[base64_data].line_items))
+
+    def key_fields(base64_data, mime_type, fields):
+        calls.append('key_fields')
+        invoice = uploads[base64_data]
+        return {'vendor': invoice.vendor, 'invoiceNo': invoice.invoice_no, 'date': invoice.date,
+                'totalAmount': invoice.total_amount}
+
+    service.extract_from_image = full_extract
+    service.extract_fields = key_fields
+
+    def audit(invoice, image_format='PNG', quality=90):
+        data = as_scan(invoice, image_format, quality)
+        uploads[data] = invoice
+        calls.clear()
+        return orchestrator.process_document(data, f"image/{image_format.lower()}")
+
+    original = get_sample_invoice()
+    first = audit(original)
+    assert calls == ['full'] and "R-DUP-013" not in {f.id for f in first.flags}
+
+    # The same pixels in another container: no model call at all
+    result = audit(original, 'TIFF')
+    assert calls == [] and "R-DUP-013" in {f.id for f in result.flags}
+
+    # A re-encode: only the key fields are read, then the earlier extraction is reused
+    result = audit(original, 'JPEG', 85)
+    assert calls == ['key_fields'], calls
+    assert result.extracted_data.invoice_no == original.invoice_no and "R-DUP-013" in {f.id for f in result.flags}
+
+    # The same template with another number is extracted in full
+    reissued = replace(original, invoice_no="INV/2024/0002", total_amount=original.total_amount + 1000)
+    result = audit(reissued)
+    assert calls[-1] == 'full' and result.extracted_data.invoice_no == "INV/2024/0002"
+    assert "R-DUP-013" not in {f.id for f in result.flags}
+    print("SUCCESS: Copies reused, reissued invoice extracted")
+
+if __name__ == "__main__":
+    test_multi_index_matches_linear_scan()
+    test_rescanned_invoice_reuses_extraction()
@@ -0,0 +1,77 @@
+import os
+import random
+import sys
+
+# Ensure we can import modules
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'Vision'))
+
+from price_index import P2Quantile, PriceIndex
+from project_types import LineItem
+from repository import StatutoryArchive, get_sample_invoice
+from rules_engine import RulesEngine
+
+def test_streaming_quantiles():
+    print("Testing P-squared quantile estimates against exact quantiles...")
+    rng = random.Random(7)
+    values = [rng.lognormvariate(10, 0.3) for _ in range(20000)]
+    median, p95 = P2Quantile(0.5), P2Quantile(0.95)
+    for v in values:
+        median.add(v)
+        p95.add(v)
+    ordered = sorted(values)
+    for sketch, exact in ((median, ordered[len(ordered) // 2]), (p95, ordered[int(len(ordered) * 0.95)])):
+        error = abs(sketch.value() - exact) / exact
+        assert error < 0.01, (sketch.p, sketch.value(), exact)
+    print("SUCCESS: Median and p95 within 1% of exact")
+
+def test_unit_price_outlier_rule():
+    print("Testing unit-price outlier rule against archived history...")
+    archive = StatutoryArchive()
+    rng = random.Random(11)
+    for i in range(20):
+        invoice = get_sample_invoice()
+        # Same vendor, spelled differently; prices around the usual 41,000
+        invoice.vendor = "TECH SOLUTIONS INDIA PVT. LTD."
+        invoice.invoice_no = f"INV-2024-{i:04d}"
+        invoice.line_items[0].unit_price = rng.uniform(39000, 43000)
+        archive.add_invoice(invoice)
+
+    history = archive.price_index.lookup("Tech Solutions India Pvt Ltd", "8471 30")
+    assert history.count == 20 and 39000 < history.median < 43000, history.median
+
+    engine = RulesEngine()
+    normal = get_sample_invoice()
+    flags = engine.validate(normal, None, None, archive.price_index)
+    assert not [f for f in flags if f.id.startswith("R-PRICE-009")], flags
+
+    inflated = get_sample_invoice()
+    inflated.line_items[0].unit_price = 123000.0
+    flags = [f for f in engine.validate(inflated, None, None, archive.price_index) if f.id.startswith("R-PRICE-009")]
+    assert len(flags) == 1 and flags[0].id == "R-PRICE-009-0", flags
+    assert flags[0].line_item == 0 and flags[0].coords == inflated.line_items[0].coords, flags
+    print(f"SUCCESS: {flags[0].description}")
+
+    # Re-uploads of an archived invoice are not counted again
+    for _ in range(3):
+        archive.add_invoice(get_sample_invoice())
+        archive.add_invoice(get_sample_invoice())
+    assert archive.price_index.lookup("Tech Solutions India Pvt Ltd", "847130").count == 21
+
+    # Only recent invoices are remembered; an older one counts again
+    index = PriceIndex(max_seen_invoices=2)
+    for invoice_no in ("A", "B", "C", "A"):
+        invoice = get_sample_invoice()
+        invoice.invoice_no = invoice_no
+        index.add_invoice(invoice)
+    assert index.lookup(invoice.vendor, "847130").count == 4 and len(index._invoices) == 2
+
+    # Vendors with too little history are never flagged
+    index = PriceIndex()
+    index.add_line_item("New Vendor", LineItem("Server", 1, 1000.0, 1000.0, "847130"))
+    inflated.vendor = "New Vendor"
+    assert not [f for f in engine.validate(inflated, None, None, index) if f.id.startswith("R-PRICE-009")]
+
+if __name__ == "__main__":
+    test_streaming_quantiles()
+    test_unit_price_outlier_rule()
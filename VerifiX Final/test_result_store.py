@@ -0,0 +1,123 @@
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import replace
+from io import BytesIO
+
+# Ensure we can import modules
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'Vision'))
+sys.path.append(os.path.join(os.getcwd(), 'benchmarks'))
+
+import app as app_module
+from fake_gemini import FakeGenerativeModel, install_fake_model
+from repository import get_sample_invoice
+from result_store import IdempotencyConflict, ResultStore, fingerprint
+
+def counting_client():
+    """Test client whose extractions are counted (and slow enough for retries to overlap)"""
+    install_fake_model(app_module.orchestrator, FakeGenerativeModel())
+    extractions = []
+
+    def extract(data, mime):
+        extractions.append(data)
+        time.sleep(0.05)
+        return replace(get_sample_invoice(), invoice_no=f"INV-{len(extractions)}")
+
+    app_module.orchestrator.extraction_service.extract_from_image = extract
+    return app_module.app.test_client(), extractions
+
+def upload(client, content, key=None):
+    headers = {'Idempotency-Key': key} if key else {}
+    return client.post('/api/audit/upload', data={'file': (BytesIO(content), 'invoice.png')},
+                       content_type='multipart/form-data', headers=headers)
+
+def test_idempotent_upload_and_retrieval():
+    print("Testing idempotent uploads and result retrieval...")
+    client, extractions = counting_client()
+
+    first = upload(client, b'scan-1', key='retry-test-1')
+    assert first.status_code == 200 and len(extractions) == 1
+    retry = upload(client, b'scan-1', key='retry-test-1')
+    assert retry.data == first.data and retry.headers['Idempotent-Replayed'] == 'true'
+    assert len(extractions) == 1
+    assert upload(client, b'scan-2', key='retry-test-1').status_code == 422
+    assert upload(client, b'scan-1').status_code == 200 and len(extractions) == 2
+
+    # Concurrent retries share one audit
+    responses = []
+    threads = [threading.Thread(target=lambda: responses.append(upload(client, b'scan-3', key='retry-test-2')))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(extractions) == 3 and len({r.data for r in responses}) == 1
+
+    audit_id = first.get_json()['id']
+    fetched = client.get(f'/api/audit/{audit_id}')
+    assert fetched.status_code == 200 and fetched.data == first.data
+    assert fetched.headers['ETag'] == first.headers['ETag']
+    assert client.get(f'/api/audit/{audit_id}', headers={'If-None-Match': fetched.headers['ETag']}).status_code == 304
+    assert client.get('/api/audit/AUDIT-IND-UNKNOWN').status_code == 404
+    assert len(extractions) == 3
+    print("SUCCESS: Retries replay the stored result, fetched by id with ETags")
+
+def test_stored_like_the_original_response():
+    print("Testing stored results keep their endpoint's shape...")
+    client, _ = counting_client()
+    sample = client.post('/api/audit/sample')
+    assert 'riskScore' in sample.get_json()
+    assert client.get(f"/api/audit/{sample.get_json()['id']}").data == sample.data
+
+    # The upload answers from what it stored, even if the store evicted it at once
+    app_module.result_store, original = ResultStore(0), app_module.result_store
+    try:
+        response = upload(client, b'scan-evicted')
+        assert response.status_code == 200 and 'risk_score' in response.get_json()
+    finally:
+        app_module.result_store = original
+    print("SUCCESS: Sample results fetched in camelCase, uploads independent of eviction")
+
+def test_results_shared_through_directory():
+    print("Testing results written to the store directory...")
+    result = app_module.orchestrator.process_sample()
+    with tempfile.TemporaryDirectory() as directory:
+        writer = ResultStore(10, directory)
+        stored, replayed = writer.run_once('dir-key', fingerprint(b'sample'), lambda: writer.put(result))
+        assert not replayed
+
+        # Another worker (or a restart) reads it back from the directory
+        reader = ResultStore(10, directory)
+        assert reader.get(result.id).body == stored.body
+        assert reader.get(result.id).etag == stored.etag
+        assert reader.for_key('dir-key', fingerprint(b'sample')).audit_id == result.id
+        try:
+            reader.for_key('dir-key', fingerprint(b'other'))
+            assert False, "a reused key with another payload should be refused"
+        except IdempotencyConflict:
+            pass
+        assert reader.get('../../etc/passwd') is None
+
+    # Several workers share a directory even when none is configured
+    def store_dir(workers):
+        env = {k: v for k, v in os.environ.items() if k != 'RESULT_STORE_DIR'}
+        env['WEB_CONCURRENCY'] = str(workers)
+        return subprocess.run([sys.executable, '-c', 'from config import Config; print(Config.RESULT_STORE_DIR)'],
+                              env=env, capture_output=True, text=True, check=True).stdout.strip()
+    assert store_dir(1) == 'None' and store_dir(2) != 'None'
+
+    # Only the most recent results stay in memory
+    small = ResultStore(2)
+    for i in range(3):
+        small.put(replace(result, id=f"AUDIT-{i}"))
+    assert small.get("AUDIT-0") is None and small.get("AUDIT-2") is not None
+    print("SUCCESS: Stored results survive across store instances")
+
+if __name__ == "__main__":
+    test_idempotent_upload_and_retrieval()
+    test_stored_like_the_original_response()
+    test_results_shared_through_directory()
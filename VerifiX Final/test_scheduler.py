@@ -0,0 +1,83 @@
+import os
+import sys
+import threading
+import time
+
+# Ensure we can import modules
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'Vision'))
+
+from metrics import MODEL_QUEUE_WAIT
+from scheduler import FairScheduler, priority, priority_for
+
+def hold(scheduler, lane, flow='default'):
+    """Occupy a slot from a background thread until the returned event is set"""
+    entered, release = threading.Event(), threading.Event()
+
+    def run():
+        with priority(lane, flow), scheduler.slot():
+            entered.set()
+            release.wait()
+
+    threading.Thread(target=run, daemon=True).start()
+    return entered, release
+
+def queue_call(scheduler, lane, flow, started):
+    """Queue a call from a background thread; it records its flow when it starts"""
+    depth = scheduler.depth(lane)
+
+    def run():
+        with priority(lane, flow), scheduler.slot():
+            started.append(flow)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    while scheduler.depth(lane) == depth:
+        time.sleep(0.001)
+    return thread
+
+def test_interactive_bypasses_bulk_backlog():
+    print("Testing priority lanes...")
+    scheduler = FairScheduler(capacity=2, reserved=1)
+    waits = MODEL_QUEUE_WAIT.count(lane='interactive')
+
+    # Bulk may hold only the unreserved slot; the rest of the batch queues
+    entered, release = hold(scheduler, 'bulk')
+    assert entered.wait(1)
+    started = []
+    backlog = [queue_call(scheduler, 'bulk', 'batch', started) for _ in range(3)]
+    assert scheduler.depth('bulk') == 3 and scheduler.running('bulk') == 1
+
+    # An interactive call starts at once on the reserved slot
+    interactive, release_interactive = hold(scheduler, 'interactive')
+    assert interactive.wait(1) and scheduler.running('interactive') == 1
+    release_interactive.set()
+    release.set()
+    for thread in backlog:
+        thread.join(1)
+    assert started == ['batch'] * 3 and scheduler.depth('bulk') == 0
+    assert MODEL_QUEUE_WAIT.count(lane='interactive') == waits + 1
+
+    assert priority_for({'X-VerifiX-Priority': 'Bulk', 'X-VerifiX-Flow': 'reaudit-7'}, '10.0.0.1') == ('bulk', 'reaudit-7')
+    assert priority_for({}, '10.0.0.1') == ('interactive', '10.0.0.1')
+    print("SUCCESS: Interactive calls start while bulk work is queued")
+
+def test_flows_share_a_lane_by_weight():
+    print("Testing weighted fair sharing within a lane...")
+    for weights, expected in (({}, 'abab' + 'aa'), ({'b': 2.0}, 'abba' + 'aa')):
+        scheduler = FairScheduler(capacity=1, reserved=0, weights=weights)
+        entered, release = hold(scheduler, 'bulk', 'other')
+        assert entered.wait(1)
+        started = []
+        # A large batch queues before a small one, yet they alternate (b twice as often with weight 2)
+        threads = [queue_call(scheduler, 'bulk', 'a', started) for _ in range(4)]
+        threads += [queue_call(scheduler, 'bulk', 'b', started) for _ in range(2)]
+        release.set()
+        for thread in threads:
+            thread.join(1)
+        assert ''.join(started) == expected, (weights, started)
+    print("SUCCESS: Flows interleave in proportion to their weights")
+
+if __name__ == "__main__":
+    test_interactive_bypasses_bulk_backlog()
+    test_flows_share_a_lane_by_weight()
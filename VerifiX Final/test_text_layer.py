@@ -0,0 +1,111 @@
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+# Ensure we can import modules
+sys.path.append(os.getcwd())
+sys.path.append(os.path.join(os.getcwd(), 'Vision'))
+sys.path.append(os.path.join(os.getcwd(), 'benchmarks'))
+
+import text_layer
+from audit_orchestrator import AuditContext, AuditOrchestrator
+from corpus import as_pdf
+from repository import StatutoryArchive, get_sample_invoice
+
+def make_orchestrator(calls):
+    orchestrator = AuditOrchestrator(StatutoryArchive())
+    service = orchestrator.extraction_service
+
+    def counting_extract(base64_data, mime_type):
+        calls.append(None)
+        return get_sample_invoice()
+
+    def counting_fields(base64_data, mime_type, fields):
+        calls.append(list(fields))
+        sample = get_sample_invoice()
+        return {'totalAmount': sample.total_amount, 'taxAmount': sample.tax_amount,
+                'lineItems': [{'description': i.description, 'quantity': i.quantity, 'unitPrice': i.unit_price,
+                               'total': i.total, 'hsnCode': i.hsn_code} for i in sample.line_items]}
+
+    service.extract_from_image = counting_extract
+    service.extract_fields = counting_fields
+    return orchestrator
+
+def test_digital_pdf_read_locally():
+    print("Testing local text layer extraction of a digital PDF...")
+    if not text_layer.available():
+        print("SKIPPED: pypdf is not installed")
+        return
+    sample = get_sample_invoice()
+    calls = []
+    orchestrator = make_orchestrator(calls)
+    ctx = AuditContext.create()
+    invoice = orchestrator._extract(ctx, 'extraction', as_pdf(sample), 'application/pdf')
+
+    assert calls == [], calls
+    assert invoice.vendor == sample.vendor and invoice.invoice_no == sample.invoice_no
+    assert invoice.date == sample.date and invoice.po_no == sample.po_no and invoice.gst_no == sample.gst_no
+    assert invoice.total_amount == sample.total_amount and invoice.tax_amount == sample.tax_amount
+    assert [(i.quantity, i.unit_price, i.hsn_code) for i in invoice.line_items] == \
+           [(i.quantity, i.unit_price, i.hsn_code) for i in sample.line_items]
+    print("SUCCESS: All fields read from the text layer without a model call")
+
+def test_uncertain_fields_sent_to_model():
+    print("Testing partial and full model fallback...")
+    if not text_layer.available():
+        print("SKIPPED: pypdf is not installed")
+        return
+    sample = get_sample_invoice()
+    calls = []
+    orchestrator = make_orchestrator(calls)
+
+    # No totals rows: only the amounts and lines are asked of the model
+    invoice = orchestrator._extract(AuditContext.create(), 'extraction', as_pdf(sample, totals=False), 'application/pdf')
+    assert len(calls) == 1 and calls[0] is not None, calls
+    assert 'totalAmount' in calls[0] and 'vendor' not in calls[0] and 'invoiceNo' not in calls[0]
+    assert invoice.total_amount == sample.total_amount and invoice.invoice_no == sample.invoice_no
+
+    # Scanned PDF and images go to the model whole
+    calls.clear()
+    orchestrator._extract(AuditContext.create(), 'extraction', as_pdf(sample, text_layer=False), 'application/pdf')
+    orchestrator._extract(AuditContext.create(), 'extraction', "ZHVtbXk=", 'image/png')
+    assert calls == [None, None], calls
+    print("SUCCESS: Model asked only for what the text layer could not supply")
+
+class OmittingModel:
+    """Answers a field request with the amounts only, leaving out the line items it was asked for"""
+
+    model_name = 'omitting-model'
+
+    def __init__(self, sample):
+        self.sample = sample
+
+    def generate_content(self, contents, **kwargs):
+        text = json.dumps({'totalAmount': self.sample.total_amount, 'taxAmount': self.sample.tax_amount, 'gstNo': None})
+        return SimpleNamespace(text=text, usage_metadata=None)
+
+def test_omitted_fields_keep_local_values():
+    print("Testing fields the model leaves out...")
+    if not text_layer.available():
+        print("SKIPPED: pypdf is not installed")
+        return
+    sample = get_sample_invoice()
+    orchestrator = AuditOrchestrator(StatutoryArchive())
+    service = orchestrator.extraction_service
+    service.api_key, service.model = 'fake-key', OmittingModel(sample)
+
+    values = service.extract_fields("ZHVtbXk=", 'application/pdf', ['totalAmount', 'gstNo', 'lineItems'])
+    assert values == {'totalAmount': sample.total_amount}, values
+
+    # lineItems is uncertain without totals rows; the text layer's rows are kept
+    invoice = orchestrator._extract(AuditContext.create(), 'extraction', as_pdf(sample, totals=False), 'application/pdf')
+    assert invoice.total_amount == sample.total_amount
+    assert [(i.description, i.quantity, i.unit_price) for i in invoice.line_items] == \
+           [(i.description, i.quantity, i.unit_price) for i in sample.line_items]
+    print("SUCCESS: Omitted fields left the text layer values in place")
+
+if __name__ == "__main__":
+    test_digital_pdf_read_locally()
+    test_uncertain_fields_sent_to_model()
+    test_omitted_fields_keep_local_values()
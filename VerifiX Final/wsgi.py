@@ -0,0 +1,14 @@
+"""
+wsgi.py - Production entry point for the Invoice Audit Agent
+
+Run with: gunicorn -c gunicorn.conf.py wsgi:app
+"""
+import os
+import sys
+
+# Vision modules import each other as top-level modules
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Vision'))
+
+from app import app, in_flight, start_background_warm_up, warm_up  # noqa: E402
+
+__all__ = ['app', 'in_flight', 'start_background_warm_up', 'warm_up']